@@ -38,6 +38,7 @@ dropdb "$DEV_DB"
 psql -c "create database $DEV_DB"
 psql "$DEV_DB" -c 'create extension "uuid-ossp";'
 psql "$DEV_DB" -c 'create extension "citext";'
+psql "$DEV_DB" -c 'create extension "pg_trgm";'
 if [[ "$1" = "prod" ]]; then
     fix_perms
 fi
@@ -73,3 +73,31 @@ class EmptyResponse(flask.Response):  # pylint: disable=too-many-ancestors
 
 
 make_empty_response = EmptyResponse.make  # pylint: disable=invalid-name
+
+
+class NotModifiedResponse(flask.Response):  # pylint: disable=too-many-ancestors
+    """A response indicating that the requested resource did not change.
+
+    This is a subtype of :py:class:`werkzeug.wrappers.Response` where the body
+    is empty and the status code is always 304.
+    """
+
+    @classmethod
+    def make(cls, etag: str) -> 'NotModifiedResponse':
+        """Create a not modified response.
+
+        :param etag: The (weak) ETag of the resource.
+        """
+        res = cls('', status=304)
+        res.set_etag(etag, weak=True)
+        return res
+
+
+def etag_matches(etag: str) -> bool:
+    """Check if the client already has the version of a resource with the
+    given (weak) ETag, as indicated by the ``If-None-Match`` header.
+
+    :param etag: The ETag of the current version of the resource.
+    :returns: ``True`` if the client may use its cached version.
+    """
+    return flask.request.if_none_match.contains_weak(etag)
@@ -2,11 +2,14 @@
 
 SPDX-License-Identifier: AGPL-3.0-only
 """
+import io
 import os
 import abc
 import uuid
+import fcntl
 import shutil
 import typing as t
+import hashlib
 import contextlib
 from os import path as os_path
 
@@ -76,10 +79,16 @@ class File:
         ...
 
     @abc.abstractmethod
-    def save_to_disk(self, dst_path: str) -> None:
+    def save_to_disk(
+        self, dst_path: str, *, allow_hardlink: bool = False
+    ) -> None:
         """Write this file to disk at the given path.
 
         :param dst_path: The location where the file should be saved.
+        :param allow_hardlink: If ``True`` the file at ``dst_path`` may be a
+            hard link to the file in the storage, so it should never be
+            modified. Storage providers that cannot do this safely ignore this
+            argument.
         """
         ...
 
@@ -237,8 +246,41 @@ class _LocalFile(File):
         mtime = os_path.getmtime(self._path)
         return DatetimeWithTimezone.utcfromtimestamp(mtime)
 
-    def save_to_disk(self, dst_path: str) -> None:
-        shutil.copyfile(src=self._path, dst=dst_path, follow_symlinks=False)
+    def save_to_disk(
+        self, dst_path: str, *, allow_hardlink: bool = False
+    ) -> None:
+        src_path = self._path
+        if allow_hardlink:
+            try:
+                os.link(src_path, dst_path)
+            except OSError:
+                pass
+            else:
+                return
+
+        if not _reflink(src_path, dst_path):
+            shutil.copyfile(src=src_path, dst=dst_path, follow_symlinks=False)
+
+
+# The ``FICLONE`` ioctl request of Linux, see ``ioctl_ficlone(2)``.
+_FICLONE = 0x40049409
+
+
+def _reflink(src_path: str, dst_path: str) -> bool:
+    """Try to create ``dst_path`` as a copy-on-write clone of ``src_path``.
+
+    This is only supported by some filesystems (for example Btrfs and XFS), but
+    if it is it doesn't copy any data.
+
+    :returns: If the clone was created. If not ``dst_path`` might still exist
+        as an empty file.
+    """
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        except OSError:
+            return False
+    return True
 
 
 def _is_file(path: str) -> bool:
@@ -388,9 +430,293 @@ class LocalStorage(_Storage[_LocalFile]):
         path = self._safe_join(name)
         return path.map(lambda _: _LocalFile(name, self._safe_join))
 
-    def _get_putter(self) -> _LocalFilePutter:
+    def _get_putter(self) -> _Putter[_LocalFile]:
         return _LocalFilePutter(self)
 
 
+_HASH_BLOCK_SIZE = 64 * 1024
+
+
+class _HashingWriter:
+    """A writer that calculates the hash of all the data written to it.
+    """
+    __slots__ = ('__dst', 'hash')
+
+    def __init__(self, dst: t.IO[bytes]) -> None:
+        self.__dst = dst
+        self.hash = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        """Write the given data to the destination and update the hash.
+
+        :param data: The data to write.
+        :returns: The amount of bytes written.
+        """
+        self.hash.update(data)
+        return self.__dst.write(data)
+
+
+class _ContentAddressedFile(_LocalFile):
+    __slots__ = ('__storage', )
+
+    def __init__(self, name: str, storage: 'ContentAddressedStorage') -> None:
+        # pylint: disable=protected-access
+        super().__init__(name, storage._safe_join)
+        self.__storage = storage
+
+    def delete(self) -> None:
+        # pylint: disable=protected-access
+        super().delete()
+        self.__storage._release_blob(self.name)
+
+    # This is not a useless delegation, as ``allow_hardlink`` is always
+    # passed as ``False``: the link count of the blob is used as reference
+    # count, and the blob is shared with all files with the same content, so
+    # we should never create hard links outside the storage.
+    def save_to_disk(  # pylint: disable=unused-argument,useless-super-delegation
+        self, dst_path: str, *, allow_hardlink: bool = False
+    ) -> None:
+        super().save_to_disk(dst_path, allow_hardlink=False)
+
+    # The copy is not necessarily content addressed, as the given putter
+    # might be of a different storage.
+    def copy(  # type: ignore[override]
+        self, putter: '_Putter[_LocalFile]'
+    ) -> '_LocalFile':
+        if isinstance(putter, _ContentAddressedFilePutter):
+            return putter.from_existing(self)
+        return super().copy(putter)
+
+
+class _ContentAddressedFilePutter:
+    __slots__ = ('__storage', '__new_files')
+
+    def __init__(self, storage: 'ContentAddressedStorage') -> None:
+        self.__storage = storage
+        self.__new_files: t.List[_ContentAddressedFile] = []
+
+    def _link(self, src_path: str, digest: str) -> _ContentAddressedFile:
+        # pylint: disable=protected-access
+        name = f'{digest}_{uuid.uuid4()}'
+        os.link(src_path, os_path.join(self.__storage._directory, name))
+        return self._register(name)
+
+    def _register(self, name: str) -> _ContentAddressedFile:
+        new_file = _ContentAddressedFile(name, self.__storage)
+        self.__new_files.append(new_file)
+        return new_file
+
+    def _add(
+        self, digest: str, place: t.Callable[[str], None]
+    ) -> _ContentAddressedFile:
+        """Add a file with the given digest.
+
+        :param digest: The digest of the new file.
+        :param place: Function that places the content of the new file at the
+            given location, it is only called if no file with the same
+            contents is stored yet.
+        """
+        # pylint: disable=protected-access
+        blob_path = self.__storage._blob_path(digest)
+        try:
+            return self._link(blob_path, digest)
+        except FileNotFoundError:
+            pass
+
+        name = f'{digest}_{uuid.uuid4()}'
+        dst_path = os_path.join(self.__storage._directory, name)
+        place(dst_path)
+        new_file = self._register(name)
+
+        os.makedirs(os_path.dirname(blob_path), exist_ok=True)
+        try:
+            os.link(dst_path, blob_path)
+        except FileExistsError:
+            # Somebody else stored the same content at the same time, this is
+            # not a problem, we simply do not share the storage with them.
+            pass
+
+        return new_file
+
+    def _put_stream(
+        self,
+        stream: utils.ReadableStream,
+        max_size: FileSize,
+        size: Maybe[FileSize],
+    ) -> Maybe[_ContentAddressedFile]:
+        # pylint: disable=protected-access
+        tmp_path = self.__storage._make_tmp_path()
+        try:
+            with open(tmp_path, 'wb') as dst:
+                writer = _HashingWriter(dst)
+                if size.is_just:
+                    res = utils.exact_copy(
+                        stream,
+                        dst=writer,  # type: ignore[arg-type]
+                        length=size.value,
+                    )
+                else:
+                    res = utils.limited_copy(
+                        stream,
+                        dst=writer,  # type: ignore[arg-type]
+                        max_size=max_size,
+                    )
+
+            if not res.complete:
+                return Nothing
+
+            return Just(
+                self._add(
+                    writer.hash.hexdigest(),
+                    lambda dst_path: os.replace(tmp_path, dst_path),
+                )
+            )
+        finally:
+            if os_path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def from_existing(
+        self, existing: '_LocalFile'
+    ) -> t.Union[_ContentAddressedFile, _LocalFile]:
+        """Create a new file with the same content as the given file.
+
+        If the given file is stored in this storage this is done without
+        copying any data.
+        """
+        # pylint: disable=protected-access
+        digest = self.__storage._get_digest(existing.name)
+        if digest is None:
+            return self.from_file(existing._path, move=False)
+        return self._link(existing._path, digest)
+
+    def from_file(self, src_path: str, *, move: bool) -> _ContentAddressedFile:
+        """Create a file from a file on disk.
+        """
+        assert _is_file(src_path)
+
+        digest = hashlib.sha256()
+        with open(src_path, 'rb') as src:
+            for block in iter(lambda: src.read(_HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+
+        def place(dst_path: str) -> None:
+            if move:
+                shutil.move(src=src_path, dst=dst_path)
+            else:
+                shutil.copy(src=src_path, dst=dst_path)
+
+        res = self._add(digest.hexdigest(), place)
+        if move and os_path.exists(src_path):
+            os.unlink(src_path)
+        return res
+
+    def from_string(self, source: str) -> _ContentAddressedFile:
+        """Create a file from a string.
+        """
+        data = source.encode('utf8')
+        return self._put_stream(
+            io.BytesIO(data),
+            max_size=FileSize(len(data)),
+            size=Nothing,
+        ).unsafe_extract()
+
+    def from_stream(
+        self,
+        stream: utils.ReadableStream,
+        *,
+        max_size: FileSize,
+        size: Maybe[FileSize] = Nothing,
+    ) -> Maybe[_ContentAddressedFile]:
+        """Create a file from a stream.
+        """
+        min_size = size.alt(utils.get_size_lower_bound(stream))
+        if min_size.is_just and min_size.value > max_size:
+            return Nothing
+
+        return self._put_stream(stream, max_size=max_size, size=size)
+
+    def rollback(self) -> None:
+        """Rollback all newly added files.
+        """
+        for new_file in self.__new_files:
+            try:
+                new_file.delete()
+            # pylint: disable=bare-except
+            except:  # pragma: no cover
+                pass
+
+        self.__new_files.clear()
+
+
+class ContentAddressedStorage(LocalStorage):
+    """A storage that stores files with the same content only once.
+
+    Every file is hashed when it is stored. The first file with a certain
+    content is also registered as the blob for that content, and files stored
+    later with the same content are hard links to this blob. The link count of
+    the blob is used as reference count: when it drops to one only the blob
+    itself is left, and it is removed. This also means that copying a file
+    stored in this storage does not copy any data.
+
+    The names of the files are still unique for every stored file, so this
+    storage can be used as a drop-in replacement of :class:`.LocalStorage`,
+    even for an existing directory.
+    """
+    __slots__ = ()
+
+    _BLOB_DIR = '.blobs'
+    _TMP_DIR = '.tmp'
+
+    def _blob_path(self, digest: str) -> str:
+        return os_path.join(
+            self._directory, self._BLOB_DIR, digest[:2], digest
+        )
+
+    def _make_tmp_path(self) -> str:
+        tmp_dir = os_path.join(self._directory, self._TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        return os_path.join(tmp_dir, str(uuid.uuid4()))
+
+    @staticmethod
+    def _get_digest(name: str) -> t.Optional[str]:
+        """Get the digest from the name of a file.
+
+        >>> ContentAddressedStorage._get_digest(f'{"a" * 64}_b')
+        'aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa'
+        >>> ContentAddressedStorage._get_digest(str(uuid.uuid4())) is None
+        True
+        """
+        digest, sep, _ = name.partition('_')
+        if not sep or len(digest) != 64:
+            return None
+        return digest
+
+    def _release_blob(self, name: str) -> None:
+        """Remove the blob of the given file if it is no longer used.
+        """
+        digest = self._get_digest(name)
+        if digest is None:
+            return
+
+        blob_path = self._blob_path(digest)
+        try:
+            if os.stat(blob_path).st_nlink <= 1:
+                os.unlink(blob_path)
+        except FileNotFoundError:
+            pass
+
+    def _safe_join(self, child: str) -> Maybe[str]:
+        if child.startswith('.'):
+            return Nothing
+        return super()._safe_join(child)
+
+    def get(self, name: str) -> Maybe[_LocalFile]:
+        path = self._safe_join(name)
+        return path.map(lambda _: _ContentAddressedFile(name, self))
+
+    def _get_putter(self) -> _Putter[_LocalFile]:
+        return _ContentAddressedFilePutter(self)
+
+
 Storage = _Storage[File]
 Putter = _Putter[File]
@@ -8,7 +8,7 @@ import pytest
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from cg_object_storage import LocalStorage  # isort: skip
+from cg_object_storage import LocalStorage, ContentAddressedStorage  # isort: skip
 
 
 def pytest_addoption(parser):
@@ -29,7 +29,7 @@ def storage_location():
         yield d
 
 
-@pytest.fixture(params=[LocalStorage])
+@pytest.fixture(params=[LocalStorage, ContentAddressedStorage])
 def storage_type(request):
     yield request.param
 
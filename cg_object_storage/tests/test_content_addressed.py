@@ -0,0 +1,104 @@
+import os
+import tempfile
+
+import pytest
+
+from cg_object_storage import ContentAddressedStorage
+
+
+@pytest.fixture
+def storage_type():
+    yield ContentAddressedStorage
+
+
+def _get_blobs(storage_location):
+    return [
+        os.path.join(root, f)
+        for root, _, files in os.walk(os.path.join(storage_location, '.blobs'))
+        for f in files
+    ]
+
+
+def test_duplicate_puts_share_storage(storage, storage_location):
+    with storage.putter() as p:
+        file1 = p.from_string('hello\n')
+        file2 = p.from_string('hello\n')
+        file3 = p.from_string('bye\n')
+
+    assert len({file1.name, file2.name, file3.name}) == 3
+    assert os.path.samefile(file1._path, file2._path)
+    assert not os.path.samefile(file1._path, file3._path)
+    assert len(_get_blobs(storage_location)) == 2
+
+    with storage.get(file2.name).value.open() as opened:
+        assert opened.read() == b'hello\n'
+
+
+def test_copy_does_not_copy_data(storage, storage_location, make_content):
+    with tempfile.NamedTemporaryFile() as named_temp:
+        named_temp.write(make_content(1000))
+        named_temp.flush()
+        named_temp.seek(0)
+
+        with storage.putter() as p:
+            orig = p.from_stream(named_temp, max_size=1000).value
+            copy = orig.copy(p)
+
+    assert copy.name != orig.name
+    assert os.path.samefile(orig._path, copy._path)
+    assert len(_get_blobs(storage_location)) == 1
+
+
+def test_blob_removed_after_last_delete(storage, storage_location):
+    with storage.putter() as p:
+        file1 = p.from_string('hello\n')
+        file2 = p.from_string('hello\n')
+
+    file1.delete()
+    assert storage.get(file1.name).is_nothing
+    assert len(_get_blobs(storage_location)) == 1
+
+    file2.delete()
+    assert storage.get(file2.name).is_nothing
+    assert not _get_blobs(storage_location)
+
+    # Storing the same content again should work after the blob was removed.
+    with storage.putter() as p:
+        file3 = p.from_string('hello\n')
+    with file3.open() as opened:
+        assert opened.read() == b'hello\n'
+
+
+def test_move_duplicate_file(storage):
+    with storage.putter() as p:
+        orig = p.from_string('hello\n')
+
+    with tempfile.NamedTemporaryFile(delete=False) as named_temp:
+        named_temp.write(b'hello\n')
+
+    with storage.putter() as p:
+        moved = p.from_file(named_temp.name, move=True)
+
+    assert not os.path.exists(named_temp.name)
+    assert os.path.samefile(orig._path, moved._path)
+
+
+def test_blobs_cannot_be_retrieved(storage, storage_location):
+    with storage.putter() as p:
+        p.from_string('hello\n')
+
+    blob, = _get_blobs(storage_location)
+    assert storage.get(os.path.relpath(blob, storage_location)).is_nothing
+
+
+def test_save_to_disk_never_hardlinks(storage, storage_location):
+    with storage.putter() as p:
+        file1 = p.from_string('hello\n')
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dst = os.path.join(tmpdir, 'file')
+        file1.save_to_disk(dst, allow_hardlink=True)
+        assert not os.path.samefile(dst, file1._path)
+
+    file1.delete()
+    assert _get_blobs(storage_location) == []
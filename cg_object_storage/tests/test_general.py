@@ -1,3 +1,4 @@
+import io
 import os
 import secrets
 import tempfile
@@ -160,3 +161,17 @@ def test_rollback(storage, make_content):
 )
 def test_get_non_existing(storage, name):
     assert storage.get(name).is_nothing
+
+
+@pytest.mark.parametrize('allow_hardlink', [True, False])
+def test_save_to_disk(storage, make_content, allow_hardlink):
+    content = make_content(1000)
+    with storage.putter() as p:
+        result = p.from_stream(io.BytesIO(content), max_size=1000).value
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dst = os.path.join(tmpdir, 'file')
+        result.save_to_disk(dst, allow_hardlink=allow_hardlink)
+
+        with open(dst, 'rb') as f:
+            assert f.read() == content
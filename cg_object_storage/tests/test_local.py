@@ -24,3 +24,17 @@ def test_put_by_stream(storage, storage_location, make_content, amount):
             result = p.from_stream(named_temp, max_size=100)
             assert result.is_nothing
             assert not os.listdir(storage_location)
+
+
+def test_save_to_disk_hardlink(storage, make_content):
+    with storage.putter() as p:
+        result = p.from_string('hello\n')
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        linked = os.path.join(tmpdir, 'linked')
+        copied = os.path.join(tmpdir, 'copied')
+        result.save_to_disk(linked, allow_hardlink=True)
+        result.save_to_disk(copied)
+
+        assert os.path.samefile(linked, result._path)
+        assert not os.path.samefile(copied, result._path)
@@ -2,7 +2,9 @@ import io
 
 import pytest
 
-from cg_object_storage.utils import CopyResult, exact_copy, limited_copy
+from cg_object_storage.utils import (
+    CopyResult, IteratorStream, exact_copy, limited_copy
+)
 
 
 def test_limited_copy_success():
@@ -40,3 +42,14 @@ def test_exact_copy_too_little_data(bufsize):
     dst = io.BytesIO()
     result = exact_copy(io.BytesIO(b'1234'), dst, 5, bufsize=bufsize)
     assert not result.complete
+
+
+def test_limited_copy_from_iterator():
+    dst = io.BytesIO()
+    chunks = [b'123', b'', b'4567', b'890']
+    result = limited_copy(IteratorStream(chunks), dst, 15, bufsize=4)
+    assert result == CopyResult(complete=True, amount=10)
+    assert dst.getvalue() == b'1234567890'
+
+    result = limited_copy(IteratorStream(chunks), io.BytesIO(), 5, bufsize=4)
+    assert not result.complete
@@ -21,6 +21,46 @@ class ReadableStream(Protocol):
         ...
 
 
+class IteratorStream:
+    """A readable stream that gets its data from an iterator of chunks.
+
+    >>> stream = IteratorStream(iter([b'ab', b'', b'cde']))
+    >>> stream.read(1)
+    b'a'
+    >>> stream.read(3)
+    b'bcd'
+    >>> stream.read(5)
+    b'e'
+    >>> stream.read(5)
+    b''
+    """
+
+    def __init__(self, chunks: t.Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+
+    def read(self, amount: int = -1) -> bytes:
+        """Read at most ``amount`` bytes from this stream.
+
+        :param amount: The maximum amount of bytes to read, if this is negative
+            everything is read.
+        :returns: The read data, this is only shorter than ``amount`` if the
+            iterator is exhausted.
+        """
+        while amount < 0 or len(self._buffer) < amount:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        if amount < 0:
+            amount = len(self._buffer)
+
+        res = bytes(self._buffer[:amount])
+        del self._buffer[:amount]
+        return res
+
+
 @dataclass
 class CopyResult:
     """The result after doing a checked copy.
@@ -25,6 +25,7 @@ T_CONTRA = t.TypeVar('T_CONTRA', contravariant=True)
 Z = t.TypeVar('Z')
 Y = t.TypeVar('Y')
 U = t.TypeVar('U')
+W = t.TypeVar('W')
 E = t.TypeVar('E', bound=enum.Enum)
 DbSelf = t.TypeVar('DbSelf', bound='MyDb')
 QuerySelf = t.TypeVar('QuerySelf', bound='MyNonOrderableQuery')
@@ -38,10 +39,21 @@ Never = t.NewType('Never', object)
 
 class MySession:  # pragma: no cover
     info: dict
+    identity_map: t.Any
+    new: t.Collection['Base']
+    dirty: t.Collection['Base']
+    deleted: t.Collection['Base']
 
     def bulk_save_objects(self, objs: t.Sequence['Base']) -> None:
         ...
 
+    def bulk_insert_mappings(
+        self,
+        mapper: t.Type['Base'],
+        mappings: t.Sequence[t.Mapping[str, t.Any]],
+    ) -> None:
+        ...
+
     def execute(self, query: object) -> object:
         ...
 
@@ -108,6 +120,29 @@ class MySession:  # pragma: no cover
     ) -> 'MyQuery[t.Tuple[T, Z, Y, U]]':
         ...
 
+    @t.overload  # NOQA
+    def query(
+        self,
+        __x: 'DbColumn[T]',
+        __y: 'DbColumn[Z]',
+        __z: 'DbColumn[Y]',
+        __j: 'DbColumn[U]',
+        __k: 'DbColumn[ZZ]',
+    ) -> 'MyQuery[t.Tuple[T, Z, Y, U, ZZ]]':
+        ...
+
+    @t.overload  # NOQA
+    def query(
+        self,
+        __x: 'DbColumn[T]',
+        __y: 'DbColumn[Z]',
+        __z: 'DbColumn[Y]',
+        __j: 'DbColumn[U]',
+        __k: 'DbColumn[ZZ]',
+        __l: 'DbColumn[W]',
+    ) -> 'MyQuery[t.Tuple[T, Z, Y, U, ZZ, W]]':
+        ...
+
     def query(self, *args: t.Any) -> 't.Union[MyQuery, _MyExistsQuery]':
         ...
 
@@ -211,6 +246,7 @@ class _Backref:
 if t.TYPE_CHECKING:
     Float: DbType[float]
     Integer: DbType[int]
+    BigInteger: DbType[int]
     Unicode: DbType[str]
     Boolean: DbType[bool]
     String: t.Callable[[DbSelf, int], DbType[str]]
@@ -219,13 +255,15 @@ if t.TYPE_CHECKING:
 
 else:
     from sqlalchemy.types import (
-        Float, String, Boolean, Integer, Unicode, Interval, LargeBinary
+        Float, String, Boolean, Integer, Unicode, Interval, BigInteger,
+        LargeBinary
     )
 
 
 class MyDb:  # pragma: no cover
     Float = Float
     Integer = Integer
+    BigInteger = BigInteger
     Unicode = Unicode
     Boolean = Boolean
     String = String
@@ -369,6 +407,9 @@ class MyDb:  # pragma: no cover
     ) -> t.Any:
         ...
 
+    def Index(self, name: str, *args: t.Any, **kwargs: t.Any) -> t.Any:
+        ...
+
     @t.overload
     def relationship(
         self,
@@ -638,6 +679,12 @@ class DbColumn(t.Generic[T]):  # pragma: no cover
     ) -> 'DbColumn[bool]':
         ...
 
+    def __le__(
+        self, other: t.Union[T, 'DbColumn[T]', 'DbColumn[t.Optional[T]]',
+                             'MyNonOrderableQuery[T]']
+    ) -> 'DbColumn[bool]':
+        ...
+
     def __lt__(
         self, other: t.Union[T, 'DbColumn[T]', 'DbColumn[t.Optional[T]]',
                              'MyNonOrderableQuery[T]']
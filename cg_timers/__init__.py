@@ -58,11 +58,18 @@ def init_app(app: flask.Flask) -> None:
 
 
 @contextlib.contextmanager
-def timed_code(code_block_name: str, **other_keys: object
-               ) -> t.Generator[t.Callable[[], float], None, None]:
+def timed_code(
+    code_block_name: str,
+    *,
+    counters: t.Optional[t.Mapping[str, int]] = None,
+    **other_keys: object
+) -> t.Generator[t.Callable[[], float], None, None]:
     """Measure the time it takes for the code in this context to run.
 
     :param code_block_name: Name of the measured block, for logging purposes.
+    :param counters: A mapping of counters that are updated by the code in
+        this context. Their final values are logged when the block finishes,
+        together with the rate per second of each counter.
     :param **other_keys: Keys to log along with the timing information.
     :returns: A context manager that measures its lifetime.
     """
@@ -83,12 +90,19 @@ def timed_code(code_block_name: str, **other_keys: object
         exc_info = False
     finally:
         end_time = time.time()
+        elapsed_time = end_time - start_time
+        counter_keys: t.Dict[str, float] = {}
+        for key, value in (counters or {}).items():
+            counter_keys[key] = value
+            if elapsed_time > 0:
+                counter_keys[f'{key}_per_second'] = value / elapsed_time
         logger.info(
             'Finished timed code block',
             timed_code_block=code_block_name,
             exc_info=exc_info,
             exception_occurred=exc_info,
-            elapsed_time=end_time - start_time,
+            elapsed_time=elapsed_time,
+            **counter_keys,
             **other_keys,
         )
 
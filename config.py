@@ -82,6 +82,7 @@ FlaskConfig = TypedDict(
         'IS_AUTO_TEST_RUNNER': bool,
         'AUTO_TEST_PASSWORD': str,
         'AUTO_TEST_DISABLE_ORIGIN_CHECK': bool,
+        'AUTO_TEST_REUSE_RESULTS': bool,
         'AUTO_TEST_POLL_TIME': int,
         'AUTO_TEST_OUTPUT_LIMIT': int,
         'AUTO_TEST_MEMORY_LIMIT': str,
@@ -90,6 +91,9 @@ FlaskConfig = TypedDict(
         'AUTO_TEST_BROKER_URL': str,
         'AUTO_TEST_CF_SLEEP_TIME': float,
         'AUTO_TEST_CF_EXTRA_AMOUNT': int,
+        'AUTO_TEST_STEP_RESULT_BATCH_SIZE': int,
+        'AUTO_TEST_STEP_RESULT_FLUSH_INTERVAL': float,
+        'AUTO_TEST_MAX_PREWARMED_CONTAINERS': int,
         'AUTO_TEST_MAX_OUTPUT_TAIL': int,
         'AUTO_TEST_STARTUP_COMMAND': t.Optional[str],
         'AUTO_TEST_RUNNER_INSTANCE_PASS': str,
@@ -106,6 +110,7 @@ FlaskConfig = TypedDict(
         'HEALTH_KEY': None,
         'UPLOAD_DIR': str,
         'MIRROR_UPLOAD_DIR': str,
+        'DEDUPLICATE_UPLOADS': bool,
         'DEFAULT_ROLE': str,
         '_DEFAULT_COURSE_ROLES': t.Mapping[str, t.Mapping],
         'DEFAULT_SSO_ROLE': str,
@@ -139,13 +144,18 @@ FlaskConfig = TypedDict(
         'ESLINT_PROGRAM': t.List[str],
         'PYLINT_PROGRAM': t.List[str],
         'FLAKE8_PROGRAM': t.List[str],
+        'LINTER_MAX_WORKERS': int,
+        'LINTER_BATCH_SIZE': int,
+        'RESTORE_FILES_MAX_WORKERS': int,
         'ADMIN_USER': t.Optional[str],
         'GIT_CLONE_PROGRAM': t.List[str],
         'SESSION_COOKIE_SAMESITE': Literal['None', 'Strict', 'Lax'],
         'SESSION_COOKIE_SECURE': bool,
         'SENTRY_DSN': t.Optional[str],
         'MIN_FREE_DISK_SPACE': cg_object_storage.FileSize,
-        'REDIS_CACHE_URL': str,
+        'ZIP_COMPRESSION_LEVEL': int,
+        'REDIS_CACHE_URL': t.Optional[str],
+        'COURSE_PERMISSIONS_CACHE_TTL': int,
         'RATELIMIT_STORAGE_URL': t.Optional[str],
         'JSON_SORT_KEYS': bool,
     },
@@ -309,6 +319,8 @@ if not os.path.isdir(CONFIG['MIRROR_UPLOAD_DIR']):
         ' does not exist',
     )
 
+set_bool(CONFIG, backend_ops, 'DEDUPLICATE_UPLOADS', False)
+
 with open(
     os.path.join(CONFIG['BASE_DIR'], 'seed_data', 'course_roles.json'), 'r'
 ) as f:
@@ -339,6 +351,8 @@ GB = 1024 ** 3
 min_free = backend_ops.getint('MIN_FREE_DISK_SPACE', fallback=10 * GB)
 CONFIG['MIN_FREE_DISK_SPACE'] = cg_object_storage.FileSize(min_free)
 
+set_int(CONFIG, backend_ops, 'ZIP_COMPRESSION_LEVEL', 6, min=0, max=9)
+
 
 def _set_version() -> None:
     cur_commit = subprocess.check_output(
@@ -571,6 +585,10 @@ set_list(
     ]
 )
 
+set_int(CONFIG, backend_ops, 'LINTER_MAX_WORKERS', 4, min=1)
+set_int(CONFIG, backend_ops, 'LINTER_BATCH_SIZE', 32, min=1)
+set_int(CONFIG, backend_ops, 'RESTORE_FILES_MAX_WORKERS', 8, min=1)
+
 set_list(
     CONFIG, backend_ops, 'GIT_CLONE_PROGRAM', [
         f'{os.path.dirname(os.path.abspath(__file__))}/.scripts/clone.sh',
@@ -586,6 +604,8 @@ set_str(CONFIG, backend_ops, 'ADMIN_USER', default=None)
 
 set_str(CONFIG, backend_ops, 'REDIS_CACHE_URL', None)
 
+set_int(CONFIG, backend_ops, 'COURSE_PERMISSIONS_CACHE_TTL', 300, min=0)
+
 set_str(CONFIG, backend_ops, 'RATELIMIT_STORAGE_URL', 'memory://')
 
 ############
@@ -721,10 +741,16 @@ set_float(CONFIG, auto_test_ops, 'AUTO_TEST_CF_SLEEP_TIME', 5.0)
 set_str(CONFIG, auto_test_ops, 'AUTO_TEST_RUNNER_INSTANCE_PASS', '')
 set_str(CONFIG, auto_test_ops, 'AUTO_TEST_RUNNER_CONTAINER_URL', None)
 set_int(CONFIG, auto_test_ops, 'AUTO_TEST_CF_EXTRA_AMOUNT', 20)
+set_int(CONFIG, auto_test_ops, 'AUTO_TEST_STEP_RESULT_BATCH_SIZE', 16)
+set_float(CONFIG, auto_test_ops, 'AUTO_TEST_STEP_RESULT_FLUSH_INTERVAL', 2.0)
+set_int(
+    CONFIG, auto_test_ops, 'AUTO_TEST_MAX_PREWARMED_CONTAINERS', 4, min=0
+)
 
 set_str(CONFIG, auto_test_ops, 'AUTO_TEST_BROKER_URL', '')
 set_str(CONFIG, auto_test_ops, 'AUTO_TEST_PASSWORD', None)
 set_bool(CONFIG, auto_test_ops, 'AUTO_TEST_DISABLE_ORIGIN_CHECK', False)
+set_bool(CONFIG, auto_test_ops, 'AUTO_TEST_REUSE_RESULTS', True)
 
 if CONFIG['IS_AUTO_TEST_RUNNER']:
     assert CONFIG['SQLALCHEMY_DATABASE_URI'] == 'postgresql:///codegrade_dev'
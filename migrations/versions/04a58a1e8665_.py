@@ -0,0 +1,40 @@
+"""Add plagiarism fingerprint index
+
+Revision ID: 04a58a1e8665
+Revises: f2c8a4d6e1b7
+Create Date: 2026-10-17 14:03:27.190533
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '04a58a1e8665'
+down_revision = 'f2c8a4d6e1b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('plagiarism_fingerprinted_file',
+    sa.Column('file_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.Unicode(), nullable=False),
+    sa.ForeignKeyConstraint(['file_id'], ['File.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('file_id')
+    )
+    op.create_table('plagiarism_fingerprint',
+    sa.Column('file_id', sa.Integer(), nullable=False),
+    sa.Column('fingerprint', sa.BigInteger(), nullable=False),
+    sa.Column('start_line', sa.Integer(), nullable=False),
+    sa.Column('end_line', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['file_id'], ['plagiarism_fingerprinted_file.file_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('file_id', 'fingerprint', 'start_line')
+    )
+    op.create_index(op.f('ix_plagiarism_fingerprint_fingerprint'), 'plagiarism_fingerprint', ['fingerprint'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_plagiarism_fingerprint_fingerprint'), table_name='plagiarism_fingerprint')
+    op.drop_table('plagiarism_fingerprint')
+    op.drop_table('plagiarism_fingerprinted_file')
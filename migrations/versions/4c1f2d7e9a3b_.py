@@ -0,0 +1,30 @@
+"""Add plagiarism_run_checked_work table
+
+Revision ID: 4c1f2d7e9a3b
+Revises: 0d249267d800
+Create Date: 2026-10-17 10:12:41.118514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1f2d7e9a3b'
+down_revision = '0d249267d800'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('plagiarism_run_checked_work',
+    sa.Column('work_id', sa.Integer(), nullable=False),
+    sa.Column('plagiarism_run_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['plagiarism_run_id'], ['PlagiarismRun.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['work_id'], ['Work.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('work_id', 'plagiarism_run_id')
+    )
+
+
+def downgrade():
+    op.drop_table('plagiarism_run_checked_work')
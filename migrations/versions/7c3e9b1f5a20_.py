@@ -0,0 +1,31 @@
+"""Add trigram indices for searching users
+
+Revision ID: 7c3e9b1f5a20
+Revises: 04a58a1e8665
+Create Date: 2026-10-17 16:41:09.372815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e9b1f5a20'
+down_revision = '04a58a1e8665'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS "pg_trgm"')
+    op.create_index('ix_User_name_trgm', 'User', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_User_username_trgm', 'User', ['username'], unique=False, postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'})
+    op.create_index(op.f('ix_users-courses_course_id'), 'users-courses', ['course_id'], unique=False)
+    op.create_index(op.f('ix_users-courses_user_id'), 'users-courses', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_users-courses_user_id'), table_name='users-courses')
+    op.drop_index(op.f('ix_users-courses_course_id'), table_name='users-courses')
+    op.drop_index('ix_User_username_trgm', table_name='User')
+    op.drop_index('ix_User_name_trgm', table_name='User')
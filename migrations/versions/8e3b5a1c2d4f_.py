@@ -0,0 +1,39 @@
+"""Add auto_test_suite_result_cache table
+
+Revision ID: 8e3b5a1c2d4f
+Revises: 4c1f2d7e9a3b
+Create Date: 2026-10-17 14:03:22.581734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3b5a1c2d4f'
+down_revision = '4c1f2d7e9a3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('auto_test_suite_result_cache',
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('auto_test_id', sa.Integer(), nullable=False),
+    sa.Column('work_id', sa.Integer(), nullable=False),
+    sa.Column('auto_test_suite_id', sa.Integer(), nullable=False),
+    sa.Column('cache_key', sa.Unicode(), nullable=False),
+    sa.Column('step_results', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['auto_test_id'], ['AutoTest.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['auto_test_suite_id'], ['AutoTestSuite.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['work_id'], ['Work.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_auto_test_suite_result_cache_auto_test_id'), 'auto_test_suite_result_cache', ['auto_test_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_auto_test_suite_result_cache_auto_test_id'), table_name='auto_test_suite_result_cache')
+    op.drop_table('auto_test_suite_result_cache')
@@ -0,0 +1,45 @@
+"""Add analytics snapshots
+
+Revision ID: a91d4e6c2b58
+Revises: 7c3e9b1f5a20
+Create Date: 2026-10-17 18:22:51.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91d4e6c2b58'
+down_revision = '7c3e9b1f5a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('analytics_workspace', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('analytics_snapshot',
+    sa.Column('workspace_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.Unicode(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.ForeignKeyConstraint(['workspace_id'], ['analytics_workspace.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('workspace_id', 'name')
+    )
+    op.create_table('analytics_workspace_change',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('workspace_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('work_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['workspace_id'], ['analytics_workspace.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_analytics_workspace_change_workspace_id_version', 'analytics_workspace_change', ['workspace_id', 'version'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_analytics_workspace_change_workspace_id_version', table_name='analytics_workspace_change')
+    op.drop_table('analytics_workspace_change')
+    op.drop_table('analytics_snapshot')
+    op.drop_column('analytics_workspace', 'data_version')
@@ -0,0 +1,26 @@
+"""Add points_achieved column to AutoTestResult
+
+Revision ID: b5d7e2f1a9c3
+Revises: 8e3b5a1c2d4f
+Create Date: 2026-10-17 15:21:07.334912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d7e2f1a9c3'
+down_revision = '8e3b5a1c2d4f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing results keep NULL, their points are calculated from their step
+    # results until they are updated.
+    op.add_column('AutoTestResult', sa.Column('points_achieved', sa.Float(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('AutoTestResult', 'points_achieved')
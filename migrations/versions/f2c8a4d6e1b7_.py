@@ -0,0 +1,34 @@
+"""Add is_latest column to Work
+
+Revision ID: f2c8a4d6e1b7
+Revises: b5d7e2f1a9c3
+Create Date: 2026-10-17 09:12:44.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8a4d6e1b7'
+down_revision = 'b5d7e2f1a9c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Work', sa.Column('is_latest', sa.Boolean(), server_default='false', nullable=False))
+    op.execute("""
+    UPDATE "Work" SET is_latest = true WHERE id IN (
+        SELECT DISTINCT ON ("User_id", "Assignment_id") id
+        FROM "Work"
+        WHERE NOT deleted
+        ORDER BY "User_id", "Assignment_id", created_at DESC, id DESC
+    )
+    """)
+    op.create_index('ix_Work_Assignment_id_latest', 'Work', ['Assignment_id', 'User_id'], unique=False, postgresql_where=sa.text('is_latest'))
+
+
+def downgrade():
+    op.drop_index('ix_Work_Assignment_id_latest', table_name='Work')
+    op.drop_column('Work', 'is_latest')
@@ -88,9 +88,14 @@ class PsefFlask(Flask):
         )
 
         self.file_storage: cg_object_storage.Storage
-        self.file_storage = cg_object_storage.LocalStorage(
-            self.config['UPLOAD_DIR'],
-        )
+        if self.config['DEDUPLICATE_UPLOADS']:
+            self.file_storage = cg_object_storage.ContentAddressedStorage(
+                self.config['UPLOAD_DIR'],
+            )
+        else:
+            self.file_storage = cg_object_storage.LocalStorage(
+                self.config['UPLOAD_DIR'],
+            )
         self.mirror_file_storage: cg_object_storage.Storage
         self.mirror_file_storage = cg_object_storage.LocalStorage(
             self.config['MIRROR_UPLOAD_DIR'],
@@ -150,6 +155,78 @@ class PsefFlask(Flask):
             )
         )
 
+    # Pylint bug: https://github.com/PyCQA/pylint/issues/2822
+    @cached_property
+    def course_permissions_cache(  # pylint: disable=unsubscriptable-object
+        self
+    ) -> t.Optional[cg_cache.inter_request.Backend[t.Optional[t.List[str]]]]:
+        """Get the store in which the permissions of users in courses are
+        cached, or ``None`` if this cache is disabled.
+        """
+        ttl = self.config['COURSE_PERMISSIONS_CACHE_TTL']
+        redis_url = self.config['REDIS_CACHE_URL']
+        if not ttl or redis_url is None:
+            return None
+        return cg_cache.inter_request.RedisBackend(
+            'course_permissions',
+            timedelta(seconds=ttl),
+            redis.from_url(redis_url),
+        )
+
+    # Pylint bug: https://github.com/PyCQA/pylint/issues/2822
+    @cached_property
+    def course_permissions_version_cache(  # pylint: disable=unsubscriptable-object
+        self
+    ) -> t.Optional[cg_cache.inter_request.Backend[str]]:
+        """Get the store in which the current version of the cached
+        permissions of each user in each course is stored, or ``None`` if the
+        course permissions cache is disabled.
+        """
+        ttl = self.config['COURSE_PERMISSIONS_CACHE_TTL']
+        redis_url = self.config['REDIS_CACHE_URL']
+        if not ttl or redis_url is None:
+            return None
+        return cg_cache.inter_request.RedisBackend(
+            'course_permissions_version',
+            timedelta(days=1),
+            redis.from_url(redis_url),
+        )
+
+    # Pylint bug: https://github.com/PyCQA/pylint/issues/2822
+    @cached_property
+    def site_settings_version_cache(  # pylint: disable=unsubscriptable-object
+        self
+    ) -> t.Optional[cg_cache.inter_request.Backend[str]]:
+        """Get the store in which the current version of the site settings is
+        stored, or ``None`` if no redis cache is configured.
+        """
+        redis_url = self.config['REDIS_CACHE_URL']
+        if redis_url is None:
+            return None
+        return cg_cache.inter_request.RedisBackend(
+            'site_settings', timedelta(days=1), redis.from_url(redis_url)
+        )
+
+    # Pylint bug: https://github.com/PyCQA/pylint/issues/2822
+    @cached_property
+    def proxy_path_index_cache(  # pylint: disable=unsubscriptable-object
+        self
+    ) -> t.Optional[cg_cache.inter_request.Backend[
+        'psef.models.proxy.PathIndex']]:
+        """Get the store in which the path indices of proxies are cached, or
+        ``None`` if no redis cache is configured.
+        """
+        redis_url = self.config['REDIS_CACHE_URL']
+        if redis_url is None:
+            return None
+        # Proxies expire after 30 minutes, after which their index is never
+        # used again.
+        return cg_cache.inter_request.RedisBackend(
+            'proxy_path_indices',
+            timedelta(minutes=30),
+            redis.from_url(redis_url),
+        )
+
 
 logger = structlog.get_logger()
 
@@ -42,7 +42,7 @@ from os import path
 import py7zlib
 import structlog
 
-from cg_maybe import Just, Maybe
+from cg_maybe import Just, Maybe, Nothing
 from cg_object_storage import File, Putter, FileSize
 
 from . import app, files, site_settings
@@ -161,6 +161,9 @@ class Archive(t.Generic[TT]):  # pylint: disable=unsubscriptable-object
         """Create a instance of this class from the given filename.
 
         :param filename: The path to the file as source for this archive.
+        :param fileobj: The contents of the archive. This only has to be
+            seekable for archives that cannot be streamed, like zip and 7z
+            archives.
         :returns: An instance of :class:`Archive` when the filename was a
             recognized archive format.
         """
@@ -180,15 +183,63 @@ class Archive(t.Generic[TT]):  # pylint: disable=unsubscriptable-object
     def extract(self, putter: Putter, max_size: FileSize) -> ExtractFileTree:
         """Safely extract the current archive.
 
+        Archives that support it are extracted in a single pass over their
+        source, checking every member just before it is extracted. Other
+        archives are checked completely before anything is extracted.
+
         :returns: Nothing
         """
+        if self.__archive.supports_streaming:
+            return self.__extract_archive(
+                self.__get_streamed_members(), putter, max_size
+            )
 
         self.check_files()
-        res = self.__extract_archive(putter, max_size)
-        return res
+        all_members = self.get_members()
+        files.fix_duplicate_filenames(all_members)
+        return self.__extract_archive(all_members, putter, max_size)
+
+    def __get_streamed_members(self) -> t.Iterator[ArchiveMemberInfo[TT]]:
+        """Get the members of a streaming archive, checking them one by one.
+
+        This does the same checks as :meth:`.Archive.get_members` and
+        :meth:`.Archive.check_files`, and it renames duplicate files like
+        :func:`.files.fix_duplicate_filenames`, without needing to know all
+        members upfront.
+        """
+        max_amount = site_settings.Opt.MAX_NUMBER_OF_FILES.value
+        seen_dirs: t.Set[t.Tuple[str, ...]] = set()
+        seen_files: t.Set[t.Tuple[str, ...]] = set()
+
+        for idx, member in enumerate(self.__archive.iter_stream(), 1):
+            if idx >= max_amount:
+                raise UnsafeArchive(
+                    f'Archive contains too many files, maximum is {max_amount}'
+                )
+            _check_member_destination(member)
+
+            name_list = member.name_list
+            key = tuple(name_list)
+            if member.is_dir:
+                if key in seen_dirs:
+                    continue
+            elif key in seen_dirs or key in seen_files:
+                *parents, name = name_list
+                num = 0
+                while key in seen_dirs or key in seen_files:
+                    num += 1
+                    key = (*parents, f'{name} ({num})')
+                member.name = '/'.join(key)
+
+            (seen_dirs if member.is_dir else seen_files).add(key)
+            seen_dirs.update(key[:i] for i in range(1, len(key)))
+            yield member
 
     def __extract_archive(
-        self, putter: Putter, max_size: FileSize
+        self,
+        members: t.Iterable[ArchiveMemberInfo[TT]],
+        putter: Putter,
+        max_size: FileSize,
     ) -> ExtractFileTree:
         total_size = FileSize(0)
         base = ExtractFileTree(name=self.__filename)
@@ -201,10 +252,7 @@ class Archive(t.Generic[TT]):  # pylint: disable=unsubscriptable-object
             )
             raise ArchiveTooLarge(max_size)
 
-        all_members = self.get_members()
-        files.fix_duplicate_filenames(all_members)
-
-        for member in all_members:
+        for member in members:
             if member.is_dir:
                 base.insert_dir(member.name_list)
             else:
@@ -278,35 +326,67 @@ class Archive(t.Generic[TT]):  # pylint: disable=unsubscriptable-object
         :param to_path: The path were the archive should be extracted to.
         :returns: Nothing
         """
-        _base_path = f'/{uuid.uuid4()}/'
-
         for member in self.get_members():
-            name_list = member.name_list
-            paths = (
-                path.normpath(
-                    path.realpath(path.join(_base_path, member.name))
-                ),
-                path.normpath(path.join(_base_path, member.name)),
-                path.normpath(path.join(_base_path, *name_list)),
-            )
-
-            if not name_list or any(
-                not p.startswith(_base_path) and p != _base_path for p in paths
-            ):
-                raise UnsafeArchive(
-                    'Archive member destination is outside the target'
-                    ' directory', member
-                )
+            _check_member_destination(member)
 
         if self.__archive.has_unsafe_filetypes():
             raise UnsafeArchive('The archive contains unsafe filetypes')
 
 
+def _check_member_destination(member: ArchiveMemberInfo) -> None:
+    """Check that the given member would be extracted within the target
+    directory.
+
+    :param member: The member to check.
+    :returns: Nothing
+    :raises UnsafeArchive: If the member would be extracted outside of the
+        target directory.
+    """
+    _base_path = f'/{uuid.uuid4()}/'
+    name_list = member.name_list
+    paths = (
+        path.normpath(path.realpath(path.join(_base_path, member.name))),
+        path.normpath(path.join(_base_path, member.name)),
+        path.normpath(path.join(_base_path, *name_list)),
+    )
+
+    if not name_list or any(
+        not p.startswith(_base_path) and p != _base_path for p in paths
+    ):
+        raise UnsafeArchive(
+            'Archive member destination is outside the target directory',
+            member
+        )
+
+
 class _BaseArchive(abc.ABC, t.Generic[TT]):
+    #: Can this archive be extracted using :meth:`._BaseArchive.iter_stream`.
+    supports_streaming = False
+
     @abc.abstractmethod
     def __init__(self, fileobj: t.IO[bytes]) -> None:
         raise NotImplementedError
 
+    def iter_stream(self) -> t.Iterator[ArchiveMemberInfo[TT]]:
+        """Iterate over the members of this archive in a single pass.
+
+        The members are yielded in the order they are stored in the archive,
+        and a member can only be extracted with
+        :meth:`._BaseArchive.extract_member` until the next member is
+        requested. This method should raise :class:`.UnsafeArchive` when it
+        encounters a member that would make
+        :meth:`._BaseArchive.has_unsafe_filetypes` return ``True``.
+
+        .. note::
+
+            This is only implemented by archives that set
+            :attr:`._BaseArchive.supports_streaming`.
+
+        :returns: An iterator of all the members of the archive, including
+            directories.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def extract_member(
         self, member: ArchiveMemberInfo[TT], size_left: FileSize,
@@ -376,11 +456,43 @@ class _BaseArchive(abc.ABC, t.Generic[TT]):
     ]
 )
 class _TarArchive(_BaseArchive[tarfile.TarInfo]):  # pylint: disable=unsubscriptable-object
+    supports_streaming = True
+
     def close(self) -> None:
-        self._archive.close()
+        """Close the tar archive, if it was opened.
+        """
+        if self.__archive is not None:
+            self.__archive.close()
 
     def __init__(self, fileobj: t.IO[bytes]) -> None:
-        self._archive = tarfile.open(fileobj=fileobj)
+        self.__fileobj = fileobj
+        self.__archive: t.Optional[tarfile.TarFile] = None
+
+    @property
+    def _archive(self) -> tarfile.TarFile:
+        """The opened tar archive.
+
+        Unless :meth:`._TarArchive.iter_stream` was called this archive is
+        opened for random access, which means that compressed archives are
+        decompressed again for every seek backwards.
+        """
+        if self.__archive is None:
+            self.__archive = tarfile.open(fileobj=self.__fileobj)
+        return self.__archive
+
+    def iter_stream(self) -> t.Iterator[ArchiveMemberInfo[tarfile.TarInfo]]:
+        """Iterate over the members of this tar archive in a single pass.
+
+        The archive is read (and decompressed) as a stream, so the source
+        doesn't have to be seekable and is never read twice.
+        """
+        assert self.__archive is None, 'Archive was already opened'
+        self.__archive = tarfile.open(fileobj=self.__fileobj, mode='r|*')
+
+        for member in self.__archive:
+            if not self._member_is_safe(member):
+                raise UnsafeArchive('The archive contains unsafe filetypes')
+            yield self._to_member_info(member)
 
     def extract_member(
         self, member: ArchiveMemberInfo[tarfile.TarInfo], size_left: FileSize,
@@ -397,10 +509,8 @@ class _TarArchive(_BaseArchive[tarfile.TarInfo]):  # pylint: disable=unsubscript
         assert tarinfo.isfile()
         assert getattr(tarinfo, 'sparse', None) is None
 
-        fileobj = self._archive.fileobj
+        fileobj = self._archive.extractfile(tarinfo)
         assert fileobj is not None
-        offset_data = tarinfo.offset_data  # type: ignore[attr-defined]
-        fileobj.seek(offset_data)
         return putter.from_stream(
             fileobj, max_size=size_left, size=Just(FileSize(tarinfo.size))
         )
@@ -419,13 +529,17 @@ class _TarArchive(_BaseArchive[tarfile.TarInfo]):  # pylint: disable=unsubscript
             if not self._member_is_safe(member):
                 continue
 
-            name = member.name
-            yield ArchiveMemberInfo(
-                name=name,
-                is_dir=member.isdir(),
-                size=FileSize(member.size),
-                orig_file=member,
-            )
+            yield self._to_member_info(member)
+
+    @staticmethod
+    def _to_member_info(member: tarfile.TarInfo
+                        ) -> ArchiveMemberInfo[tarfile.TarInfo]:
+        return ArchiveMemberInfo(
+            name=member.name,
+            is_dir=member.isdir(),
+            size=FileSize(member.size),
+            orig_file=member,
+        )
 
     @staticmethod
     def _member_is_safe(member: tarfile.TarInfo) -> bool:
@@ -524,7 +638,9 @@ class _ZipArchive(_BaseArchive[zipfile.ZipInfo]):  # pylint: disable=unsubscript
         :param to_path: The location to which it should be extracted.
         """
         with self._archive.open(member.orig_file) as src:
-            return putter.from_stream(src, max_size=size_left)
+            return putter.from_stream(
+                src, max_size=size_left, size=Just(member.size)
+            )
 
     def get_members(self) -> t.Iterable[ArchiveMemberInfo[zipfile.ZipInfo]]:
         """Get all members from this zip archive.
@@ -561,7 +677,11 @@ class _7ZipArchive(_BaseArchive[py7zlib.ArchiveFile]):  # pylint: disable=unsubs
         :param member: The member to extract.
         :param to_path: The location to which it should be extracted.
         """
-        # We cannot provide a maximum to read to this method...
+        # We cannot provide a maximum to read to this method, and it
+        # decompresses the entire member into memory. So make sure we don't
+        # read members that we know are too large.
+        if member.size > size_left:
+            return Nothing
         return putter.from_stream(
             io.BytesIO(member.orig_file.read()), max_size=size_left
         )
@@ -1673,6 +1673,48 @@ class AutoTestResultPermissions(CoursePermissionChecker):
         else:
             WorkPermissions(work).ensure_may_see_grade()
 
+    @classmethod
+    def filter_may_see(
+        cls,
+        results: t.Iterable['psef.models.AutoTestResult'],
+    ) -> t.List['psef.models.AutoTestResult']:
+        """Get the results the current user may see.
+
+        This returns the same results as checking :meth:`ensure_may_see` for
+        every result, but it is checked only once per run if the user may see
+        all results of that run.
+
+        :param results: The results to filter.
+        :returns: The results the current user may see, in the same order.
+        """
+        may_see_all: t.Dict[int, bool] = {}
+        res = []
+        for result in results:
+            run_id = result.auto_test_run_id
+            if run_id not in may_see_all:
+                may_see_all[run_id] = cls._may_see_all_results(result.run)
+
+            if may_see_all[run_id] or cls(result).ensure_may_see.as_bool():
+                res.append(result)
+        return res
+
+    @staticmethod
+    def _may_see_all_results(run: 'psef.models.AutoTestRun') -> bool:
+        auto_test = run.auto_test
+        checker = AutoTestPermissions(auto_test)
+        if not checker.ensure_may_see.as_bool():
+            return False
+
+        has_perm = checker.user.has_permission
+        course_id = checker.course_id
+        if not has_perm(CPerm.can_see_others_work, course_id):
+            return False
+        return (
+            auto_test.results_always_visible or
+            auto_test.assignment.is_done or
+            has_perm(CPerm.can_see_grade_before_open, course_id)
+        )
+
     @CoursePermissionChecker.as_ensure_function
     def ensure_may_see_output_files(self) -> None:
         """Make sure the current user may see the output files connected to
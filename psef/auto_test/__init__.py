@@ -16,6 +16,7 @@ import errno
 import queue
 import random
 import select
+import shutil
 import signal
 import typing as t
 import datetime
@@ -105,6 +106,13 @@ _SYSTEMD_WAIT_CMD = [
     '/bin/true',
 ]
 _REQUEST_TIMEOUT = 10
+
+# The maximum amount of bytes read from an output fifo at once. Reading large
+# chunks keeps the reader thread from burning cpu on commands that produce a
+# lot of output, as every chunk is passed to python callbacks. Reads are
+# smaller until the output limit is reached, see
+# ``StartedContainer._get_fifo_read_size``.
+_FIFO_READ_SIZE = 64 * 1024
 _REQUEST_RETRIES = 5
 _REQUEST_BACKOFF_FACTOR = 1.2
 
@@ -741,9 +749,11 @@ def _run_student(
     cont: 'AutoTestRunner',
     bc_name: str,
     cores: CpuCores,
+    warm_containers: '_WarmContainerPool',
+    prefetcher: '_StudentCodePrefetcher',
     opts: cg_worker_pool.CallbackArguments,
 ) -> None:
-    cont.run_student(bc_name, cores, opts)
+    cont.run_student(bc_name, cores, warm_containers, prefetcher, opts)
 
 
 class _BrokerSession(requests.Session):
@@ -1176,8 +1186,37 @@ class StartedContainer:
                 )
 
     @staticmethod
+    def _get_fifo_read_size(bytes_read: int, output_limit: int) -> int:
+        """Get the amount of bytes to read from an output fifo.
+
+        A single read may use at most half of the output that can still be
+        stored, so a stream that produces a lot of output can't use up the
+        entire limit before the other stream is read.
+
+        >>> StartedContainer._get_fifo_read_size(0, 32768)
+        16384
+        >>> StartedContainer._get_fifo_read_size(0, 10 * 1024 * 1024)
+        65536
+        >>> StartedContainer._get_fifo_read_size(32767, 32768)
+        1
+        >>> StartedContainer._get_fifo_read_size(40000, 32768)
+        65536
+
+        :param bytes_read: The amount of bytes read from all fifos so far.
+        :param output_limit: The maximum amount of output that is stored.
+        :returns: The maximum amount of bytes to read.
+        """
+        left = output_limit - bytes_read
+        if left <= 0:
+            return _FIFO_READ_SIZE
+        return min(_FIFO_READ_SIZE, max(left // 2, 1))
+
+    @classmethod
     def _read_fifo(
-        files: t.Mapping[str, OutputCallback], stop: LockableValue[bool]
+        cls,
+        files: t.Mapping[str, OutputCallback],
+        stop: LockableValue[bool],
+        output_limit: int,
     ) -> None:
         fds = {}
 
@@ -1188,25 +1227,34 @@ class StartedContainer:
                 f = os.open(fname, os.O_RDONLY | os.O_NONBLOCK)
                 fds[f] = callback
 
-            while fds and not stop.get():
-                reads, _, _ = select.select(list(fds.keys()), [], [], 0.5)
-                for f in reads:
-                    # Read at most 1024, this is a low value as otherwise we
-                    # might fill the limited output buffers with only one of
-                    # the two file descriptors. (see
-                    # ``_make_restricted_append`` for how the shared output
-                    # buffers work).
-                    data = os.read(f, 1024)
-                    if data:
-                        # We know that select returns a subset of its
-                        # arguments, so ``f`` should always be in ``fds``.
-                        fds[f](data)
-                    else:
-                        # This file descriptor is done, so remove it from our
-                        # dictionary. Other fds might still be active so we
-                        # don't return here.
-                        os.close(f)
-                        del fds[f]
+            counters = {'bytes_read': 0, 'reads': 0}
+            with timed_code('read_command_output', counters=counters):
+                while fds and not stop.get():
+                    reads, _, _ = select.select(list(fds.keys()), [], [], 0.5)
+                    for f in reads:
+                        # Read a single chunk of each ready file descriptor
+                        # per iteration, so both streams get a chance to fill
+                        # the limited output buffers (see
+                        # ``_make_restricted_append`` for how the shared
+                        # output buffers work).
+                        data = os.read(
+                            f,
+                            cls._get_fifo_read_size(
+                                counters['bytes_read'], output_limit
+                            ),
+                        )
+                        if data:
+                            counters['bytes_read'] += len(data)
+                            counters['reads'] += 1
+                            # We know that select returns a subset of its
+                            # arguments, so ``f`` should always be in ``fds``.
+                            fds[f](data)
+                        else:
+                            # This file descriptor is done, so remove it from
+                            # our dictionary. Other fds might still be active
+                            # so we don't return here.
+                            os.close(f)
+                            del fds[f]
         except:  # pylint: disable=bare-except
             # pragma: no cover
             logger.error(
@@ -1453,7 +1501,9 @@ class StartedContainer:
                     tail_overflowed or
                     len(data) + len(stdout_tail) > max_tail_len
                 )
-                stdout_tail.extend(data)
+                # Only the end of the data can end up in the tail, so don't
+                # copy the rest into the deque byte by byte.
+                stdout_tail.extend(memoryview(data)[-max_tail_len:])
         else:
 
             def on_stdout(data: bytes) -> None:  # pylint: disable=unused-argument
@@ -1607,7 +1657,11 @@ class StartedContainer:
 
             reader_thread = threading.Thread(
                 target=self._read_fifo,
-                args=(reader_fifo_files, stop_reader_threads)
+                args=(
+                    reader_fifo_files,
+                    stop_reader_threads,
+                    self._config['AUTO_TEST_OUTPUT_LIMIT'],
+                ),
             )
             reader_thread.start()
 
@@ -1793,6 +1847,456 @@ class AutoTestContainer:
             )
 
 
+class _WarmContainerPool:
+    """A pool of student containers that are cloned and started before they
+    are needed.
+
+    The pool is filled by a separate process, so no container is being cloned
+    by the process that forks the workers. The names of the started
+    containers are shared through a queue of a :class:`_Manager`, so they can
+    be taken by the (forked) worker processes.
+
+    The amount of containers that is kept warm is the minimum of the maximum
+    size and the amount of results that are queued but not yet started, so no
+    containers are started when there is no work left to do.
+    """
+    _POLL_INTERVAL = 0.5
+
+    def __init__(
+        self,
+        base_container: AutoTestContainer,
+        manager: _Manager,
+        *,
+        max_size: int,
+        backlog: t.Iterable[int],
+    ) -> None:
+        self._base_container = base_container
+        self._queue: 'queue.Queue[str]' = manager.Queue()
+        self._max_size = max_size
+        self._backlog: t.MutableMapping[int, bool] = manager.dict()
+        self.add_backlog(backlog)
+        self._stop = multiprocessing.Event()
+        self._process: t.Optional[multiprocessing.Process] = None
+
+    def add_backlog(self, result_ids: t.Iterable[int]) -> None:
+        """Add results that were queued to the backlog.
+
+        Adding a result that is already in the backlog does nothing, so this
+        can be called with every batch of work that is fetched.
+
+        :param result_ids: The ids of the queued results.
+        :returns: Nothing.
+        """
+        self._backlog.update(dict.fromkeys(result_ids, True))
+
+    def remove_from_backlog(self, result_id: int) -> None:
+        """Remove a result that was taken from the queue from the backlog.
+
+        This method can be called from any process.
+
+        :param result_id: The id of the result that was taken.
+        :returns: Nothing.
+        """
+        self._backlog.pop(result_id, None)
+
+    def _get_wanted_size(self) -> int:
+        return max(min(self._max_size, len(self._backlog)), 0)
+
+    def start(self) -> None:
+        """Start filling the pool in a separate process.
+        """
+        if self._max_size <= 0:
+            return
+        self._process = multiprocessing.Process(target=self._fill, daemon=True)
+        self._process.start()
+
+    def _fill(self) -> None:
+        while not self._stop.is_set():
+            if self._queue.qsize() >= self._get_wanted_size():
+                self._stop.wait(self._POLL_INTERVAL)
+                continue
+
+            cont = None
+            try:
+                cont = self._base_container.clone()
+                cont.start_container()
+            except StopContainerException:
+                if cont is not None:
+                    self._discard(cont.name)
+                return
+            except:  # pylint: disable=bare-except
+                logger.warning('Could not pre-warm container', exc_info=True)
+                if cont is not None:
+                    self._discard(cont.name)
+                self._stop.wait(self._POLL_INTERVAL)
+            else:
+                self._queue.put(cont.name)
+
+    def take(
+        self,
+        config: 'psef.FlaskConfig',
+        maybe_quit_running: MaybeQuitRunning,
+    ) -> t.Optional[AutoTestContainer]:
+        """Take a started container from the pool.
+
+        This method can be called from any process.
+
+        :returns: The started container, or ``None`` if the pool is empty.
+        """
+        try:
+            name = self._queue.get_nowait()
+        except queue.Empty:
+            return None
+        return AutoTestContainer(
+            name, config, maybe_quit_running=maybe_quit_running
+        )
+
+    def stop(self) -> None:
+        """Stop filling the pool and destroy all containers still in it.
+        """
+        self._stop.set()
+        if self._process is not None:
+            self._process.join()
+
+        while True:
+            try:
+                name = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(name)
+
+    @staticmethod
+    def _discard(name: str) -> None:
+        try:
+            cont = lxc.Container(name)
+            _stop_container(cont)
+            cont.destroy()
+        except:  # pylint: disable=bare-except
+            logger.warning(
+                'Could not destroy pre-warmed container',
+                container_name=name,
+                exc_info=True,
+            )
+
+
+class _StudentCodePrefetcher:
+    """Download the code of upcoming students on the host, while earlier
+    students are still being tested.
+
+    The downloads are done by threads in the process that created the
+    prefetcher, and stored in a directory on the host so they can be taken by
+    the (forked) worker processes. At most ``max_amount`` downloaded archives
+    are stored at the same time.
+
+    When a worker tries to take the code of a result a marker file is created
+    for that result, even if it was not downloaded yet and the worker falls
+    back to downloading the code itself. Downloads for marked results are not
+    started, and archives for them that finish later on are deleted directly.
+    """
+    _POLL_INTERVAL = 0.5
+
+    def __init__(
+        self,
+        download: t.Callable[[int, t.BinaryIO], None],
+        *,
+        max_amount: int,
+        amount_threads: int = 2,
+    ) -> None:
+        self._download = download
+        self._max_amount = max_amount
+        self._amount_threads = amount_threads
+        self._tmpdir = tempfile.mkdtemp()
+        self._todo: 'queue.Queue[int]' = queue.Queue()
+        self._seen: t.Set[int] = set()
+        self._stop = threading.Event()
+        self._threads: t.List[threading.Thread] = []
+
+    def _get_path(self, result_id: int) -> str:
+        return os.path.join(self._tmpdir, f'{result_id}.zip')
+
+    def _get_claim_path(self, result_id: int) -> str:
+        return os.path.join(self._tmpdir, f'{result_id}.claimed')
+
+    def _is_claimed(self, result_id: int) -> bool:
+        return os.path.exists(self._get_claim_path(result_id))
+
+    def start(self) -> None:
+        """Start the threads that do the downloading.
+        """
+        if self._max_amount <= 0:
+            return
+        for _ in range(self._amount_threads):
+            thread = threading.Thread(target=self._fetch_loop, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def prefetch(self, result_ids: t.Iterable[int]) -> None:
+        """Schedule the code of the given results to be downloaded.
+
+        Results that were already scheduled before are ignored.
+
+        :param result_ids: The ids of the results, in the order they will
+            probably be run.
+        :returns: Nothing.
+        """
+        for result_id in result_ids:
+            if result_id not in self._seen:
+                self._seen.add(result_id)
+                self._todo.put(result_id)
+
+    def _has_room(self) -> bool:
+        amount = 0
+        for name in os.listdir(self._tmpdir):
+            result_id, _, ext = name.partition('.')
+            # Downloads for results that are already claimed will be deleted
+            # when they are done, so they should not take up room.
+            if ext in ('zip', 'zip.part'):
+                if not self._is_claimed(int(result_id)):
+                    amount += 1
+        return amount < self._max_amount
+
+    def _fetch_loop(self) -> None:
+        while not self._stop.is_set():
+            if not self._has_room():
+                self._stop.wait(self._POLL_INTERVAL)
+                continue
+            try:
+                result_id = self._todo.get(timeout=self._POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+            if self._is_claimed(result_id):
+                continue
+
+            dst = self._get_path(result_id)
+            # Write to a file with another extension first, so a worker never
+            # takes an archive that is only partially downloaded.
+            tmp_dst = f'{dst}.part'
+            try:
+                with timed_code(
+                    'prefetch_student_code', result_id=result_id
+                ), open(tmp_dst, 'wb') as f:
+                    self._download(result_id, f)
+                os.rename(tmp_dst, dst)
+                # The result might have been claimed while we were downloading,
+                # in which case nobody will take this archive anymore.
+                if self._is_claimed(result_id):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.unlink(dst)
+            except:  # pylint: disable=bare-except
+                logger.warning(
+                    'Could not prefetch student code',
+                    result_id=result_id,
+                    exc_info=True,
+                )
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(tmp_dst)
+
+    def take(self, result_id: int) -> t.Optional[bytes]:
+        """Take the downloaded code of the given result.
+
+        This method can be called from any process.
+
+        :param result_id: The result to get the code for.
+        :returns: The zip archive with the code of the student, or ``None`` if
+            it was not (yet) downloaded.
+        """
+        # Mark the result as claimed before checking for the archive, so an
+        # archive that is finished after this check is always deleted.
+        with contextlib.suppress(FileNotFoundError), open(
+            self._get_claim_path(result_id), 'w'
+        ):
+            pass
+
+        path = self._get_path(result_id)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+        return data
+
+    def stop(self) -> None:
+        """Stop downloading and remove all stored archives.
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+
+class _StepResultBatcher:
+    """This class buffers the updates of step results of a single result, and
+    sends them to the server in bulk.
+
+    Updates for the same step are coalesced, so only the newest state of each
+    step is sent. The buffer is flushed when it contains ``max_size`` steps,
+    every ``flush_interval`` seconds while it is used as a context manager,
+    and when the context manager is exited. Updates with an attachment flush
+    the buffer and are then send directly.
+
+    If ``max_size`` is one or lower every update is send directly.
+    """
+
+    def __init__(
+        self,
+        get_session: t.Callable[[], requests.Session],
+        url: str,
+        *,
+        max_size: int,
+        flush_interval: float,
+    ) -> None:
+        self._get_session = get_session
+        self._url = url
+        self._max_size = max_size
+        self._flush_interval = flush_interval
+
+        self._lock = threading.RLock()
+        self._pending: t.Dict[int, t.Dict[str, object]] = {}
+        self._step_result_ids: t.Dict[int, int] = {}
+        self._stop_flushing = threading.Event()
+        self._flush_thread: t.Optional[threading.Thread] = None
+
+    @property
+    def is_batching(self) -> bool:
+        """Are updates buffered by this batcher.
+        """
+        return self._max_size > 1
+
+    def _with_id(self, step_id: int,
+                 data: t.Dict[str, object]) -> t.Dict[str, object]:
+        if step_id in self._step_result_ids:
+            return {**data, 'id': self._step_result_ids[step_id]}
+        return data
+
+    def _put_single(
+        self, step_id: int, data: t.Dict[str, object],
+        attachment: t.Optional[t.IO[bytes]]
+    ) -> None:
+        data = self._with_id(step_id, data)
+        logger.info('Posting result data', json=data, url=self._url)
+
+        if attachment is not None:
+            json_data = io.StringIO()
+            json.dump(data, json_data)
+            json_data.seek(0, 0)
+
+            response = self._get_session().put(
+                self._url,
+                files={
+                    'attachment': attachment,
+                    'json': json_data,
+                },
+                timeout=_REQUEST_TIMEOUT,
+            )
+        else:
+            response = self._get_session().put(
+                self._url,
+                json=data,
+                timeout=_REQUEST_TIMEOUT,
+            )
+        logger.info('Posted result data', response=response)
+        response.raise_for_status()
+        self._step_result_ids[step_id] = response.json()['id']
+
+    def update(
+        self,
+        state: 'models.AutoTestStepResultState',
+        log: t.Dict[str, object],
+        test_step: 'StepInstructions',
+        attachment: t.Optional[t.IO[bytes]] = None,
+    ) -> None:
+        """Update the result of the given step.
+
+        :param state: The new state of the step.
+        :param log: The new log of the step.
+        :param test_step: The step of which the result should be updated.
+        :param attachment: An optional attachment of the step.
+        """
+        step_id = test_step['id']
+        data = {
+            'log': log,
+            'state': state.name,
+            'auto_test_step_id': step_id,
+            'has_attachment': attachment is not None,
+        }
+
+        with self._lock:
+            if not self.is_batching or attachment is not None:
+                self.flush()
+                self._put_single(step_id, data, attachment)
+                return
+
+            self._pending[step_id] = data
+            if len(self._pending) >= self._max_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """Send all buffered updates to the server in a single request.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+
+            step_ids = list(self._pending)
+            data = [
+                self._with_id(step_id, self._pending[step_id])
+                for step_id in step_ids
+            ]
+            url = f'{self._url}bulk/'
+            logger.info(
+                'Posting batched result data', amount=len(data), url=url
+            )
+            response = self._get_session().put(
+                url, json=data, timeout=_REQUEST_TIMEOUT
+            )
+            logger.info('Posted batched result data', response=response)
+            response.raise_for_status()
+
+            for step_id, step_result in zip(step_ids, response.json()):
+                self._step_result_ids[step_id] = step_result['id']
+            self._pending.clear()
+
+    def _flush_periodically(self) -> None:
+        while not self._stop_flushing.wait(self._flush_interval):
+            try:
+                self.flush()
+            # This thread should never stop before the batcher is closed, as
+            # then updates would only be sent when the batcher is closed.
+            except Exception:  # pylint: disable=broad-except
+                logger.warning(
+                    'Flushing step results failed, retrying later',
+                    exc_info=True,
+                )
+
+    def __enter__(self) -> '_StepResultBatcher':
+        if self.is_batching:
+            self._stop_flushing.clear()
+            self._flush_thread = threading.Thread(
+                target=self._flush_periodically, daemon=True
+            )
+            self._flush_thread.start()
+        return self
+
+    def __exit__(
+        self, exc_type: object, exc_value: object, traceback: object
+    ) -> None:
+        if self._flush_thread is not None:
+            self._stop_flushing.set()
+            self._flush_thread.join()
+            self._flush_thread = None
+
+        if exc_type is None:
+            self.flush()
+        else:
+            try:
+                self.flush()
+            except NETWORK_EXCEPTIONS:
+                logger.warning('Could not flush step results', exc_info=True)
+
+
 class AutoTestRunner:
     """This class contains all functionality needed to run a single AutoTest.
     """
@@ -1820,6 +2324,8 @@ class AutoTestRunner:
         self._reqs: t.Dict[t.Tuple[int, int], requests.Session] = {}
 
         self._stop_running = multiprocessing.Event()
+        self._warm_containers: t.Optional[_WarmContainerPool] = None
+        self._prefetcher: t.Optional[_StudentCodePrefetcher] = None
 
     def _stop_running_is_set(self) -> bool:
         return self._stop_running.is_set()
@@ -1870,14 +2376,22 @@ class AutoTestRunner:
         self,
         base_container_name: str,
         cpu_cores: CpuCores,
+        warm_containers: _WarmContainerPool,
+        prefetcher: _StudentCodePrefetcher,
     ) -> cg_worker_pool.WorkerPool:
         mult = int(self._should_poll_after_done(self.instructions))
 
         return cg_worker_pool.WorkerPool(
             # Over provision a bit so clones can be made quicker.
             processes=self._get_amount_of_needed_workers(),
-            function=lambda get_work:
-            _run_student(self, base_container_name, cpu_cores, get_work),
+            function=lambda get_work: _run_student(
+                self,
+                base_container_name,
+                cpu_cores,
+                warm_containers,
+                prefetcher,
+                get_work,
+            ),
             sleep_time=self.config['AUTO_TEST_CF_SLEEP_TIME'],
             extra_amount=mult * self.config['AUTO_TEST_CF_EXTRA_AMOUNT'],
             initial_work=self.work,
@@ -1893,7 +2407,12 @@ class AutoTestRunner:
         )
         res = self.req.get(str(url), timeout=_REQUEST_TIMEOUT)
         res.raise_for_status()
-        return [cg_worker_pool.Work(**item) for item in res.json()]
+        work = [cg_worker_pool.Work(**item) for item in res.json()]
+        if self._warm_containers is not None:
+            self._warm_containers.add_backlog(w.result_id for w in work)
+        if self._prefetcher is not None:
+            self._prefetcher.prefetch(w.result_id for w in work)
+        return work
 
     @staticmethod
     def _make_req_key() -> t.Tuple[int, int]:
@@ -1995,6 +2514,24 @@ class AutoTestRunner:
         cont.run_command(['chmod', '-R', '750', dst], user=CODEGRADE_USER)
         logger.info('Downloaded file', dst=dst, url=url)
 
+    def _download_student_code_on_host(
+        self, result_id: int, dst: t.BinaryIO
+    ) -> None:
+        """Download the code of a student to a file on the host.
+
+        :param result_id: The id of the result to download the code for.
+        :param dst: The file to write the zip archive to.
+        """
+        with self.req.get(
+            f'{self.base_url}/results/{result_id}',
+            params={'type': 'submission_files'},
+            stream=True,
+            timeout=_REQUEST_TIMEOUT,
+        ) as res:
+            res.raise_for_status()
+            for chunk in res.iter_content(chunk_size=64 * 1024):
+                dst.write(chunk)
+
     def download_fixtures(self, cont: StartedContainer) -> None:
         """Download all the fixtures of this test.
 
@@ -2015,15 +2552,31 @@ class AutoTestRunner:
 
     @timed_function
     def download_student_code(
-        self, cont: StartedContainer, result_id: int
+        self,
+        cont: StartedContainer,
+        result_id: int,
+        prefetched_code: t.Optional[bytes] = None,
     ) -> None:
         """Download the code of the student.
 
         :param cont: The lxc container in which to download the code.
         :param result_id: The id of the code which should be downloaded.
+        :param prefetched_code: The zip archive with the code of the student,
+            if it was already downloaded on the host. In this case the archive
+            is copied into the container instead of downloaded.
         """
-        url = f'results/{result_id}?type=submission_files'
-        self.download_file(cont, url, 'student.zip')
+        if prefetched_code is None:
+            url = f'results/{result_id}?type=submission_files'
+            self.download_file(cont, url, 'student.zip')
+        else:
+            dst = f'{_get_home_dir(CODEGRADE_USER)}/student.zip'
+            cont.run_command(
+                ['dd', f'of={dst}', 'status=none'],
+                stdin=prefetched_code,
+                user=CODEGRADE_USER,
+            )
+            cont.run_command(['chmod', '750', dst], user=CODEGRADE_USER)
+            logger.info('Copied prefetched student code', dst=dst)
 
         cont.run_command(
             [
@@ -2105,56 +2658,16 @@ class AutoTestRunner:
             submission_info=test_suite.get('submission_info', False),
         )
 
-        step_result_id: t.Optional[int] = None
-
-        def outer_update_test_result(
-            state: models.AutoTestStepResultState,
-            log: t.Dict[str, object],
-            test_step: StepInstructions,
-            attachment: t.Optional[t.IO[bytes]],
-        ) -> None:
-            nonlocal step_result_id
-            data = {
-                'log': log,
-                'state': state.name,
-                'auto_test_step_id': test_step['id'],
-                'has_attachment': attachment is not None,
-            }
-            if step_result_id is not None:
-                data['id'] = step_result_id
-
-            logger.info('Posting result data', json=data, url=url)
-            if attachment is not None:
-                json_data = io.StringIO()
-                json.dump(data, json_data)
-                json_data.seek(0, 0)
-
-                response = self.req.put(
-                    url,
-                    files={
-                        'attachment': attachment,
-                        'json': json_data,
-                    },
-                    timeout=_REQUEST_TIMEOUT,
-                )
-            else:
-                response = self.req.put(
-                    url,
-                    json=data,
-                    timeout=_REQUEST_TIMEOUT,
-                )
-            logger.info('Posted result data', response=response)
-            response.raise_for_status()
-            step_result_id = response.json()['id']
-
         with student_container.as_snapshot(
             test_suite['network_disabled']
-        ) as snap, snap.extra_env(extra_env):
-            url = f'{self.base_url}/results/{result_id}/step_results/'
-
+        ) as snap, snap.extra_env(extra_env), _StepResultBatcher(
+            lambda: self.req,
+            f'{self.base_url}/results/{result_id}/step_results/',
+            max_size=self.config['AUTO_TEST_STEP_RESULT_BATCH_SIZE'],
+            flush_interval=self.config['AUTO_TEST_STEP_RESULT_FLUSH_INTERVAL'],
+        ) as batcher:
             for idx, test_step in enumerate(test_suite['steps']):
                 logger.info('Running step', step=test_step)
-                step_result_id = None
 
                 def update_test_result(
                     state: models.AutoTestStepResultState,
@@ -2163,7 +2676,7 @@ class AutoTestRunner:
                     attachment: t.Optional[t.IO[bytes]] = None,
                     test_step: StepInstructions = test_step,
                 ) -> None:
-                    return outer_update_test_result(
+                    return batcher.update(
                         state, log, test_step=test_step, attachment=attachment
                     )
 
@@ -2259,6 +2772,8 @@ class AutoTestRunner:
         cont: StartedContainer,
         cpu: CpuCores.Core,
         result_id: int,
+        prefetched_code: t.Optional[bytes] = None,
+        reused_suites: t.Mapping[int, t.Tuple[float, float]] = None,
     ) -> bool:
         # TODO: Split this function
         result_url = f'{self.base_url}/results/{result_id}'
@@ -2278,7 +2793,7 @@ class AutoTestRunner:
                     self.config['AUTO_TEST_MEMORY_LIMIT']
                 )
 
-            self.download_student_code(cont, result_id)
+            self.download_student_code(cont, result_id, prefetched_code)
 
             cont.move_fixtures_dir(uuid.uuid4().hex)
             self._maybe_run_setup(cont, self.setup_script, result_url)
@@ -2313,10 +2828,20 @@ class AutoTestRunner:
 
             for test_set in self.instructions['sets']:
                 for test_suite in test_set['suites']:
-                    cont.move_fixtures_dir(uuid.uuid4().hex)
-                    achieved_points, suite_points = self._run_test_suite(
-                        cont, result_id, test_suite, cpu
-                    )
+                    if reused_suites and test_suite['id'] in reused_suites:
+                        # The results of this suite were copied from a
+                        # previous run by the server.
+                        achieved_points, suite_points = reused_suites[
+                            test_suite['id']]
+                        logger.info(
+                            'Reusing suite results',
+                            suite_id=test_suite['id'],
+                        )
+                    else:
+                        cont.move_fixtures_dir(uuid.uuid4().hex)
+                        achieved_points, suite_points = self._run_test_suite(
+                            cont, result_id, test_suite, cpu
+                        )
                     total_points += achieved_points
                     possible_points += suite_points
                     logger.info(
@@ -2371,23 +2896,34 @@ class AutoTestRunner:
                 )
 
     def run_student(
-        self, base_container_name: str, cpu_cores: CpuCores,
-        opts: cg_worker_pool.CallbackArguments
+        self,
+        base_container_name: str,
+        cpu_cores: CpuCores,
+        warm_containers: _WarmContainerPool,
+        prefetcher: _StudentCodePrefetcher,
+        opts: cg_worker_pool.CallbackArguments,
     ) -> None:
         """Run the test for a single student.
 
         :param base_container_name: The name of the base lxc container.
         :param cpu_cores: The cpu cores which are available during testing.
-        :param result_id: The id of the student to run.
+        :param warm_containers: The pool of already started containers, a new
+            container is only cloned when this pool is empty.
+        :param prefetcher: The prefetcher that might already have downloaded
+            the code of the student.
         :param opts: The way to get work from the worker pool.
         :returns: Nothing.
         """
-        base_container = AutoTestContainer(
-            base_container_name,
-            self.config,
-            maybe_quit_running=self._maybe_quit_running
+        student_container = warm_containers.take(
+            self.config, self._maybe_quit_running
         )
-        student_container = base_container.clone()
+        if student_container is None:
+            base_container = AutoTestContainer(
+                base_container_name,
+                self.config,
+                maybe_quit_running=self._maybe_quit_running
+            )
+            student_container = base_container.clone()
 
         def retry_work(work: cg_worker_pool.Work) -> None:
             try:
@@ -2410,6 +2946,7 @@ class AutoTestRunner:
                 if work is None:
                     return
                 result_id = work.result_id
+                warm_containers.remove_from_backlog(result_id)
 
                 with cpu_cores.reserved_core() as cpu:
                     patch_res = self.req.patch(
@@ -2430,11 +2967,28 @@ class AutoTestRunner:
                             retry_work(work)
                         continue
 
-                    if patch_res.json()['taken']:
+                    # Always take the prefetched code, so it is removed from
+                    # the host when the result was already taken.
+                    prefetched_code = prefetcher.take(result_id)
+                    patch_json = patch_res.json()
+                    if patch_json['taken']:
                         opts.mark_work_as_finished(work)
                     else:
+                        reused_suites = {
+                            suite['id']: (
+                                suite['achieved_points'],
+                                suite['possible_points'],
+                            )
+                            for suite in patch_json.get('reused_suites', [])
+                        }
                         with cg_logger.bound_to_logger(result_id=result_id):
-                            if self._run_student(cont, cpu, result_id):
+                            if self._run_student(
+                                cont,
+                                cpu,
+                                result_id,
+                                prefetched_code,
+                                reused_suites,
+                            ):
                                 opts.mark_work_as_finished(work)
                             else:
                                 # Student didn't finish correctly. So put back
@@ -2623,8 +3177,28 @@ class AutoTestRunner:
             # Known issue from typeshed:
             # https://github.com/python/typeshed/issues/3018
             cpu_cores: CpuCores = CpuCores(t.cast(_Manager, manager))
-            pool = self._make_worker_pool(base_container.name, cpu_cores)
+            warm_containers = _WarmContainerPool(
+                base_container,
+                t.cast(_Manager, manager),
+                max_size=min(
+                    self.config['AUTO_TEST_MAX_PREWARMED_CONTAINERS'],
+                    self._get_amount_of_needed_workers(),
+                ),
+                backlog=(w.result_id for w in self.work),
+            )
+            prefetcher = _StudentCodePrefetcher(
+                self._download_student_code_on_host,
+                max_amount=self._get_amount_of_needed_workers(),
+            )
+            prefetcher.prefetch(w.result_id for w in self.work)
+            pool = self._make_worker_pool(
+                base_container.name, cpu_cores, warm_containers, prefetcher
+            )
 
+            self._warm_containers = warm_containers
+            self._prefetcher = prefetcher
+            warm_containers.start()
+            prefetcher.start()
             try:
                 pool.start(self._work_producer)
             except:
@@ -2634,3 +3208,7 @@ class AutoTestRunner:
                 logger.info('Done with containers, cleaning up')
             finally:
                 self._set_stop_running()
+                self._warm_containers = None
+                self._prefetcher = None
+                warm_containers.stop()
+                prefetcher.stop()
@@ -284,7 +284,7 @@ class ExtractFileTree(ExtractFileTreeDirectory):
 
         return cur
 
-    def remove_leading_self(self) -> None:
+    def remove_leading_self(self) -> ExtractFileTreeDirectory:
         """Removing leading directories in this directory.
 
         This function checks if this directory contains exactly one directory,
@@ -293,6 +293,9 @@ class ExtractFileTree(ExtractFileTreeDirectory):
         modified in place.
 
         If one of the conditions don't hold a :exc:`AssertionError` is raised.
+
+        :returns: The removed directory, which can be given to
+            :meth:`.ExtractFileTree.restore_leading_dir`.
         """
         maybe_only_child = self.only_child
         assert maybe_only_child.is_just
@@ -304,3 +307,20 @@ class ExtractFileTree(ExtractFileTreeDirectory):
             grandchild.parent = self
 
         self._lookup = {c.name: c for c in only_child.values}
+        return only_child
+
+    def restore_leading_dir(self, directory: ExtractFileTreeDirectory) -> None:
+        """Undo a call to :meth:`.ExtractFileTree.remove_leading_self`.
+
+        The content of this directory should be the same as after the call
+        to ``remove_leading_self``.
+
+        :param directory: The directory that was removed.
+        """
+        assert directory.parent is None
+        assert set(self._lookup) == set(directory._lookup)  # pylint: disable=protected-access
+
+        for child in directory.values:
+            child.parent = directory
+        self._lookup = {}
+        self.add_child(directory)
@@ -8,11 +8,12 @@ import io
 import os
 import re
 import sys
-import copy
 import typing as t
 import tarfile
 import zipfile
+import functools
 from collections import Counter, defaultdict
+from dataclasses import dataclass
 
 import structlog
 from typing_extensions import Protocol, TypedDict
@@ -22,6 +23,7 @@ import psef
 import cg_helpers
 import psef.models as models
 import cg_object_storage
+from cg_dt_utils import DatetimeWithTimezone
 from cg_object_storage import FileSize
 
 from . import app, archive, helpers, blackboard
@@ -255,6 +257,122 @@ class FileTree(t.Generic[T]):
         }
 
 
+@dataclass(frozen=True)
+class ZipMember:
+    """A single member of a zip archive created by :func:`stream_zip`.
+    """
+    #: The path of the member inside the archive.
+    path: str
+    #: The modification date that should be stored for this member.
+    modification_date: DatetimeWithTimezone
+    #: The file containing the contents of this member, or ``None`` if the
+    #: member is a directory.
+    backing_file: t.Optional[cg_object_storage.File]
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """A write only stream that buffers everything written to it, so that it
+    can be yielded by :func:`stream_zip`.
+
+    This stream is not seekable, which makes :class:`zipfile.ZipFile` write
+    data descriptors instead of seeking back to update the local headers.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: t.List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: t.Any) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def pop_data(self) -> bytes:
+        """Get and remove all data written since the last call.
+        """
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(
+    members: t.Iterable[ZipMember],
+    *,
+    compression: int = zipfile.ZIP_DEFLATED,
+    compresslevel: t.Optional[int] = None,
+    chunk_size: int = 64 * 1024,
+) -> t.Iterator[bytes]:
+    """Create a zip archive of the given members in a streaming fashion.
+
+    The contents of the members are read directly from their backing files, so
+    nothing is written to disk and only a small part of the archive is kept in
+    memory at any time.
+
+    :param members: The members that should be in the archive, directories
+        should be given before their children.
+    :param compression: The compression method that should be used for files,
+        use :data:`zipfile.ZIP_STORED` to disable compression.
+    :param compresslevel: The compression level that should be used.
+    :param chunk_size: The amount of bytes read at once from the backing files.
+    :returns: An iterator producing the archive in chunks.
+    """
+    buf = _ZipStreamBuffer()
+
+    with zipfile.ZipFile(
+        t.cast(t.IO[bytes], buf),
+        'w',
+        compression=compression,
+        compresslevel=compresslevel,
+    ) as zipf:
+        for member in members:
+            date_time = DatetimeWithTimezone.as_datetime(
+                member.modification_date
+            ).timetuple()[:6]
+
+            if member.backing_file is None:
+                path = member.path.rstrip('/') + '/'
+                zinfo = zipfile.ZipInfo(path, date_time)
+                zinfo.external_attr = (0o40755 << 16) | 0x10
+                zipf.writestr(zinfo, b'')
+            else:
+                zinfo = zipfile.ZipInfo(member.path, date_time)
+                zinfo.external_attr = 0o644 << 16
+                zinfo.compress_type = compression
+                # Members opened with a ``ZipInfo`` don't get the compression
+                # level of the archive, and ``zipfile`` has no public way to
+                # set it for a single member that is written in chunks.
+                # pylint: disable=protected-access
+                zinfo._compresslevel = compresslevel  # type: ignore
+                # Setting the size makes sure zip64 extensions are used when
+                # needed, as we cannot seek back to add them later on.
+                zinfo.file_size = member.backing_file.size
+
+                with member.backing_file.open() as src, zipf.open(
+                    zinfo, 'w'
+                ) as dst:
+                    for chunk in iter(
+                        functools.partial(src.read, chunk_size), b''
+                    ):
+                        dst.write(chunk)
+                        data = buf.pop_data()
+                        if data:
+                            yield data
+
+            data = buf.pop_data()
+            if data:
+                yield data
+
+    yield buf.pop_data()
+
+
 class IgnoredFilesException(APIException):
     """The exception used when a permission check fails.
     """
@@ -276,7 +394,7 @@ class IgnoredFilesException(APIException):
             api_code=APICodes.INVALID_FILE_IN_ARCHIVE,
             status_code=400,
             invalid_files=[
-                [d.deleted_file.get_full_name(), d.reason]
+                [d.fullname, d.reason]
                 for d in self.invalid_files
                 if d.deletion_type != DeletionType.leading_directory
             ],
@@ -390,6 +508,56 @@ def search_path_in_filetree(filetree: FileTree[T], path: str) -> T:
     return cur.file_id
 
 
+class FileTreePathIndex(t.Generic[T]):
+    """An index to quickly find files in a :class:`FileTree` by their path.
+
+    The index is built once, after which every lookup is a single dictionary
+    access instead of a walk through the tree. It finds the same files as
+    :func:`search_path_in_filetree`.
+
+    >>> tree = FileTree('root', 1, [
+    ...     FileTree('file1.txt', 2, None),
+    ...     FileTree('subdir', 3, [FileTree('file2.txt', 4, None)]),
+    ... ])
+    >>> index = FileTreePathIndex(tree)
+    >>> index.search('file1.txt')
+    2
+    >>> index.search('/subdir//file2.txt')
+    4
+    >>> index.search('')
+    1
+    >>> index.search('subdir/file3.txt')
+    Traceback (most recent call last):
+    ...
+    KeyError: 'Path (subdir/file3.txt) not in tree'
+    """
+    __slots__ = ('_lookup', )
+
+    def __init__(self, filetree: FileTree[T]) -> None:
+        self._lookup: t.Dict[str, T] = {}
+        todo = [('', filetree)]
+        while todo:
+            prefix, cur = todo.pop()
+            # ``search_path_in_filetree`` finds the first entry with a given
+            # name, so we should never overwrite an existing path.
+            self._lookup.setdefault(prefix, cur.file_id)
+            for entry in reversed(cur.entries or []):
+                todo.append((f'{prefix}/{entry.name}', entry))
+
+    def search(self, path: str) -> T:
+        """Search for a path in the indexed filetree.
+
+        :param path: The path the search for, relative to the root of the
+            tree.
+        :returns: The id of the file associated with the path.
+        """
+        key = ''.join(f'/{part}' for part in path.split('/') if part)
+        try:
+            return self._lookup[key]
+        except KeyError:
+            raise KeyError(f'Path ({path}) not in tree') from None
+
+
 def rename_directory_structure(
     rootdir: str,
     putter: cg_object_storage.Putter,
@@ -634,25 +802,27 @@ def _process_files(
             400,
         )
 
-    original_tree = copy.deepcopy(tree)
-    tree, total_changes, missing_files = ignore_filter.process_submission(
-        tree, handle_ignore
-    )
+    processed = ignore_filter.process_submission(tree, handle_ignore)
     actual_file_changes = any(
         c.deletion_type != DeletionType.leading_directory
-        for c in total_changes
+        for c in processed.changes
     )
-    if missing_files or (
+    if processed.missing_files or (
         handle_ignore == IgnoreHandling.error and actual_file_changes
     ):
+        # Reverting makes ``tree`` the original tree again, so we don't need to
+        # make a copy before processing to report it.
+        processed.revert()
         raise IgnoredFilesException(
-            total_changes,
+            processed.changes,
             ignore_filter.CGIGNORE_VERSION,
-            original_tree=original_tree,
-            missing_files=missing_files,
+            original_tree=tree,
+            missing_files=processed.missing_files,
         )
 
-    logger.info('Removing files', removed_files=total_changes)
+    logger.info('Removing files', removed_files=processed.changes)
+    processed.delete_removed_files()
+    tree = processed.tree
 
     # It did contain files before deleting, so the deletion caused the tree to
     # be empty.
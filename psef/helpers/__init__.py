@@ -23,6 +23,7 @@ from functools import wraps
 import flask
 import requests
 import structlog
+import sqlalchemy
 import mypy_extensions
 import sqlalchemy_utils
 from flask import g, request
@@ -33,7 +34,7 @@ from typing_extensions import Final, Literal, Protocol
 from urllib3.util.retry import Retry
 from sqlalchemy.dialects import postgresql
 from werkzeug.datastructures import FileStorage
-from sqlalchemy.sql.expression import or_
+from sqlalchemy.sql.expression import or_, cast, func
 
 import psef
 import cg_register as register
@@ -730,7 +731,9 @@ def filter_users_by_name(
     :param query: The string to filter usernames and names of users with.
     :param base: The query to filter.
     :param limit: The amount of users to limit the search too.
-    :returns: A new query with the users filtered.
+    :returns: A new query with the users filtered. On PostgreSQL the users
+        are ordered by how similar their name or username is to the given
+        query, otherwise they are ordered by name.
     """
     if len(re.sub(r'\s', '', query)) < 3:
         raise psef.errors.APIException(
@@ -739,15 +742,23 @@ def filter_users_by_name(
             psef.errors.APICodes.INVALID_PARAM, 400
         )
 
-    likes = [
-        t.cast(t.Any, col).ilike(
-            '%{}%'.format(
-                escape_like(query).replace(' ', '%'),
-            )
-        ) for col in [psef.models.User.name, psef.models.User.username]
+    # The username is stored as ``citext``, which has its own ``ILIKE``
+    # operator. Casting it to text makes PostgreSQL use the trigram index on
+    # this column.
+    cols: t.List[t.Any] = [
+        psef.models.User.name,
+        cast(psef.models.User.username, sqlalchemy.Unicode),
     ]
+    pattern = '%{}%'.format(escape_like(query).replace(' ', '%'))
+    res = base.filter(or_(*[col.ilike(pattern) for col in cols]))
+
+    if psef.models.db.engine.name == 'postgresql':
+        similarity = func.greatest(
+            *(func.similarity(col, query) for col in cols)
+        )
+        res = res.order_by(similarity.desc())
 
-    return base.filter(or_(*likes)).order_by(
+    return res.order_by(
         t.cast(DbColumn[str], psef.models.User.name)
     ).limit(limit)
 
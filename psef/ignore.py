@@ -8,11 +8,12 @@ SPDX-License-Identifier: AGPL-3.0-only
 """
 import re
 import abc
-import copy
 import enum
+import json
 import typing as t
 import os.path
-from dataclasses import dataclass
+import functools
+from dataclasses import field, dataclass
 
 import structlog
 from typing_extensions import Literal, TypedDict
@@ -31,6 +32,9 @@ T_SF = t.TypeVar('T_SF', bound='SubmissionFilter')  # pylint: disable=invalid-na
 filter_handlers: register.Register[str, t.Type['SubmissionFilter']
                                    ] = register.Register()
 
+# The flags used for the regexes of ignore patterns.
+_REGEX_FLAGS = '(?ms)'
+
 
 @enum.unique
 class IgnoreHandling(enum.IntEnum):
@@ -77,13 +81,16 @@ class FileDeletion:
     deletion_type: DeletionType
     deleted_file: ExtractFileTreeBase
     reason: t.Union[str, 'FileRule']
+    fullname: str = field(init=False)
 
     def __post_init__(self) -> None:
-        self.deleted_file = copy.deepcopy(self.deleted_file)
+        # The file is removed from its parent after this object is created, so
+        # store its full name now.
+        self.fullname = self.deleted_file.get_full_name()
 
     def __to_json__(self) -> t.Mapping[str, t.Union[str, 'FileRule']]:
         return {
-            'fullname': self.deleted_file.get_full_name(),
+            'fullname': self.fullname,
             'reason': self.reason,
             'deletion_type': self.deletion_type.name,
             'name': self.deleted_file.name,
@@ -93,6 +100,54 @@ class FileDeletion:
         return self.__to_json__()
 
 
+class ProcessedSubmission:
+    """The result of processing a submission with a submission filter.
+
+    :ivar ~.ProcessedSubmission.tree: The processed tree.
+    :ivar ~.ProcessedSubmission.changes: The files and directories that were
+        removed from the tree.
+    :ivar ~.ProcessedSubmission.missing_files: The files, or file patterns,
+        that are missing from the processed tree.
+    """
+
+    def __init__(self, tree: ExtractFileTree) -> None:
+        self.tree = tree
+        self.changes: t.List[FileDeletion] = []
+        self.missing_files: t.List[t.Mapping[str, str]] = []
+        self._removed_files: t.List[ExtractFileTreeBase] = []
+        self._undo: t.List[t.Callable[[], None]] = []
+
+    def _remove_file(self, f: ExtractFileTreeBase) -> None:
+        parent = f.parent
+        assert parent is not None
+        parent.forget_child(f)
+        self._removed_files.append(f)
+        add_back = parent.add_child
+        self._undo.append(lambda: add_back(f))
+
+    def _remove_leading_dir(self, tree: ExtractFileTree) -> None:
+        removed = tree.remove_leading_self()
+        self._undo.append(lambda: tree.restore_leading_dir(removed))
+
+    def revert(self) -> None:
+        """Revert all changes made to the tree, so that it is exactly the same
+        as the tree before it was processed.
+        """
+        while self._undo:
+            self._undo.pop()()
+        self._removed_files = []
+
+    def delete_removed_files(self) -> None:
+        """Delete the files that were removed from the tree.
+
+        After calling this method the changes can no longer be reverted.
+        """
+        self._undo = []
+        for f in self._removed_files:
+            f.delete()
+        self._removed_files = []
+
+
 class SubmissionFilter:
     """Class representing the base submission filter.
 
@@ -131,95 +186,89 @@ class SubmissionFilter:
         raise NotImplementedError
 
     def _remove_leading_directories(
-        self, tree: ExtractFileTree
-    ) -> t.Tuple[ExtractFileTree, t.List[FileDeletion]]:
+        self, tree: ExtractFileTree, result: 'ProcessedSubmission'
+    ) -> None:
         """Remove leading directories from a given tree.
 
         :param tree: The tree to remove the directories from.
-        :returns: The modified tree, and a list of files that were deleted.
+        :param result: The result to which the changes will be added.
+        :returns: Nothing, the tree is modified in-place.
         """
-        # pylint: disable=no-self-use
-        changes = []
-
+        # pylint: disable=no-self-use,protected-access
         def is_dir(f: ExtractFileTreeBase) -> bool:
             return f.is_dir
 
-        if tree.only_child.map(is_dir).or_default(False):
-            tree = copy.deepcopy(tree)
-
         while tree.only_child.map(is_dir).or_default(False):
-            changes.append(
+            result.changes.append(
                 FileDeletion(
                     deletion_type=DeletionType.leading_directory,
                     deleted_file=tree,
                     reason='Leading directory',
                 )
             )
-            tree.remove_leading_self()
-
-        return tree, changes
+            result._remove_leading_dir(tree)
 
-    def _delete_file(self, cur: ExtractFileTreeBase) -> t.List[FileDeletion]:
+    def _delete_file(
+        self, cur: ExtractFileTreeBase, result: 'ProcessedSubmission'
+    ) -> None:
+        # pylint: disable=protected-access
         if cur.is_dir:
             tree = t.cast(ExtractFileTreeDirectory, cur)
-            res: t.List[FileDeletion] = []
 
-            # Copy is needed here as we modify values by doing a `.delete` call
-            # on one of the children.
+            # Copy is needed here as we modify values by removing one of the
+            # children.
             for child in list(tree.values):
-                res.extend(self._delete_file(child))
+                self._delete_file(child, result)
 
             if tree.is_empty:
                 deleted_tree = self.file_allowed(tree)
                 if deleted_tree is not None:
-                    res.append(deleted_tree)
-                    tree.delete()
-
-            return res
+                    result.changes.append(deleted_tree)
+                    result._remove_file(tree)
         else:
             deleted_file = self.file_allowed(cur)
-            if deleted_file is None:
-                return []
-            cur.delete()
-            return [deleted_file]
+            if deleted_file is not None:
+                result.changes.append(deleted_file)
+                result._remove_file(cur)
 
     def process_submission(
         self, tree: ExtractFileTree, handle_ignore: 'IgnoreHandling'
-    ) -> t.Tuple['ExtractFileTree', t.List[FileDeletion], t.
-                 List[t.Mapping[str, str]]]:
+    ) -> 'ProcessedSubmission':
         """Process a submission with the given filter.
 
         This method will apply the filter, respecting the given
-        ``handle_ignore``, deleting files from the given tree (in-place!).
+        ``handle_ignore``, removing files from the given tree (in-place!). The
+        removed files are not deleted yet, and all changes can be reverted, so
+        no copy of the tree is needed to report the original tree.
 
         :param tree: The tree to check.
         :param handle_ignore: The way files that files that are ignored should
             be handled. There is not difference between ``error`` and
             ``delete``.
-        :returns: A tuple, first containing the tree (however, the tree given
-            is modified in-place!), a list of files and directories that are
-            deleted, and finally a list of missing files.
+        :returns: The result of processing the submission. Either
+            :meth:`.ProcessedSubmission.revert` or
+            :meth:`.ProcessedSubmission.delete_removed_files` should be called
+            on it.
         """
-        total_changes = []
+        result = ProcessedSubmission(tree)
 
-        tree, removed_top_dirs = self._remove_leading_directories(tree)
-        total_changes.extend(removed_top_dirs)
+        self._remove_leading_directories(tree, result)
 
         if handle_ignore != IgnoreHandling.keep:
-            # Copy is needed here as we modify values by doing a `.delete` call
-            # on one of the children.
+            # Copy is needed here as we modify values by removing one of the
+            # children.
             for child in list(tree.values):
-                total_changes.extend(self._delete_file(child))
+                self._delete_file(child, result)
 
-            tree, removed_top_dirs = self._remove_leading_directories(tree)
-            total_changes.extend(removed_top_dirs)
+            self._remove_leading_directories(tree, result)
 
+        result.missing_files = self.get_missing_files(tree)
         logger.info(
             'Processed submission with submission filter',
-            changes=total_changes,
+            changes=result.changes,
             resulting_tree=tree,
         )
-        return tree, total_changes, self.get_missing_files(tree)
+        return result
 
     @property
     def can_override_ignore_filter(self) -> bool:
@@ -272,8 +321,8 @@ class Pattern:
             if pattern[0:1] == '\\':
                 pattern = pattern[1:]
             self.is_exclude = True
-        flags = 0
-        self._re = re.compile(self.translate(pattern), flags)
+        self.regex_body = self.translate_body(pattern)
+        self._re = re.compile(_REGEX_FLAGS + self.regex_body)
 
     def match(self, path: str) -> bool:
         """Try to match a path against this ignore pattern.
@@ -332,8 +381,17 @@ class Pattern:
         Originally copied from fnmatch in Python 2.7, but modified for Dulwich
         to cope with features in Git ignore patterns.
         """
+        return _REGEX_FLAGS + cls.translate_body(pat)
+
+    @classmethod
+    def translate_body(cls, pat: str) -> str:
+        """Translate a shell PATTERN to a regular expression without any
+        flags.
 
-        res = '(?ms)'
+        The returned regex should be used with the ``re.MULTILINE`` and
+        ``re.DOTALL`` flags.
+        """
+        res = ''
 
         if '/' not in pat[:-1]:
             # If there's no slash, this is a filename-based match
@@ -370,12 +428,52 @@ class IgnoreFilter:
         self.original_input = patterns
 
         self._patterns: t.List[Pattern] = []
+        self._combined_re: t.Optional[t.Pattern[str]] = None
         for pattern, orig_line in self.read_ignore_patterns(patterns):
             self.append_pattern(pattern, orig_line)
 
     def append_pattern(self, pattern: str, orig_line: str) -> None:
         """Add a pattern to the set."""
         self._patterns.append(Pattern(pattern, orig_line))
+        self._combined_re = None
+
+    def _get_combined_re(self) -> t.Pattern[str]:
+        """Get a single regex matching all patterns of this filter.
+
+        Every pattern is in its own group named ``p{index}``. The patterns are
+        in reverse order, as the first alternative that matches is used, and
+        we are interested in the last pattern that matches.
+        """
+        if self._combined_re is None:
+            patterns = reversed(list(enumerate(self._patterns)))
+            self._combined_re = re.compile(
+                _REGEX_FLAGS + '|'.join(
+                    f'(?P<p{idx}>{pattern.regex_body})'
+                    for idx, pattern in patterns
+                )
+            )
+        return self._combined_re
+
+    def find_last_matching(self, path: str) -> t.Optional[Pattern]:
+        """Get the last pattern that matches the given path.
+
+        This is the same as the last pattern returned by
+        :meth:`.IgnoreFilter.find_matching`, but the path is matched against
+        all patterns at once.
+
+        :param path: Path to match.
+        :returns: The last matching pattern, or ``None`` if no pattern matches.
+        """
+        if not self._patterns:
+            return None
+
+        match = self._get_combined_re().match(path)
+        if match is None:
+            return None
+        # The group of the pattern is the outermost group, so it is always
+        # the last group that matched.
+        assert match.lastgroup is not None
+        return self._patterns[int(match.lastgroup[1:])]
 
     def find_matching(self, path: str) -> t.Iterable[Pattern]:
         """Yield all matching patterns for path.
@@ -421,6 +519,7 @@ class IgnoreFilterManager(SubmissionFilter):
     """Ignore file manager."""
 
     CGIGNORE_VERSION = 1
+    _MAX_DIR_CACHE_SIZE = 10000
 
     def __init__(
         self,
@@ -431,6 +530,9 @@ class IgnoreFilterManager(SubmissionFilter):
         if isinstance(global_filters, str):
             global_filters = global_filters.split('\n')
         self._filter = IgnoreFilter(global_filters)
+        # A cache from directory paths to the last pattern matching them, as
+        # all files in the same directory share all their leading paths.
+        self._dir_cache: t.Dict[str, t.Optional[Pattern]] = {}
 
     @classmethod
     def parse(cls, data: 'CGIgnoreInputData') -> 'IgnoreFilterManager':
@@ -473,12 +575,41 @@ class IgnoreFilterManager(SubmissionFilter):
         :return: None if the file is not mentioned, True if it is included,
             False if it is explicitly excluded.
         """
-        matches = self.find_matching(path)
-        if matches:
-            return matches[-1].is_exclude, matches[-1].original_line
+        match = self.find_last_matching(path)
+        if match is not None:
+            return match.is_exclude, match.original_line
 
         return None, None
 
+    def find_last_matching(self, path: str) -> t.Optional[Pattern]:
+        """Find the last matching pattern for the given path.
+
+        This is the same as the last pattern returned by
+        :meth:`.IgnoreFilterManager.find_matching`, but faster.
+
+        :param path: Path to check.
+        :returns: The last matching pattern, or ``None`` if no pattern matches.
+        """
+        assert not os.path.isabs(path), f'File "{path}" is an absolute path'
+
+        parts = path.split('/')
+
+        for i in range(len(parts)):
+            # Paths leading up to the final part are all directories, so need
+            # a trailing slash.
+            relpath = '/'.join(parts[:i]) + '/'
+            if relpath not in self._dir_cache:
+                if len(self._dir_cache) >= self._MAX_DIR_CACHE_SIZE:
+                    self._dir_cache.clear()
+                self._dir_cache[relpath] = self._filter.find_last_matching(
+                    relpath
+                )
+            match = self._dir_cache[relpath]
+            if match is not None:
+                return match
+
+        return self._filter.find_last_matching(path)
+
     def file_allowed(self, f: ExtractFileTreeBase) -> t.Optional[FileDeletion]:
         """Check if the given file adheres to this validator.
 
@@ -955,11 +1086,10 @@ class SubmissionValidator(SubmissionFilter):
         return None
 
     def _remove_leading_directories(
-        self, tree: ExtractFileTree
-    ) -> t.Tuple[ExtractFileTree, t.List[FileDeletion]]:
-        if not self.options.get(Options.OptionName.remove_leading_directories):
-            return tree, []
-        return super()._remove_leading_directories(tree)
+        self, tree: ExtractFileTree, result: 'ProcessedSubmission'
+    ) -> None:
+        if self.options.get(Options.OptionName.remove_leading_directories):
+            super()._remove_leading_directories(tree, result)
 
     def get_missing_files(self, tree: ExtractFileTree
                           ) -> t.List[t.Mapping[str, str]]:
@@ -1010,3 +1140,27 @@ class SubmissionValidator(SubmissionFilter):
 
 
 CGIgnoreInputData = t.Union[str, SubmissionValidator.InputData]
+
+
+@functools.lru_cache(maxsize=256)
+def parse_stored_filter(
+    version: t.Optional[str], data: str
+) -> SubmissionFilter:
+    """Parse a submission filter as stored in the database.
+
+    The parsed filters are cached, so the returned filter is shared and should
+    never be mutated.
+
+    :param version: The name of the filter type, as found in
+        ``filter_handlers``. If this is ``None`` the data is interpreted as an
+        old style ``.cgignore`` file.
+    :param data: The filter as stored in the database. This is the JSON of
+        the exported filter if ``version`` is given.
+    :returns: The parsed filter.
+    """
+    if version is None:  # pragma: no cover
+        # This branch is needed for backwards compatibility, but it is not
+        # possible to test as it is not possible to insert this old data using
+        # the api.
+        return IgnoreFilterManager.parse(data)
+    return filter_handlers[version].parse(json.loads(data))
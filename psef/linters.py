@@ -10,10 +10,13 @@ import os
 import abc
 import csv
 import json
+import time
 import uuid
+import shutil
 import typing as t
 import tempfile
 import subprocess
+import concurrent.futures
 import xml.etree.ElementTree as ET
 from io import StringIO
 
@@ -103,6 +106,10 @@ class Linter(abc.ABC):
     """
     DEFAULT_OPTIONS: t.ClassVar[t.Mapping[str, str]] = {}
     RUN_LINTER: t.ClassVar[bool] = True
+    #: Can this linter lint the code of multiple submissions with a single
+    #: invocation of the linter program. If this is ``True`` the
+    #: :meth:`Linter.run_batch` method should be overridden.
+    SUPPORTS_BATCH: t.ClassVar[bool] = False
 
     def __init__(self, cfg: str) -> None:
         self.config = cfg
@@ -139,6 +146,24 @@ class Linter(abc.ABC):
         """
         raise NotImplementedError('A subclass should implement this function!')
 
+    def run_batch(
+        self,
+        basedir: str,
+        emit: t.Callable[[str, int, str, str], None],
+        process_completed: ProcessCompletedCallback,
+    ) -> None:  # pragma: no cover
+        """Run the linter on the code of multiple submissions at once.
+
+        Every direct child of ``basedir`` is a directory containing the code
+        of a single submission. The filenames passed to ``emit`` should either
+        be absolute, or relative to ``basedir``.
+
+        Other arguments are the same as for :py:meth:`Linter.run`.
+
+        :param basedir: The directory containing the code of all submissions.
+        """
+        raise NotImplementedError('This linter does not support batches')
+
 
 @_linter_handlers.register('Pylint')
 class Pylint(Linter):
@@ -206,12 +231,21 @@ class Flake8(Linter):
     DEFAULT_OPTIONS: t.ClassVar[t.Mapping[str, str]] = {
         'Empty config file': ''
     }
+    SUPPORTS_BATCH = True
 
     def run(
         self,
         tempdir: str,
         emit: t.Callable[[str, int, str, str], None],
         process_completed: ProcessCompletedCallback,
+    ) -> None:
+        self.run_batch(tempdir, emit, process_completed)
+
+    def run_batch(
+        self,
+        basedir: str,
+        emit: t.Callable[[str, int, str, str], None],
+        process_completed: ProcessCompletedCallback,
     ) -> None:
         # This is not guessable
         sep = uuid.uuid4()
@@ -222,7 +256,7 @@ class Flake8(Linter):
             cfg.flush()
             out = _run_command(
                 [
-                    part.format(config=cfg.name, files=tempdir, line_fmt=fmt)
+                    part.format(config=cfg.name, files=basedir, line_fmt=fmt)
                     for part in app.config['FLAKE8_PROGRAM']
                 ]
             )
@@ -273,6 +307,7 @@ class Checkstyle(Linter):
         'Google style': _read_config_file('checkstyle', 'google.xml'),
         'Sun style': _read_config_file('checkstyle', 'sun.xml'),
     }
+    SUPPORTS_BATCH = True
 
     @classmethod
     def _validate_module(cls: t.Type['Checkstyle'], mod: ET.Element) -> None:
@@ -373,8 +408,18 @@ class Checkstyle(Linter):
 
         Arguments are the same as for :py:meth:`Linter.run`.
         """
-        tempdir = os.path.dirname(tempdir)
+        self.run_batch(os.path.dirname(tempdir), emit, process_completed)
+
+    def run_batch(
+        self,
+        basedir: str,
+        emit: t.Callable[[str, int, str, str], None],
+        process_completed: ProcessCompletedCallback,
+    ) -> None:
+        """Run checkstyle on multiple submissions.
 
+        Arguments are the same as for :py:meth:`Linter.run_batch`.
+        """
         with tempfile.NamedTemporaryFile('w') as cfg:
             module: ET.Element = defused_xml_fromstring(self.config)
             assert module is not None
@@ -400,7 +445,7 @@ class Checkstyle(Linter):
                 format_list(
                     app.config['CHECKSTYLE_PROGRAM'],
                     config=cfg.name,
-                    files=tempdir,
+                    files=basedir,
                 )
             )
             process_completed(out)
@@ -439,6 +484,7 @@ class PMD(Linter):
     DEFAULT_OPTIONS: t.ClassVar[t.Mapping[str, str]] = {
         'Maven': _read_config_file('pmd', 'maven.xml'),
     }
+    SUPPORTS_BATCH = True
 
     @classmethod
     def validate_config(cls: t.Type['PMD'], config: str) -> None:
@@ -484,15 +530,25 @@ class PMD(Linter):
 
         Arguments are the same as for :py:meth:`Linter.run`.
         """
-        tempdir = os.path.dirname(tempdir)
+        self.run_batch(os.path.dirname(tempdir), emit, process_completed)
 
+    def run_batch(
+        self,
+        basedir: str,
+        emit: t.Callable[[str, int, str, str], None],
+        process_completed: ProcessCompletedCallback,
+    ) -> None:
+        """Run PMD on multiple submissions.
+
+        Arguments are the same as for :py:meth:`Linter.run_batch`.
+        """
         with tempfile.NamedTemporaryFile('w') as cfg:
             cfg.write(self.config)
             cfg.flush()
 
             out = _run_command(
                 [
-                    part.format(config=cfg.name, files=tempdir)
+                    part.format(config=cfg.name, files=basedir)
                     for part in app.config['PMD_PROGRAM']
                 ]
             )
@@ -517,6 +573,7 @@ class ESLint(Linter):
     DEFAULT_OPTIONS: t.ClassVar[t.Mapping[str, str]] = {
         'Standard': _read_config_file('eslint', 'standard.json')
     }
+    SUPPORTS_BATCH = True
 
     @classmethod
     def validate_config(cls: t.Type['ESLint'], config: str) -> None:
@@ -575,7 +632,18 @@ class ESLint(Linter):
 
         Arguments are the same as for :py:meth:`Linter.run`.
         """
-        tempdir = os.path.dirname(tempdir)
+        self.run_batch(os.path.dirname(tempdir), emit, process_completed)
+
+    def run_batch(
+        self,
+        basedir: str,
+        emit: t.Callable[[str, int, str, str], None],
+        process_completed: ProcessCompletedCallback,
+    ) -> None:
+        """Run ESLint on multiple submissions.
+
+        Arguments are the same as for :py:meth:`Linter.run_batch`.
+        """
         config = json.loads(self.config)
 
         with tempfile.NamedTemporaryFile('w') as cfg:
@@ -585,7 +653,7 @@ class ESLint(Linter):
 
             out = _run_command(
                 [
-                    part.format(config=cfg.name, files=tempdir)
+                    part.format(config=cfg.name, files=basedir)
                     for part in app.config['ESLINT_PROGRAM']
                 ]
             )
@@ -616,6 +684,57 @@ class ESLint(Linter):
                     emit(filename, line_number, code, msg)
 
 
+_LinterFeedback = t.Dict[int, t.Mapping[int, t.Sequence[t.Tuple[str, str]]]]
+
+#: The maximum amount of finished linter instances whose results are kept in
+#: the session before they are committed.
+_COMMIT_BATCH_SIZE = 25
+#: The maximum amount of seconds finished linter instances wait before their
+#: results are committed, this makes sure progress is visible to users.
+_COMMIT_INTERVAL = 2.0
+
+
+class _LintMember:
+    """A single linter instance that is part of a :class:`_LintJob`.
+    """
+    __slots__ = (
+        'linter_instance', 'name', 'tree_root', 'completed_proc', 'feedback',
+        'error'
+    )
+
+    def __init__(
+        self,
+        linter_instance: models.LinterInstance,
+        name: str,
+        tree_root: files.FileTree[int],
+    ) -> None:
+        self.linter_instance = linter_instance
+        self.name = name
+        self.tree_root = tree_root
+        self.completed_proc: t.Optional[subprocess.CompletedProcess] = None
+        self.feedback: t.Optional[_LinterFeedback] = None
+        self.error: t.Optional[Exception] = None
+
+    def set_proc(self, proc: subprocess.CompletedProcess) -> None:
+        """Set the completed process of the linter for this member.
+        """
+        self.completed_proc = proc
+
+
+class _LintJob:
+    """A set of linter instances that are linted together by a
+    :class:`LinterRunner`.
+
+    The code of each member is restored in its own directory directly in
+    ``tmpdir``, the name of this directory is the name of the member.
+    """
+    __slots__ = ('tmpdir', 'members')
+
+    def __init__(self, tmpdir: str) -> None:
+        self.tmpdir = tmpdir
+        self.members: t.List[_LintMember] = []
+
+
 class LinterRunner:
     """This class is used to run a :class:`Linter` with a specific config on
     sets of :class:`.models.Work`.
@@ -635,6 +754,12 @@ class LinterRunner:
     def run(self, linter_instance_ids: t.Sequence[str]) -> None:
         """Run this linter runner on the given works.
 
+        The linter programs are executed in a thread pool of at most
+        ``LINTER_MAX_WORKERS`` threads. If the linter supports it, the code of
+        at most ``LINTER_BATCH_SIZE`` works is linted by a single invocation
+        of the linter program. All database access is done in the calling
+        thread, and the results are committed in batches.
+
         .. note:: This method takes a long time to execute, please run it in a
                   thread.
 
@@ -644,116 +769,373 @@ class LinterRunner:
 
         :returns: Nothing
         """
+        max_workers = app.config['LINTER_MAX_WORKERS']
+        batch_size = 1
+        if self.linter.SUPPORTS_BATCH:
+            batch_size = app.config['LINTER_BATCH_SIZE']
+
+        # pylint: disable=protected-access
+        flask_app = app._get_current_object()
+        ids_left = iter(linter_instance_ids)
+        running: t.Dict['concurrent.futures.Future[None]', _LintJob] = {}
+        amount_done = 0
+        uncommitted = 0
+        last_commit = time.monotonic()
+
+        def run_in_thread(job: _LintJob) -> None:
+            with flask_app.app_context():
+                self._lint_job(job)
+
+        def finish(
+            linter_inst: models.LinterInstance,
+            member: t.Optional[_LintMember],
+            error: t.Optional[BaseException],
+        ) -> None:
+            nonlocal amount_done, uncommitted
+            self._finish_member(linter_inst, member, error)
+            amount_done += 1
+            uncommitted += 1
+            logger.info(
+                'Finished linter instance',
+                linter_instance_id=linter_inst.id,
+                amount_done=amount_done,
+                amount_total=len(linter_instance_ids),
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+
+            def start_next() -> None:
+                while True:
+                    linter_insts = self._get_next_instances(
+                        ids_left, batch_size
+                    )
+                    if not linter_insts:
+                        return
+
+                    try:
+                        job = self._prepare_job(linter_insts)
+                    # A batch whose files cannot be restored should not stop
+                    # the other batches from being linted.
+                    except Exception as exc:  # pylint: disable=broad-except
+                        for linter_inst in linter_insts:
+                            finish(linter_inst, None, exc)
+                    else:
+                        running[pool.submit(run_in_thread, job)] = job
+                        return
+
+            try:
+                # Restoring the files is done in this thread, so keep some
+                # extra jobs ready to make sure the workers are never idle.
+                for _ in range(2 * max_workers):
+                    start_next()
+
+                while running:
+                    finished, _ = concurrent.futures.wait(
+                        running,
+                        return_when=concurrent.futures.FIRST_COMPLETED,
+                    )
+                    for future in finished:
+                        job = running.pop(future)
+                        start_next()
+                        shutil.rmtree(job.tmpdir, ignore_errors=True)
+
+                        for member in job.members:
+                            finish(
+                                member.linter_instance,
+                                member,
+                                future.exception(),
+                            )
+
+                    if (
+                        uncommitted >= _COMMIT_BATCH_SIZE or
+                        time.monotonic() - last_commit >= _COMMIT_INTERVAL
+                    ):
+                        db.session.commit()
+                        uncommitted = 0
+                        last_commit = time.monotonic()
+            finally:
+                for job in running.values():
+                    shutil.rmtree(job.tmpdir, ignore_errors=True)
+
+        db.session.commit()
+
+    @staticmethod
+    def _get_next_instances(linter_instance_ids: t.Iterator[str],
+                            batch_size: int) -> t.List[models.LinterInstance]:
+        linter_insts = []
         for linter_instance_id in linter_instance_ids:
             linter_inst = db.session.query(models.LinterInstance
                                            ).get(linter_instance_id)
 
             # This should never happen however it is better to check here.
-            if linter_inst is None or linter_inst.work.deleted:  # pragma: no cover
+            if (
+                linter_inst is None or linter_inst.work.deleted
+            ):  # pragma: no cover
                 continue
 
-            compl_proc: t.Optional[subprocess.CompletedProcess] = None
+            linter_insts.append(linter_inst)
+            if len(linter_insts) >= batch_size:
+                break
+        return linter_insts
 
-            def set_proc(proc: subprocess.CompletedProcess) -> None:
-                nonlocal compl_proc
-                compl_proc = proc
+    @staticmethod
+    def _prepare_job(linter_insts: t.List[models.LinterInstance]) -> _LintJob:
+        job = _LintJob(tempfile.mkdtemp())
 
-            try:
-                self.test(linter_inst, set_proc)
-            # We want to catch all exceptions here as need to set our linter to
-            # the crashed state.
-            except LinterCrash as e:
-                logger.warning(
-                    'The linter crashed',
-                    linter_instance_id=linter_inst.id,
-                    exc_info=True,
-                )
-                linter_inst.state = models.LinterState.crashed
-                linter_inst.error_summary = (
-                    e.error_summary or
-                    'The linter program exited unsuccessfully.'
+        try:
+            caches = models.File.make_caches(
+                [linter_inst.work for linter_inst in linter_insts]
+            )
+            to_restore = []
+            for idx, linter_inst in enumerate(linter_insts):
+                parent = os.path.join(job.tmpdir, str(idx))
+                os.mkdir(parent)
+                to_restore.append((parent, caches[linter_inst.work_id]))
+
+            tree_roots = models.File.restore_directory_structures(to_restore)
+            for idx, (linter_inst, tree_root) in enumerate(
+                zip(linter_insts, tree_roots)
+            ):
+                job.members.append(
+                    _LintMember(linter_inst, str(idx), tree_root)
                 )
+        except Exception:
+            shutil.rmtree(job.tmpdir, ignore_errors=True)
+            raise
+
+        return job
+
+    @staticmethod
+    def _finish_member(
+        linter_inst: models.LinterInstance,
+        member: t.Optional[_LintMember],
+        job_error: t.Optional[BaseException],
+    ) -> None:
+        try:
+            if job_error is not None:
+                raise job_error
+            assert member is not None
+            if member.error is not None:
+                raise member.error
+            assert member.feedback is not None
+            LinterRunner._store_comments(linter_inst, member.feedback)
+        # We want to catch all exceptions here as need to set our linter to
+        # the crashed state.
+        except LinterCrash as e:
+            logger.warning(
+                'The linter crashed',
+                linter_instance_id=linter_inst.id,
+                exc_info=True,
+            )
+            linter_inst.state = models.LinterState.crashed
+            linter_inst.error_summary = (
+                e.error_summary or 'The linter program exited unsuccessfully.'
+            )
+        except Exception:  # pylint: disable=broad-except
+            logger.warning(
+                'The linter crashed unexpectedly',
+                linter_instance_id=linter_inst.id,
+                exc_info=True,
+            )
+            linter_inst.state = models.LinterState.crashed
+        finally:
+            if member is not None and member.completed_proc is not None:
+                compl_proc = member.completed_proc
+                linter_inst.stdout = compl_proc.stdout.replace('\0', '')
+                linter_inst.stderr = compl_proc.stderr.replace('\0', '')
+
+    def _lint_job(self, job: _LintJob) -> None:
+        """Lint all members of the given job.
+
+        This method does not access the database, so it can safely be called
+        from another thread. If linting all members at once fails, every member
+        is linted separately, this way a single submission that crashes the
+        linter does not make all other submissions crash.
+
+        :param job: The job to lint.
+        :returns: Nothing, the results are stored in the members of the job.
+        """
+        if len(job.members) > 1:
+            try:
+                self._lint_batch(job)
             except Exception:  # pylint: disable=broad-except
-                logger.warning(
-                    'The linter crashed unexpectedly',
-                    linter_instance_id=linter_inst.id,
+                logger.info(
+                    'Linting a batch failed, retrying separately',
                     exc_info=True,
                 )
-                linter_inst.state = models.LinterState.crashed
-            finally:
-                if compl_proc is not None:
-                    linter_inst.stdout = compl_proc.stdout.replace('\0', '')
-                    linter_inst.stderr = compl_proc.stderr.replace('\0', '')
-                db.session.commit()
+            else:
+                return
 
-    def test(
-        self,
-        linter_instance: models.LinterInstance,
-        process_completed: ProcessCompletedCallback,
-    ) -> None:
-        """Test the given code (:class:`.models.Work`) and add generated
-        comments.
+        for member in job.members:
+            try:
+                self._lint_single(job, member)
+            except Exception as exc:  # pylint: disable=broad-except
+                member.error = exc
 
-        :param linter_instance: The linter instance that will be run. This
-            linter instance is linked to a work from which all files will be
-            restored and the linter will be run on those files.
-        :param process_completed: The callback that should be called by the
-            linter instance after the process, like pylint or java, has been
-            completed.
-        :returns: Nothing
+    def _lint_single(self, job: _LintJob, member: _LintMember) -> None:
+        """Lint a single member of the given job.
+
+        :param job: The job the member is part of.
+        :param member: The member to lint.
+        :returns: Nothing, the results are stored in the member.
         """
-        temp_res: t.Dict[str, t.Dict[int, t.List[t.Tuple[str, str]]]]
-        temp_res = {}
-        res: t.Dict[int, t.Mapping[int, t.Sequence[t.Tuple[str, str]]]]
-        res = {}
+        member.feedback = self._lint_directory(
+            os.path.join(job.tmpdir, member.name),
+            {member.name: member},
+            lambda fname: (member.name, fname),
+            lambda emit: self.linter.run(
+                files.safe_join(
+                    job.tmpdir, member.name, member.tree_root.name
+                ),
+                emit,
+                member.set_proc,
+            ),
+        )[member.name]
 
-        with tempfile.TemporaryDirectory() as tmpdir:
+    def _lint_batch(self, job: _LintJob) -> None:
+        """Lint all members of the given job with a single linter invocation.
 
-            def __emit(f: str, line: int, code: str, msg: str) -> None:
-                if f.startswith(tmpdir):
-                    f = f[len(tmpdir) + 1:]
-                if f not in temp_res:
-                    temp_res[f] = {}
-                line = line - 1
-                if line not in temp_res[f]:
-                    temp_res[f][line] = []
-                temp_res[f][line].append((code, msg))
+        :param job: The job to lint.
+        :returns: Nothing, the results are stored in the members of the job.
+        """
 
-            tree_root = models.File.restore_directory_structure(
-                tmpdir, models.File.make_cache(linter_instance.work)
-            )
+        def set_proc(proc: subprocess.CompletedProcess) -> None:
+            # The output of the linter is not stored for every member, as it
+            # contains the output for all members.
+            if proc.returncode != 0:
+                logger.info(
+                    'Batch linter process completed',
+                    returncode=proc.returncode,
+                    stderr=proc.stderr,
+                )
 
-            self.linter.run(
-                files.safe_join(tmpdir, tree_root.name), __emit,
-                process_completed
-            )
+        def split_name(fname: str) -> t.Tuple[str, str]:
+            name, _, rest = fname.partition('/')
+            return name, rest
 
-        del tmpdir
+        res = self._lint_directory(
+            job.tmpdir,
+            {member.name: member
+             for member in job.members},
+            split_name,
+            lambda emit: self.linter.run_batch(job.tmpdir, emit, set_proc),
+        )
+        for member in job.members:
+            member.feedback = res[member.name]
 
-        def __do(tree: files.FileTree[int], parent: str) -> None:
+    @staticmethod
+    def _lint_directory(
+        basedir: str,
+        members: t.Mapping[str, _LintMember],
+        split_name: t.Callable[[str], t.Tuple[str, str]],
+        do_run: t.Callable[[t.Callable[[str, int, str, str], None]], None],
+    ) -> t.Dict[str, _LinterFeedback]:
+        """Run the linter and map its output to the files of the members.
+
+        :param basedir: The directory the filenames emitted by the linter are
+            relative to.
+        :param members: The members that are linted, by their name.
+        :param split_name: Function to split a filename relative to
+            ``basedir`` into the name of the member and the filename relative
+            to the directory of this member.
+        :param do_run: Function that runs the linter with the given emit
+            function.
+        :returns: The comments for each file id for each member, in the format
+            expected by :meth:`.models.LinterInstance.add_comments`.
+        """
+        temp_res: t.Dict[str, t.Dict[str, t.Dict[int, t.List[t.Tuple[str,
+                                                                      str]]]]]
+        temp_res = {name: {} for name in members}
+        res: t.Dict[str, _LinterFeedback] = {name: {} for name in members}
+
+        def __emit(f: str, line: int, code: str, msg: str) -> None:
+            if f.startswith(basedir):
+                f = f[len(basedir) + 1:]
+            name, f = split_name(f)
+            if name not in temp_res:  # pragma: no cover
+                logger.warning('Got comment for unknown file', filename=f)
+                return
+            member_res = temp_res[name]
+            if f not in member_res:
+                member_res[f] = {}
+            line = line - 1
+            if line not in member_res[f]:
+                member_res[f][line] = []
+            member_res[f][line].append((code, msg))
+
+        do_run(__emit)
+
+        def __do(
+            tree: files.FileTree[int],
+            parent: str,
+            member_temp_res: t.Dict[str, t.Dict[int, t.List[t.Tuple[str,
+                                                                    str]]]],
+            member_res: _LinterFeedback,
+        ) -> None:
             # We can safely use os.path.join here as the contents of this path
             # will never be read.
             parent = os.path.join(parent, tree.name)
             if tree.entries is not None:  # this is dir:
                 for entry in tree.entries:
-                    __do(entry, parent)
-            elif parent in temp_res:
-                res[tree.file_id] = temp_res[parent]
-                del temp_res[parent]
+                    __do(entry, parent, member_temp_res, member_res)
+            elif parent in member_temp_res:
+                member_res[tree.file_id] = member_temp_res[parent]
+                del member_temp_res[parent]
 
-        __do(tree_root, '')
+        for name, member in members.items():
+            __do(member.tree_root, '', temp_res[name], res[name])
 
-        meth = logger.warning if temp_res else logger.info
-        meth('Finished adding linter comments', comments_left=temp_res)
+        comments_left = {name: left for name, left in temp_res.items() if left}
+        meth = logger.warning if comments_left else logger.info
+        meth('Finished adding linter comments', comments_left=comments_left)
 
+        return res
+
+    @staticmethod
+    def _store_comments(
+        linter_instance: models.LinterInstance,
+        feedback: _LinterFeedback,
+    ) -> None:
         models.LinterComment.query.filter_by(linter_id=linter_instance.id
                                              ).delete()
+        db.session.bulk_save_objects(
+            list(linter_instance.add_comments(feedback))
+        )
+        linter_instance.state = models.LinterState.done
 
-        for comment in linter_instance.add_comments(res):
-            db.session.add(comment)
+    def test(
+        self,
+        linter_instance: models.LinterInstance,
+        process_completed: ProcessCompletedCallback,
+    ) -> None:
+        """Test the given code (:class:`.models.Work`) and add generated
+        comments.
 
-        linter_instance.state = models.LinterState.done
+        :param linter_instance: The linter instance that will be run. This
+            linter instance is linked to a work from which all files will be
+            restored and the linter will be run on those files.
+        :param process_completed: The callback that should be called by the
+            linter instance after the process, like pylint or java, has been
+            completed.
+        :returns: Nothing
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tree_root = models.File.restore_directory_structure(
+                tmpdir, models.File.make_cache(linter_instance.work)
+            )
+            member = _LintMember(linter_instance, '', tree_root)
+            feedback = self._lint_directory(
+                tmpdir,
+                {'': member},
+                lambda fname: ('', fname),
+                lambda emit: self.linter.run(
+                    files.safe_join(tmpdir, tree_root.name),
+                    emit,
+                    process_completed,
+                ),
+            )['']
 
+        self._store_comments(linter_instance, feedback)
         db.session.commit()
 
 
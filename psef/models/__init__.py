@@ -181,10 +181,13 @@ if True:  # pylint: disable=using-constant-test
     )
     from .snippet import Snippet
     from .webhook import WebhookBase, GitCloneData
-    from .analytics import BaseDataSource, AnalyticsWorkspace
+    from .analytics import (
+        BaseDataSource, AnalyticsSnapshot, AnalyticsWorkspace,
+        AnalyticsWorkspaceChange
+    )
     from .auto_test import (
         AutoTest, AutoTestRun, AutoTestSet, AutoTestSuite, AutoTestResult,
-        AutoTestRunner
+        AutoTestRunner, AutoTestSuiteResultCache
     )
     from .assignment import (
         Assignment, AssignmentKind, AssignmentLinter, AssignmentResult,
@@ -195,7 +198,8 @@ if True:  # pylint: disable=using-constant-test
     )
     from .permission import Permission
     from .plagiarism import (
-        PlagiarismRun, PlagiarismCase, PlagiarismMatch, PlagiarismState
+        PlagiarismRun, PlagiarismCase, PlagiarismMatch, PlagiarismState,
+        PlagiarismFingerprint, PlagiarismFingerprintedFile
     )
     from .link_tables import user_course
     from .task_result import TaskResult, TaskReturnType, TaskResultState
@@ -4,11 +4,19 @@ SPDX-License-Identifier: AGPL-3.0-only
 """
 import abc
 import typing as t
+import itertools
+import dataclasses
+from collections import defaultdict
 
 import sqlalchemy
+from sqlalchemy import orm, event
 from mypy_extensions import TypedDict
-from sqlalchemy.dialects.postgresql import aggregate_order_by
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.dialects.postgresql import insert, aggregate_order_by
 
+from cg_dt_utils import DatetimeWithTimezone
+from cg_sqlalchemy_helpers import JSONB
 from cg_sqlalchemy_helpers.mixins import IdMixin, TimestampMixin
 
 from . import Base, MyQuery, DbColumn, db
@@ -38,6 +46,14 @@ def _array_agg_and_order(
     return res
 
 
+def _restrict_to_works(
+    query: MyQuery[Y], work_ids: t.Optional[t.Collection[int]]
+) -> MyQuery[Y]:
+    if work_ids is None:
+        return query
+    return query.filter(work_models.Work.id.in_(list(work_ids)))
+
+
 class _SubmissionData(TypedDict, total=True):
     id: int
     created_at: str
@@ -45,11 +61,23 @@ class _SubmissionData(TypedDict, total=True):
     assignee_id: t.Optional[int]
 
 
+class _WorkSubmissionData(TypedDict, total=True):
+    user_id: int
+    created_at: str
+    grade: t.Optional[float]
+    assignee_id: t.Optional[int]
+
+
 class AnalyticsWorkspace(IdMixin, TimestampMixin, Base):
     """The class that represents an analytics workspace.
 
-    At the moment this class doesn't contain any state, however that will
-    probably change in the future.
+    The data of a workspace is stored in :class:`.AnalyticsSnapshot` objects,
+    which are refreshed when they are requested and the data they are based
+    on has changed.
+
+    :ivar ~.AnalyticsWorkspace.data_version: The version of the data of this
+        workspace. It is incremented whenever a change is made that might
+        change the data of this workspace.
     """
 
     assignment_id = db.Column(
@@ -64,6 +92,14 @@ class AnalyticsWorkspace(IdMixin, TimestampMixin, Base):
         back_populates='analytics_workspaces',
     )
 
+    data_version = db.Column(
+        'data_version',
+        db.Integer,
+        nullable=False,
+        default=0,
+        server_default='0',
+    )
+
     @property
     def work_query(self) -> MyQuery['work_models.Work']:
         """A method to get a query that selects of the submissions in this
@@ -79,6 +115,125 @@ class AnalyticsWorkspace(IdMixin, TimestampMixin, Base):
             work_models.Work.assignment == self.assignment,
         )
 
+    @staticmethod
+    def mark_assignment_changed(assignment_id: int) -> None:
+        """Record that the data of all submissions in the given assignment
+        might have changed.
+
+        Changes made through the session are detected automatically, so this
+        is only needed after bulk updates that bypass the session. Like those
+        changes, the change is recorded when the session is committed.
+
+        :param assignment_id: The id of the changed assignment.
+        :returns: Nothing.
+        """
+        _add_pending_changes(db.session, {assignment_id: None})
+
+    def _get_changed_works(self, since: int,
+                           until: int) -> t.Optional[t.Set[int]]:
+        """Get the submissions of which the data might have changed between
+        two versions of this workspace.
+
+        :param since: The version from which changes should be included.
+        :param until: The version up to which changes should be included.
+        :returns: The ids of the changed submissions, or ``None`` if the data
+            of all submissions might have changed.
+        """
+        res: t.Set[int] = set()
+        for work_id, in db.session.query(
+            AnalyticsWorkspaceChange.work_id
+        ).filter(
+            AnalyticsWorkspaceChange.workspace_id == self.id,
+            AnalyticsWorkspaceChange.version > since,
+            AnalyticsWorkspaceChange.version <= until,
+        ).distinct():
+            if work_id is None:
+                return None
+            res.add(work_id)
+        return res
+
+    def get_snapshot_data(
+        self,
+        name: str,
+        compute: t.Callable[[t.Optional[t.Collection[int]]],
+                            t.Mapping[int, Y]],
+    ) -> t.Mapping[int, Y]:
+        """Get data of this workspace through a snapshot.
+
+        If the snapshot is outdated only the data of the submissions that
+        changed since the snapshot was taken is computed again.
+
+        :param name: The name of the snapshot.
+        :param compute: A function that computes the data for the submissions
+            with the given ids, or for all submissions if ``None`` is passed.
+            The returned mapping should have an entry for each of these
+            submissions that is in this workspace.
+        :returns: A mapping between the id of each submission in this
+            workspace and its data.
+        """
+        version = self.data_version
+        snapshot = AnalyticsSnapshot.query.filter_by(
+            workspace_id=self.id,
+            name=name,
+        ).one_or_none()
+
+        if snapshot is not None and snapshot.version >= version:
+            return snapshot.get_data()
+
+        changed = None
+        if snapshot is not None:
+            changed = self._get_changed_works(snapshot.version, version)
+
+        data: t.Dict[int, Y]
+        if snapshot is None or changed is None:
+            data = dict(compute(None))
+        else:
+            data = {
+                work_id: value
+                for work_id, value in snapshot.get_data().items()
+                if work_id not in changed
+            }
+            if changed:
+                data.update(compute(changed))
+
+        AnalyticsSnapshot.store(self, name, version, data)
+        return data
+
+    def _get_submission_data(
+        self, work_ids: t.Optional[t.Collection[int]]
+    ) -> t.Mapping[int, _WorkSubmissionData]:
+        grades_per_sub = dict(
+            _restrict_to_works(
+                work_models.Work.get_rubric_grade_per_work(self.assignment),
+                work_ids,
+            )
+        )
+        grades_per_sub.update(
+            _restrict_to_works(
+                work_models.Work.get_non_rubric_grade_per_work(
+                    self.assignment,
+                ),
+                work_ids,
+            )
+        )
+
+        query = _restrict_to_works(self.work_query, work_ids).with_entities(
+            work_models.Work.id,
+            work_models.Work.user_id,
+            work_models.Work.created_at,
+            work_models.Work.assigned_to,
+        )
+
+        return {
+            work_id: {
+                'user_id': user_id,
+                'created_at': created_at.isoformat(),
+                'grade': grades_per_sub.get(work_id),
+                'assignee_id': assignee_id,
+            }
+            for work_id, user_id, created_at, assignee_id in query
+        }
+
     @property
     def submissions_per_student(self
                                 ) -> t.Mapping[int, t.List[_SubmissionData]]:
@@ -90,48 +245,27 @@ class AnalyticsWorkspace(IdMixin, TimestampMixin, Base):
             grade (the grade of the submission), and assignee_id (the id of the
             assignee of this submission).
         """
-        grades_per_sub = dict(
-            work_models.Work.get_rubric_grade_per_work(self.assignment)
-        )
-        grades_per_sub.update(
-            work_models.Work.get_non_rubric_grade_per_work(
-                self.assignment,
-            )
+        data = self.get_snapshot_data(
+            'student_submissions', self._get_submission_data
         )
 
-        query = self.work_query.with_entities(
-            work_models.Work.user_id,
-            _array_agg_and_order(
-                work_models.Work.id,
-                work_models.Work.created_at,
-            ),
-            _array_agg_and_order(
-                work_models.Work.created_at,
-                work_models.Work.created_at,
+        res: t.Dict[int, t.List[_SubmissionData]] = defaultdict(list)
+        for work_id, sub in sorted(
+            data.items(),
+            key=lambda item: (
+                DatetimeWithTimezone.fromisoformat(item[1]['created_at']),
+                item[0],
             ),
-            _array_agg_and_order(
-                work_models.Work.assigned_to,
-                work_models.Work.created_at,
-            )
-        ).group_by(
-            work_models.Work.user_id,
-        )
-
-        return {
-            user_id: [
+        ):
+            res[sub['user_id']].append(
                 {
-                    'id': sub_id,
-                    'created_at': created_at.isoformat(),
-                    'grade': grades_per_sub.get(sub_id),
-                    'assignee_id': assignee_id,
-                } for sub_id, created_at, assignee_id in zip(
-                    sub_ids,
-                    created_ats,
-                    assignee_ids,
-                )
-            ]
-            for user_id, sub_ids, created_ats, assignee_ids in query
-        }
+                    'id': work_id,
+                    'created_at': sub['created_at'],
+                    'grade': sub['grade'],
+                    'assignee_id': sub['assignee_id'],
+                }
+            )
+        return res
 
     def __to_json__(self) -> t.Mapping[str, object]:
         data_sources = [
@@ -153,7 +287,7 @@ T = t.TypeVar('T')
 class BaseDataSource(t.Generic[T]):
     """The base class for all data sources.
 
-    Each subclass should implement the ``get_data``.
+    Each subclass should implement the ``compute_data``.
     """
     __slots__ = ('workspace', )
 
@@ -161,14 +295,32 @@ class BaseDataSource(t.Generic[T]):
         self.workspace = workspace
 
     @abc.abstractmethod
+    def compute_data(self, work_ids: t.Optional[t.Collection[int]]
+                     ) -> t.Mapping[int, T]:
+        """Compute the data, the key in this mapping should be the submission
+            id the data belongs to.
+
+        :param work_ids: Only compute the data for the submissions with these
+            ids, or for all submissions in the workspace if ``None``.
+        :returns: A mapping between a submission id and the data this data
+            source provides.
+        """
+        raise NotImplementedError
+
     def get_data(self) -> t.Mapping[int, T]:
         """Get the data, the key in this mapping should be the submission id
             the data belongs to.
 
+        The data is retrieved from the snapshot of this data source, see
+        :meth:`.AnalyticsWorkspace.get_snapshot_data`.
+
         :returns: A mapping between a submission id and the data this data
             source provides.
         """
-        raise NotImplementedError
+        return self.workspace.get_snapshot_data(
+            analytics_data_sources.find(type(self), ''),
+            self.compute_data,
+        )
 
     def __to_json__(self) -> t.Mapping[str, t.Union[str, t.Mapping[int, T]]]:
         return {
@@ -189,8 +341,11 @@ class _RubricDataSourceModel(TypedDict, total=True):
 
 @analytics_data_sources.register('rubric_data')
 class _RubricDataSource(BaseDataSource[t.List[_RubricDataSourceModel]]):
-    def get_data(self) -> t.Mapping[int, t.List[_RubricDataSourceModel]]:
-        query = self.workspace.work_query.join(
+    def compute_data(self, work_ids: t.Optional[t.Collection[int]]
+                     ) -> t.Mapping[int, t.List[_RubricDataSourceModel]]:
+        query = _restrict_to_works(
+            self.workspace.work_query, work_ids
+        ).join(
             rubric_models.WorkRubricItem, isouter=True
         ).with_entities(
             work_models.Work.id,
@@ -226,7 +381,8 @@ class _InlineFeedbackModel(TypedDict, total=True):
 
 @analytics_data_sources.register('inline_feedback')
 class _InlineFeedbackDataSource(BaseDataSource[_InlineFeedbackModel]):
-    def get_data(self) -> t.Mapping[int, _InlineFeedbackModel]:
+    def compute_data(self, work_ids: t.Optional[t.Collection[int]]
+                     ) -> t.Mapping[int, _InlineFeedbackModel]:
         base_with_replies = db.session.query(CommentReply.id).filter(
             CommentReply.comment_base_id == CommentBase.id,
             ~CommentReply.deleted,
@@ -239,7 +395,9 @@ class _InlineFeedbackDataSource(BaseDataSource[_InlineFeedbackModel]):
 
         # We want outer joins here as we want to also get the count of
         # submissions without files or without comments.
-        query = self.workspace.work_query.join(
+        query = _restrict_to_works(
+            self.workspace.work_query, work_ids
+        ).join(
             file_models.File, isouter=True
         ).join(
             CommentBase, isouter=True
@@ -254,3 +412,392 @@ class _InlineFeedbackDataSource(BaseDataSource[_InlineFeedbackModel]):
             }
             for work_id, total_amount in query
         }
+
+
+class AnalyticsSnapshot(Base):
+    """A stored result of a data source of a workspace.
+
+    :ivar ~.AnalyticsSnapshot.workspace_id: The id of the workspace of this
+        snapshot.
+    :ivar ~.AnalyticsSnapshot.name: The name of the data in this snapshot.
+    :ivar ~.AnalyticsSnapshot.version: The ``data_version`` of the workspace
+        at which this snapshot was taken.
+    """
+    __tablename__ = 'analytics_snapshot'
+
+    workspace_id = db.Column(
+        'workspace_id',
+        db.Integer,
+        db.ForeignKey('analytics_workspace.id', ondelete='CASCADE'),
+        nullable=False,
+        primary_key=True,
+    )
+    name = db.Column('name', db.Unicode, nullable=False, primary_key=True)
+    version = db.Column('version', db.Integer, nullable=False)
+    _data = db.Column('data', JSONB, nullable=False)
+
+    def get_data(self) -> t.Mapping[int, t.Any]:
+        """Get the data stored in this snapshot.
+
+        :returns: A mapping between the id of each submission in the snapshot
+            and its data.
+        """
+        return {int(work_id): value for work_id, value in self._data.items()}
+
+    @classmethod
+    def store(
+        cls,
+        workspace: AnalyticsWorkspace,
+        name: str,
+        version: int,
+        data: t.Mapping[int, object],
+    ) -> None:
+        """Store a snapshot of a workspace.
+
+        An existing snapshot is only replaced if it is older than the given
+        one. Changes that are included in all snapshots of the workspace are
+        removed afterwards.
+
+        :param workspace: The workspace of the snapshot.
+        :param name: The name of the snapshot.
+        :param version: The version of the workspace of the given data.
+        :param data: The data to store.
+        :returns: Nothing.
+        """
+        # Changes are only recorded for workspaces that have a snapshot, so a
+        # snapshot can only be stored when the workspace did not change after
+        # the given version. The lock makes sure that no change is committed
+        # until the snapshot is. As changes are only recorded while committing
+        # this only waits for, and only blocks, the commits of changes.
+        current_version = db.session.query(
+            AnalyticsWorkspace.data_version
+        ).filter(
+            AnalyticsWorkspace.id == workspace.id,
+        ).with_for_update(read=True).scalar()
+        if current_version != version:
+            return
+
+        table = sqlalchemy.inspect(cls).local_table
+        stmt = insert(table).values(
+            workspace_id=workspace.id,
+            name=name,
+            version=version,
+            data={str(work_id): value
+                  for work_id, value in data.items()},
+        )
+        db.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[table.c.workspace_id, table.c.name],
+                set_={
+                    'version': stmt.excluded.version,
+                    'data': stmt.excluded.data,
+                },
+                where=table.c.version < stmt.excluded.version,
+            )
+        )
+
+        oldest_version = db.session.query(
+            sqlalchemy.func.min(cls.version)
+        ).filter(cls.workspace_id == workspace.id).as_scalar()
+        db.session.query(AnalyticsWorkspaceChange).filter(
+            AnalyticsWorkspaceChange.workspace_id == workspace.id,
+            AnalyticsWorkspaceChange.version <= oldest_version,
+        ).delete(synchronize_session=False)
+
+
+class AnalyticsWorkspaceChange(IdMixin, Base):
+    """A change that might have changed the data of a workspace.
+
+    :ivar ~.AnalyticsWorkspaceChange.workspace_id: The id of the changed
+        workspace.
+    :ivar ~.AnalyticsWorkspaceChange.version: The ``data_version`` of the
+        workspace after this change.
+    :ivar ~.AnalyticsWorkspaceChange.work_id: The id of the submission of which
+        the data might have changed, or ``None`` if the data of all
+        submissions might have changed.
+    """
+    __tablename__ = 'analytics_workspace_change'
+
+    workspace_id = db.Column(
+        'workspace_id',
+        db.Integer,
+        db.ForeignKey('analytics_workspace.id', ondelete='CASCADE'),
+        nullable=False,
+    )
+    version = db.Column('version', db.Integer, nullable=False)
+    # This is not a foreign key, as the submission might be deleted.
+    work_id = db.Column('work_id', db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.Index(
+            'ix_analytics_workspace_change_workspace_id_version',
+            workspace_id,
+            version,
+        ),
+    )
+
+
+# The key in the ``info`` of the session where the changes that might change
+# the data of workspaces are stored during a flush.
+_ANALYTICS_CHANGED_KEY = '__cg_analytics_changed'
+# The key in the ``info`` of the session where the changed submissions per
+# assignment are stored until the session is committed.
+_ANALYTICS_PENDING_KEY = '__cg_analytics_pending'
+_WORK_COLUMNS = (
+    '_grade', 'assigned_to', 'created_at', 'user_id', 'assignment_id',
+    '_deleted'
+)
+_ASSIGNMENT_COLUMNS = ('_max_grade', 'fixed_max_rubric_points')
+
+
+@dataclasses.dataclass
+class _AnalyticsChanges:
+    """The changes collected in a flush that might change the data of
+    workspaces.
+    """
+    works: t.Set[t.Tuple[int, int]] = dataclasses.field(default_factory=set)
+    work_ids: t.Set[int] = dataclasses.field(default_factory=set)
+    file_ids: t.Set[int] = dataclasses.field(default_factory=set)
+    comment_base_ids: t.Set[int] = dataclasses.field(default_factory=set)
+    rubric_row_ids: t.Set[int] = dataclasses.field(default_factory=set)
+    assignment_ids: t.Set[int] = dataclasses.field(default_factory=set)
+
+    def add(self, obj: object, state: t.Optional[t.Any]) -> None:
+        """Add a changed object.
+
+        :param obj: The object that was changed.
+        :param state: The state of the object if it was updated, or ``None``
+            if it was created or deleted.
+        """
+
+        def has_changes(cols: t.Sequence[str]) -> bool:
+            return state is None or any(
+                state.attrs[col].history.has_changes() for col in cols
+            )
+
+        if isinstance(obj, work_models.Work):
+            if has_changes(_WORK_COLUMNS):
+                old_assigs = [] if state is None else list(
+                    state.attrs.assignment_id.history.deleted
+                )
+                for assig_id in [obj.assignment_id, *old_assigs]:
+                    self.works.add((assig_id, obj.id))
+        elif isinstance(obj, rubric_models.WorkRubricItem):
+            self.work_ids.add(obj.work_id)
+        elif isinstance(obj, CommentReply):
+            self.comment_base_ids.add(obj.comment_base_id)
+        elif isinstance(obj, CommentBase):
+            self.file_ids.add(obj.file_id)
+        elif isinstance(obj, rubric_models.RubricItem):
+            self.rubric_row_ids.add(obj.rubricrow_id)
+        elif isinstance(obj, rubric_models.RubricRowBase):
+            if obj.assignment_id is not None:
+                self.assignment_ids.add(obj.assignment_id)
+        elif isinstance(obj, assignment_models.Assignment):
+            # A new assignment also gets new workspaces, which do not have
+            # any data yet.
+            if state is not None and has_changes(_ASSIGNMENT_COLUMNS):
+                self.assignment_ids.add(obj.id)
+
+    def get_changed_per_assignment(
+        self, session: t.Any
+    ) -> t.Mapping[int, t.Optional[t.Set[int]]]:
+        """Get the changed submissions per assignment.
+
+        :param session: The session to use to query the database.
+        :returns: A mapping between an assignment id and the ids of the changed
+            submissions in that assignment, which is ``None`` if the data of
+            all submissions might have changed.
+        """
+        Work = work_models.Work
+        File = file_models.File
+
+        works = set(self.works)
+        if self.work_ids:
+            works.update(
+                session.query(Work.assignment_id, Work.id).filter(
+                    Work.id.in_(list(self.work_ids))
+                )
+            )
+        if self.comment_base_ids:
+            self.file_ids.update(
+                file_id for file_id, in session.query(CommentBase.file_id).
+                filter(CommentBase.id.in_(list(self.comment_base_ids)))
+            )
+        if self.file_ids:
+            works.update(
+                session.query(Work.assignment_id, Work.id).join(
+                    File, File.work_id == Work.id
+                ).filter(File.id.in_(list(self.file_ids)))
+            )
+
+        assignment_ids = set(self.assignment_ids)
+        if self.rubric_row_ids:
+            RubricRow = rubric_models.RubricRowBase
+            assignment_ids.update(
+                assig_id for assig_id, in session.query(
+                    RubricRow.assignment_id
+                ).filter(RubricRow.id.in_(list(self.rubric_row_ids)))
+            )
+
+        res: t.Dict[int, t.Optional[t.Set[int]]] = {
+            assig_id: None
+            for assig_id in assignment_ids
+        }
+        for assig_id, work_id in works:
+            changed = res.setdefault(assig_id, set())
+            if changed is not None and work_id is not None:
+                changed.add(work_id)
+        return res
+
+
+# These listeners are registered on the session class, and not on
+# ``db.session``, so that they also work for sessions created by
+# ``db.create_scoped_session``.
+@event.listens_for(SignallingSession, 'after_flush')
+def _collect_analytics_changes(session: t.Any, _: object) -> None:
+    """Collect the changes in this flush that might change the data of
+    workspaces.
+    """
+    changes: _AnalyticsChanges = session.info.setdefault(
+        _ANALYTICS_CHANGED_KEY, _AnalyticsChanges()
+    )
+    for obj in itertools.chain(session.new, session.deleted):
+        changes.add(obj, None)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            changes.add(obj, sqlalchemy.inspect(obj))
+
+
+@event.listens_for(SignallingSession, 'after_flush_postexec')
+def _get_changed_submissions(session: t.Any, _: object) -> None:
+    """Add the changes collected by :func:`_collect_analytics_changes` to the
+    changes that should be recorded when the session is committed.
+    """
+    changes: t.Optional[_AnalyticsChanges] = session.info.pop(
+        _ANALYTICS_CHANGED_KEY, None
+    )
+    if changes is None:
+        return
+    changed_per_assig = changes.get_changed_per_assignment(session)
+    if changed_per_assig:
+        _add_pending_changes(session, changed_per_assig)
+
+
+@event.listens_for(SignallingSession, 'before_commit')
+def _bump_workspace_versions(session: t.Any) -> None:
+    """Record the changes of this session in the workspaces.
+    """
+    # The changes of objects that are not yet flushed are only known after
+    # they are flushed, which would otherwise happen after this listener.
+    session.flush()
+    changed_per_assig = session.info.pop(_ANALYTICS_PENDING_KEY, None)
+    if changed_per_assig:
+        _record_workspace_changes(session, changed_per_assig)
+
+
+@event.listens_for(SignallingSession, 'after_soft_rollback')
+def _forget_workspace_changes(session: t.Any, transaction: t.Any) -> None:
+    # Changes made before a rolled back savepoint should still be recorded.
+    # Changes made in the savepoint are recorded too, but this only means
+    # that some data is computed again.
+    if not transaction.nested:
+        session.info.pop(_ANALYTICS_PENDING_KEY, None)
+
+
+def _add_pending_changes(
+    session: t.Any,
+    changed_per_assig: t.Mapping[int, t.Optional[t.Set[int]]],
+) -> None:
+    """Add changes that should be recorded when the session is committed.
+
+    :param session: The session in which the changes were made.
+    :param changed_per_assig: A mapping between an assignment id and the ids
+        of the changed submissions in that assignment, or ``None`` if the data
+        of all submissions might have changed.
+    :returns: Nothing.
+    """
+    pending: t.Dict[int, t.Optional[t.Set[int]]] = session.info.setdefault(
+        _ANALYTICS_PENDING_KEY, {}
+    )
+    for assig_id, work_ids in changed_per_assig.items():
+        changed = pending.setdefault(assig_id, set())
+        if changed is None:
+            continue
+        elif work_ids is None:
+            pending[assig_id] = None
+        else:
+            changed.update(work_ids)
+
+
+def _record_workspace_changes(
+    session: t.Any,
+    changed_per_assig: t.Mapping[int, t.Optional[t.Set[int]]],
+) -> None:
+    """Increment the version of the workspaces of the given assignments, and
+    store what changed for the workspaces that have a snapshot.
+
+    As the rows of the workspaces are locked concurrent transactions changing
+    the same workspace are serialized, which makes sure the versions are
+    committed in order. This is only done when a session is committed, so
+    the locks are only held while committing and not during the entire
+    transaction.
+
+    :param session: The session to use.
+    :param changed_per_assig: A mapping between an assignment id and the ids
+        of the changed submissions in that assignment, or ``None`` if the data
+        of all submissions might have changed.
+    :returns: Nothing.
+    """
+    # The workspaces are locked in a fixed order to prevent deadlocks.
+    workspace_ids = [
+        workspace_id for workspace_id, in session.query(
+            AnalyticsWorkspace.id
+        ).filter(
+            AnalyticsWorkspace.assignment_id.in_(sorted(changed_per_assig))
+        ).order_by(AnalyticsWorkspace.id).with_for_update()
+    ]
+    if not workspace_ids:
+        return
+
+    data_version: t.Any = AnalyticsWorkspace.data_version
+    session.query(AnalyticsWorkspace).filter(
+        AnalyticsWorkspace.id.in_(workspace_ids)
+    ).update(
+        {data_version: data_version + 1},
+        synchronize_session=False,
+    )
+    has_snapshot = session.query(AnalyticsSnapshot).filter(
+        AnalyticsSnapshot.workspace_id == AnalyticsWorkspace.id
+    ).exists()
+    workspaces = session.query(
+        AnalyticsWorkspace.id,
+        AnalyticsWorkspace.assignment_id,
+        AnalyticsWorkspace.data_version,
+        has_snapshot,
+    ).filter(AnalyticsWorkspace.id.in_(workspace_ids)).all()
+
+    # The changes are only used to refresh existing snapshots, see
+    # :meth:`AnalyticsSnapshot.store`.
+    rows = [
+        {
+            'workspace_id': workspace_id,
+            'version': version,
+            'work_id': work_id,
+        }
+        for workspace_id, assig_id, version, snapshotted in workspaces
+        if snapshotted
+        for work_id in (changed_per_assig[assig_id] or [None])
+    ]
+    if rows:
+        table = sqlalchemy.inspect(AnalyticsWorkspaceChange).local_table
+        session.execute(table.insert(), rows)
+
+    for workspace_id, _, version, _ in workspaces:
+        workspace = session.identity_map.get(
+            identity_key(AnalyticsWorkspace, workspace_id)
+        )
+        if workspace is not None:
+            orm.attributes.set_committed_value(
+                workspace, 'data_version', version
+            )
@@ -1612,14 +1612,9 @@ class Assignment(helpers.NotEqualMixin, Base):  # pylint: disable=too-many-publi
         """
         if self._cgignore is None:
             return None
-        elif self._cgignore_version is None:  # pragma: no cover
-            # This branch is needed for backwards compatibility, but it is not
-            # possible to test as it is not possible to insert this old data
-            # using the api.
-            return ignore.IgnoreFilterManager.parse(self._cgignore)
-        else:
-            filter_type = ignore.filter_handlers[self._cgignore_version]
-            return filter_type.parse(json.loads(self._cgignore))
+        return ignore.parse_stored_filter(
+            self._cgignore_version, self._cgignore
+        )
 
     @cgignore.setter
     def cgignore(self, val: ignore.SubmissionFilter) -> None:
@@ -2396,28 +2391,28 @@ class Assignment(helpers.NotEqualMixin, Base):  # pylint: disable=too-many-publi
         if not self.is_visible:
             return base_query.filter(sqlalchemy.sql.false())
 
-        # TODO: Investigate this subquery here. We need to do that right now as
-        # other functions might use this method and might want to order in a
-        # different way or do other distincts. But I have no idea how slow this
-        # subquery makes the query, as postgres could optimize it out.
-        sql = db.session.query(
-            work_models.Work.id,
-        ).filter(
-            work_models.Work.assignment_id == self.id,
-        ).order_by(
-            work_models.Work.user_id,
-            work_models.Work.created_at.desc(),
-            # Sort by id too so that when the date is exactly the same we can
-            # still have well defined behavior (i.e. always get the same
-            # submissions for a user.)
-            work_models.Work.id.desc()
-        )
-        if not include_deleted:
-            sql = sql.filter_by(_deleted=False)
-
-        sub = sql.distinct(work_models.Work.user_id).subquery('ids')
-
-        res = base_query.filter(work_models.Work.id.in_(sub), )
+        if include_deleted:
+            sql = db.session.query(
+                work_models.Work.id,
+            ).filter(
+                work_models.Work.assignment_id == self.id,
+            ).order_by(
+                work_models.Work.user_id,
+                work_models.Work.created_at.desc(),
+                # Sort by id too so that when the date is exactly the same we
+                # can still have well defined behavior (i.e. always get the
+                # same submissions for a user.)
+                work_models.Work.id.desc()
+            )
+            sub = sql.distinct(work_models.Work.user_id).subquery('ids')
+            res = base_query.filter(work_models.Work.id.in_(sub))
+        else:
+            # The latest non deleted submissions are marked when they are
+            # flushed, which uses the same ordering as the query above.
+            res = base_query.filter(
+                work_models.Work.assignment_id == self.id,
+                work_models.Work.is_latest,
+            )
         if self.group_set_id is not None and not include_old_user_submissions:
             sub_query = db.session.query(work_models.Work).filter(
                 work_models.Work.assignment_id == self.id,
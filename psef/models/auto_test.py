@@ -2,15 +2,21 @@
 
 SPDX-License-Identifier: AGPL-3.0-only
 """
+import json
 import math
 import uuid
 import typing as t
+import hashlib
+import datetime
 import itertools
 
 import structlog
+import sqlalchemy
 from sqlalchemy import orm, distinct
+from sqlalchemy.types import JSON
 from typing_extensions import Literal, TypedDict
 from sqlalchemy.sql.expression import or_, and_, case, nullsfirst
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
 import psef
 import cg_helpers
@@ -21,6 +27,7 @@ from cg_typing_extensions import make_typed_dict_extender
 from cg_sqlalchemy_helpers import UUIDType
 from cg_sqlalchemy_helpers import func as sql_func
 from cg_sqlalchemy_helpers import deferred, hybrid_property
+from cg_sqlalchemy_helpers.types import ColumnProxy
 from cg_sqlalchemy_helpers.mixins import IdMixin, UUIDMixin, TimestampMixin
 
 from . import Base, MyQuery, DbColumn, db
@@ -40,6 +47,19 @@ GradeCalculator = t.Callable[[t.Sequence['psef.models.RubricItem'], float],
                              'psef.models.RubricItem']
 
 
+def _hash_json(obj: object) -> str:
+    """Get a stable hash of the given JSON serializable object.
+
+    >>> _hash_json({'a': 1, 'b': 2}) == _hash_json({'b': 2, 'a': 1})
+    True
+    >>> _hash_json([1, 2]) == _hash_json([2, 1])
+    False
+    """
+    return hashlib.sha256(
+        json.dumps(obj, sort_keys=True, default=str).encode('utf8')
+    ).hexdigest()
+
+
 class AutoTestSuite(Base, TimestampMixin, IdMixin):
     """This class represents a Suite (also known as category) in an AutoTest.
     """
@@ -343,6 +363,14 @@ class AutoTestResult(Base, TimestampMixin, IdMixin, NotEqualMixin):
 
     final_result = db.Column('final_result', db.Boolean, nullable=False)
 
+    # The amount of points achieved in all suites. This is kept up to date
+    # when step results change, so listing results doesn't need to load all
+    # step results. It is ``None`` for results that were last updated before
+    # this column existed.
+    _points_achieved = db.Column(
+        'points_achieved', db.Float, nullable=True, default=0
+    )
+
     # This variable is generated from the backref from all files
     files: MyQuery["psef.models.AutoTestOutputFile"]
 
@@ -419,6 +447,7 @@ class AutoTestResult(Base, TimestampMixin, IdMixin, NotEqualMixin):
         .. note:: This also clears the rubric
         """
         self.step_results = []
+        self._points_achieved = 0
         self.state = auto_test_step_models.AutoTestStepResultState.not_started
         self.setup_stderr = None
         self.setup_stdout = None
@@ -508,6 +537,54 @@ class AutoTestResult(Base, TimestampMixin, IdMixin, NotEqualMixin):
 
         return achieved, possible
 
+    @property
+    def points_achieved(self) -> float:
+        """The amount of points achieved in all suites of this result.
+        """
+        if self._points_achieved is None:
+            return self.get_amount_points_in_suites(
+                *self.run.auto_test.all_suites
+            )[0]
+        return self._points_achieved
+
+    def update_points_achieved(self) -> None:
+        """Update the stored amount of achieved points of this result.
+
+        This should be called every time the step results of this result
+        change.
+        """
+        self._points_achieved, _ = self.get_amount_points_in_suites(
+            *self.run.auto_test.all_suites
+        )
+
+    def get_reused_suite_points(self) -> t.Dict[int, t.Tuple[float, float]]:
+        """Get the points of the suites that already have results before this
+        result was started.
+
+        These results are copied from a previous run, see
+        :meth:`.AutoTestRun.reuse_stored_results`.
+
+        :returns: A mapping from suite id to a tuple of the achieved points and
+            the possible points in that suite, calculated in the same way as a
+            runner does.
+        """
+        run = self.run
+        res = {}
+        for suite in run.auto_test.all_suites:
+            step_results = [
+                sr for sr in self.step_results
+                if sr.step.auto_test_suite_id == suite.id
+            ]
+            if not step_results:
+                continue
+            possible = sum(
+                step['weight']
+                for step in suite.get_instructions(run)['steps']
+            )
+            achieved = sum(sr.achieved_points for sr in step_results)
+            res[suite.id] = (achieved, possible)
+        return res
+
     class AsJSON(TypedDict):
         """The JSON representation of a result.
         """
@@ -557,17 +634,13 @@ class AutoTestResult(Base, TimestampMixin, IdMixin, NotEqualMixin):
     def __to_json__(self) -> AsJSON:
         """Convert this result to a json object.
         """
-        points_achieved, _ = self.get_amount_points_in_suites(
-            *self.run.auto_test.all_suites
-        )
-
         return {
             'id': self.id,
             'created_at': self.created_at,
             'started_at': self.started_at,
             'work_id': self.work_id,
             'state': self.state,
-            'points_achieved': points_achieved,
+            'points_achieved': self.points_achieved,
         }
 
     def __extended_to_json__(self) -> AsExtendedJSON:
@@ -621,6 +694,50 @@ class AutoTestResult(Base, TimestampMixin, IdMixin, NotEqualMixin):
         return cls.query.filter(cls.work_id.in_(work_ids))
 
 
+class AutoTestSuiteResultCache(Base, TimestampMixin, IdMixin):
+    """The stored step results of a suite for a submission, that can be reused
+    by a later run of the same AutoTest.
+
+    The results are stored when a run is deleted, and are copied to the new
+    results when a run is started. They are only reused when the
+    ``cache_key`` still matches, which is a hash of the files of the
+    submission and of everything in the configuration that is used to run the
+    suite.
+    """
+    __tablename__ = 'auto_test_suite_result_cache'
+
+    auto_test_id = db.Column(
+        'auto_test_id',
+        db.Integer,
+        db.ForeignKey('AutoTest.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True,
+    )
+
+    work_id = db.Column(
+        'work_id',
+        db.Integer,
+        db.ForeignKey('Work.id', ondelete='CASCADE'),
+        nullable=False,
+    )
+
+    auto_test_suite_id = db.Column(
+        'auto_test_suite_id',
+        db.Integer,
+        db.ForeignKey('AutoTestSuite.id', ondelete='CASCADE'),
+        nullable=False,
+    )
+
+    cache_key = db.Column('cache_key', db.Unicode, nullable=False)
+
+    #: A list of the step results, each item contains the
+    #: ``auto_test_step_id``, the ``state`` (as its name) and the ``log`` of
+    #: the step result.
+    step_results: ColumnProxy[t.List[t.Dict[str, t.Any]]] = db.Column(
+        'step_results', JSON, nullable=False
+    )
+
+
 class AutoTestRunner(Base, TimestampMixin, UUIDMixin, NotEqualMixin):
     """This class represents the runner of a :class:`.AutoTestRun`.
 
@@ -714,6 +831,12 @@ class AutoTestRun(Base, TimestampMixin, IdMixin):
     """
     __tablename__ = 'AutoTestRun'
 
+    #: The ``updated_at`` of a result is set when the change is flushed, not
+    #: when it is committed, so a change might only become visible after a
+    #: cursor later than its ``updated_at`` was handed out. Changes are
+    #: therefore retrieved with this margin before the cursor.
+    _CHANGES_CURSOR_MARGIN = datetime.timedelta(seconds=30)
+
     auto_test_id = db.Column(
         'auto_test_id',
         db.Integer,
@@ -1002,16 +1125,10 @@ class AutoTestRun(Base, TimestampMixin, IdMixin):
         :returns: A query that returns the results for the latest submissions
             of the connected assignment.
         """
-        latest_ids = self.auto_test.assignment.get_from_latest_submissions(
-            work_models.Work.id
+        return self._get_listed_results(latest_only=True).order_by(
+            AutoTestResult.created_at
         )
 
-        return db.session.query(AutoTestResult).filter_by(
-            auto_test_run_id=self.id,
-        ).filter(
-            t.cast(DbColumn[int], AutoTestResult.work_id).in_(latest_ids)
-        ).order_by(AutoTestResult.created_at)
-
     def get_results_to_run(self) -> MyQuery[AutoTestResult]:
         """Get a query to get the :py:class:`.AutoTestResult` items that still
             need to be run.
@@ -1140,16 +1257,12 @@ class AutoTestRun(Base, TimestampMixin, IdMixin):
         }
 
     def __extended_to_json__(self) -> AsExtendedJSON:
-        all_results: t.Iterable[AutoTestResult]
-        if psef.helpers.jsonify_options.get_options().latest_only:
-            all_results = self.get_results_latest_submissions()
-        else:
-            all_results = [r for r in self.results if not r.work.deleted]
-
-        results = [
-            result for result in all_results
-            if auth.AutoTestResultPermissions(result).ensure_may_see.as_bool()
-        ]
+        latest_only = psef.helpers.jsonify_options.get_options().latest_only
+        results = self._filter_visible_results(
+            self._get_listed_results(latest_only).order_by(
+                AutoTestResult.created_at
+            )
+        )
 
         # TODO: Check permissions for setup_stdout/setup_stderr
         return make_typed_dict_extender(
@@ -1160,12 +1273,372 @@ class AutoTestRun(Base, TimestampMixin, IdMixin):
             setup_stderr=self.setup_stderr or '',
         )
 
+    def _get_listed_results(self, latest_only: bool
+                            ) -> MyQuery[AutoTestResult]:
+        """Get the results that are listed in the extended JSON of this run.
+
+        :param latest_only: Only get the results of the latest submissions.
+        :returns: An unordered query for the results.
+        """
+        query = db.session.query(AutoTestResult).filter_by(
+            auto_test_run_id=self.id,
+        )
+        if latest_only:
+            latest_ids = self.auto_test.assignment.get_from_latest_submissions(
+                work_models.Work.id
+            )
+            return query.filter(
+                t.cast(DbColumn[int], AutoTestResult.work_id).in_(latest_ids)
+            )
+        return query.join(AutoTestResult.work).filter(
+            ~work_models.Work.deleted
+        )
+
+    @staticmethod
+    def _filter_visible_results(query: MyQuery[AutoTestResult]
+                                ) -> t.List[AutoTestResult]:
+        """Get the results of the given query that the current user may see.
+        """
+        # The points of the results are stored on the result itself, so don't
+        # load all their step results.
+        return auth.AutoTestResultPermissions.filter_may_see(
+            query.options(orm.lazyload(AutoTestResult.step_results))
+        )
+
+    def get_results_version(self, latest_only: bool) -> str:
+        """Get a version of the results listed in the extended JSON of this
+        run for the current user.
+
+        The version changes whenever a result is added to, changed or removed
+        from the listed results, when the run itself (for example its setup
+        output) changed, or when the results the user may see might have
+        changed. It is computed without loading any of the results, which
+        makes it usable as an ETag.
+
+        :param latest_only: Only consider the results of the latest
+            submissions.
+        :returns: An opaque string identifying the current state of the
+            results.
+        """
+        # The ids of the listed results are included, as the listing can
+        # change without changing any result, for example when the latest
+        # submission of a student is deleted.
+        listed_ids, last_update = self._get_listed_results(
+            latest_only
+        ).with_entities(
+            sqlalchemy.func.array_agg(
+                aggregate_order_by(AutoTestResult.id, AutoTestResult.id)
+            ),
+            sql_func.max(AutoTestResult.updated_at),
+        ).one()
+        assig = self.auto_test.assignment
+        return _hash_json(
+            [
+                self.id,
+                self.updated_at.isoformat(),
+                latest_only,
+                listed_ids or [],
+                last_update and last_update.isoformat(),
+                psef.current_user.id,
+                assig.state.name,
+                assig.deadline and assig.deadline.isoformat(),
+                assig.is_done,
+                self.auto_test.results_always_visible,
+            ]
+        )
+
+    class ResultChangesAsJSON(TypedDict):
+        """The changes to the results of a run since a given moment.
+        """
+        #: The moment up to which changes are included. Pass this as ``since``
+        #: to get the changes after this response.
+        cursor: DatetimeWithTimezone
+        #: The results that changed, or were added to the run, since the
+        #: given moment.
+        results: t.List[AutoTestResult]
+        #: The ids of the results of the run that are not listed (anymore),
+        #: for example because the student handed in a new submission or
+        #: because the submission was deleted.
+        removed_ids: t.List[int]
+
+    def get_result_changes(
+        self,
+        since: DatetimeWithTimezone,
+        latest_only: bool,
+    ) -> ResultChangesAsJSON:
+        """Get the results that changed since the given moment.
+
+        A client that has the extended JSON of this run can keep it up to date
+        by merging these changes, instead of retrieving all results again.
+        Changes are reported at least once, but might be reported more than
+        once.
+
+        :param since: Get changes made after this moment, this should be the
+            ``cursor`` of a previous call, or the moment the extended JSON of
+            this run was retrieved.
+        :param latest_only: Only consider the results of the latest
+            submissions.
+        :returns: The changed results, and the moment at which the next call
+            should start.
+        """
+        cursor = DatetimeWithTimezone.utcnow()
+        listed = self._get_listed_results(latest_only)
+
+        results = self._filter_visible_results(
+            listed.filter(
+                AutoTestResult.updated_at >=
+                since - self._CHANGES_CURSOR_MARGIN
+            ).order_by(AutoTestResult.created_at)
+        )
+
+        # Results are not changed when they are no longer listed, for example
+        # when the submission of the result is deleted, so all results that
+        # are not listed are always returned.
+        removed_ids = [
+            result_id for result_id, in db.session.query(
+                AutoTestResult.id,
+            ).filter(
+                AutoTestResult.auto_test_run_id == self.id,
+                ~AutoTestResult.id.in_(
+                    listed.with_entities(AutoTestResult.id)
+                ),
+            ).order_by(AutoTestResult.id)
+        ]
+
+        return {
+            'cursor': cursor,
+            'results': results,
+            'removed_ids': removed_ids,
+        }
+
+    def _get_suite_cache_keys(
+        self, work_ids: t.Collection[int]
+    ) -> t.Dict[t.Tuple[int, int], str]:
+        """Get the keys with which the results of suites can be reused.
+
+        The key of a suite for a submission is a hash of the files of the
+        submission, the instructions of the suite, and the parts of the
+        AutoTest configuration that are used when running every suite.
+        Files are never changed in place, a changed file gets a new backing
+        file, so the rows of the file tree are used instead of the contents of
+        the files.
+
+        :param work_ids: The ids of the submissions to get the keys for.
+        :returns: A mapping from ``(work_id, suite_id)`` to the key. Suites
+            that should never be reused are not included.
+        """
+        auto_test = self.auto_test
+        config_hash = _hash_json(
+            {
+                'fixtures': [(f.name, f.id) for f in auto_test.fixtures],
+                'setup_script': auto_test.setup_script,
+                'run_setup_script': auto_test.run_setup_script,
+                'prefer_teacher_revision': auto_test.prefer_teacher_revision,
+            }
+        )
+        suite_hashes = {
+            suite.id: _hash_json([config_hash, suite.get_instructions(self)])
+            for suite in auto_test.all_suites
+            # The environment of these suites contains information about the
+            # result, which is different for every run.
+            if not suite.submission_info
+        }
+        if not work_ids or not suite_hashes:
+            return {}
+
+        File = psef.models.File  # pylint: disable=invalid-name
+        rows = db.session.query(
+            File.work_id,
+            File.parent_id,
+            File.name,
+            File._filename,  # pylint: disable=protected-access
+            File.fileowner,
+            File.self_deleted,
+        ).filter(
+            t.cast(DbColumn[int], File.work_id).in_(list(work_ids))
+        ).order_by(File.work_id, File.id)
+
+        tree_hashes: t.Dict[int, 'hashlib._Hash'] = {}
+        for work_id, *row in rows:
+            if work_id not in tree_hashes:
+                tree_hashes[work_id] = hashlib.sha256()
+            tree_hashes[work_id].update(
+                json.dumps(row, default=str).encode('utf8')
+            )
+
+        return {
+            (work_id, suite_id): _hash_json(
+                [tree_hash.hexdigest(), suite_hash]
+            )
+            for work_id, tree_hash in tree_hashes.items()
+            for suite_id, suite_hash in suite_hashes.items()
+        }
+
+    def store_reusable_results(self) -> None:
+        """Store the results of this run so they can be reused by a next run
+        of the same AutoTest.
+
+        This replaces all results stored earlier for the AutoTest. Only the
+        suites of passed results are stored, and only if they produced no
+        attachments or output files.
+        """
+        Cache = AutoTestSuiteResultCache  # pylint: disable=invalid-name
+        Cache.query.filter(Cache.auto_test_id == self.auto_test_id).delete()
+
+        if not psef.current_app.config['AUTO_TEST_REUSE_RESULTS']:
+            return
+
+        results = [
+            result for result in self.get_results_latest_submissions()
+            if result.state ==
+            auto_test_step_models.AutoTestStepResultState.passed
+        ]
+        keys = self._get_suite_cache_keys(set(r.work_id for r in results))
+        if not keys:
+            return
+
+        # pylint: disable=invalid-name
+        OutputFile = psef.models.AutoTestOutputFile
+        with_output_files = set(
+            db.session.query(
+                OutputFile.auto_test_result_id, OutputFile.auto_test_suite_id
+            ).filter(
+                t.cast(DbColumn[int], OutputFile.auto_test_result_id).in_(
+                    [r.id for r in results]
+                )
+            ).distinct()
+        )
+        finished_states = (
+            auto_test_step_models.AutoTestStepResultState.
+            get_finished_states()
+        )
+
+        to_store = []
+        for result in results:
+            by_suite: t.Dict[int, t.List['psef.models.AutoTestStepResult']]
+            by_suite = {}
+            for step_result in result.step_results:
+                by_suite.setdefault(step_result.step.auto_test_suite_id,
+                                    []).append(step_result)
+
+            for suite_id, step_results in by_suite.items():
+                key = keys.get((result.work_id, suite_id))
+                if key is None or (result.id, suite_id) in with_output_files:
+                    continue
+                if any(
+                    sr.has_attachment or sr.state not in finished_states
+                    for sr in step_results
+                ):
+                    continue
+
+                to_store.append(
+                    Cache(
+                        auto_test_id=self.auto_test_id,
+                        work_id=result.work_id,
+                        auto_test_suite_id=suite_id,
+                        cache_key=key,
+                        step_results=[
+                            {
+                                'auto_test_step_id': sr.auto_test_step_id,
+                                'state': sr.state.name,
+                                'log': sr.log,
+                            } for sr in step_results
+                        ],
+                    )
+                )
+
+        logger.info('Storing reusable suite results', amount=len(to_store))
+        db.session.bulk_save_objects(to_store)
+
+    def reuse_stored_results(self) -> None:
+        """Copy the stored results of a previous run for all suites that did
+        not change.
+
+        Results of which all suites that would be run are copied are marked as
+        passed, so they will not be run by a runner. Runners skip the copied
+        suites of the other results.
+        """
+        Cache = AutoTestSuiteResultCache  # pylint: disable=invalid-name
+        if not psef.current_app.config['AUTO_TEST_REUSE_RESULTS']:
+            return
+
+        stored = Cache.query.filter(
+            Cache.auto_test_id == self.auto_test_id
+        ).all()
+        keys = self._get_suite_cache_keys(set(c.work_id for c in stored))
+        usable: t.Dict[int, t.List[AutoTestSuiteResultCache]] = {}
+        for cache in stored:
+            if keys.get((cache.work_id, cache.auto_test_suite_id)
+                        ) == cache.cache_key:
+                usable.setdefault(cache.work_id, []).append(cache)
+        if not usable:
+            return
+
+        results = self.get_results_latest_submissions().filter(
+            t.cast(DbColumn[int],
+                   AutoTestResult.work_id).in_(list(usable.keys()))
+        ).all()
+        StepResultState = auto_test_step_models.AutoTestStepResultState
+        db.session.bulk_insert_mappings(
+            auto_test_step_models.AutoTestStepResult,
+            [
+                {
+                    'auto_test_result_id': result.id,
+                    'auto_test_step_id': step_result['auto_test_step_id'],
+                    '_state': StepResultState[step_result['state']],
+                    'log': step_result['log'],
+                } for result in results for cache in usable[result.work_id]
+                for step_result in cache.step_results
+            ],
+        )
+        logger.info(
+            'Reused stored suite results',
+            amount_results=len(results),
+            amount_suites=sum(len(usable[r.work_id]) for r in results),
+        )
+
+        for result in results:
+            db.session.expire(result)
+            result.update_points_achieved()
+            if self._all_suites_reused(result):
+                result.state = StepResultState.passed
+
+    def _all_suites_reused(self, result: AutoTestResult) -> bool:
+        """Check if the given result does not need to be run anymore, as all
+        suites that would be run are reused.
+
+        This mirrors the way a runner stops running a result when not enough
+        points were achieved in a set.
+        """
+        reused = result.get_reused_suite_points()
+        total_points = 0.0
+        possible_points = 0.0
+
+        for test_set in self.auto_test.sets:
+            for suite in test_set.suites:
+                if suite.id not in reused:
+                    return False
+                achieved, possible = reused[suite.id]
+                total_points += achieved
+                possible_points += possible
+
+            if psef.helpers.FloatHelpers.le(
+                psef.helpers.safe_div(total_points, possible_points, 1),
+                test_set.stop_points
+            ):
+                break
+
+        return True
+
     def delete_and_clear_rubric(self) -> None:
         """Delete this AutoTestRun and clear all the results and rubrics.
 
         This method will also delete all the existing attachments for step
-        results.
+        results. The results that can be reused by a next run are stored
+        first.
         """
+        self.store_reusable_results()
+
         for result in self.results:
             result.clear_rubric()
 
@@ -1493,7 +1966,9 @@ class AutoTest(Base, TimestampMixin, IdMixin):
         )
         results = [run.make_result(work_id) for work_id, in work_ids]
         db.session.bulk_save_objects(results)
-        if results:
+        run.reuse_stored_results()
+        if results and db.session.query(run.get_results_to_run().exists()
+                                        ).scalar():
             psef.helpers.callback_after_this_request(
                 lambda: psef.tasks.notify_broker_of_new_job(run.id, None)
             )
@@ -1600,6 +2075,10 @@ class AutoTest(Base, TimestampMixin, IdMixin):
             self.add_to_run(work)
         else:
             result.clear()
+            # The result might be listed again without being changed by
+            # clearing it, make sure it is seen as changed by clients that
+            # are polling for changes.
+            result.updated_at = DatetimeWithTimezone.utcnow()
             if not result.final_result:
                 result.final_result = run.new_results_should_be_final
             psef.helpers.callback_after_this_request(
@@ -6,10 +6,12 @@ import os
 import enum
 import uuid
 import typing as t
+import concurrent.futures
 from abc import abstractmethod
 from collections import defaultdict
 
 import structlog
+import sqlalchemy
 from sqlalchemy import event
 from sqlalchemy_utils import UUIDType
 from typing_extensions import Literal, TypedDict
@@ -234,6 +236,8 @@ class NestedFileMixin(FileMixin[T]):
     This mixin should be used by database tables, not for intermediate
     representation of a directory.
     """
+    _BULK_INSERT_CHUNK_SIZE: t.ClassVar[int] = 1000
+
     modification_date = db.Column(
         'modification_date',
         db.TIMESTAMP(timezone=True),
@@ -332,12 +336,119 @@ class NestedFileMixin(FileMixin[T]):
                 assert False
         return new_top
 
+    @classmethod
+    def _allocate_ids(cls, amount: int) -> t.List[T]:
+        """Get ``amount`` new and unique ids for files of this class.
+
+        The default implementation generates UUIDs, so classes with another
+        type of id should override this method.
+        """
+        return [t.cast(T, uuid.uuid4()) for _ in range(amount)]
+
+    @classmethod
+    def _get_bulk_column_values(cls, creation_opts: t.Mapping[str, t.Any]
+                                ) -> t.Dict[str, object]:
+        """Convert the given creation options to the values of columns.
+
+        Options that are relationships are converted to the values of their
+        foreign keys, so the related objects should be flushed.
+        """
+        mapper = sqlalchemy.inspect(cls)
+        res = {}
+        for key, value in creation_opts.items():
+            if key in mapper.relationships:
+                other_mapper = sqlalchemy.inspect(value).mapper
+                rel = mapper.relationships[key]
+                for local, remote in rel.local_remote_pairs:
+                    prop = other_mapper.get_property_by_column(remote)
+                    res[local.key] = getattr(value, prop.key)
+            else:
+                res[mapper.columns[key].key] = value
+        return res
+
+    @classmethod
+    def bulk_create_from_extract_directory(
+        cls: 't.Type[NFM_T]',
+        tree: 'psef.files.ExtractFileTreeDirectory',
+        creation_opts: t.Dict[str, t.Any],
+    ) -> T:
+        """Insert the given tree as new top level directory.
+
+        This does the same as :meth:`.create_from_extract_directory`, but the
+        ids for all files are allocated upfront and the rows are inserted
+        directly, in a few statements with many rows. No ORM objects are
+        created for the inserted files.
+
+        .. note::
+
+            This flushes the session if one of the objects in
+            ``creation_opts`` is not yet flushed.
+
+        :param tree: The tree to insert.
+        :param creation_opts: The extra values for every created file. These
+            can be both columns and relationships.
+        :returns: The id of the top level directory.
+        """
+        if any(
+            not sqlalchemy.inspect(value).has_identity
+            for key, value in creation_opts.items()
+            if key in sqlalchemy.inspect(cls).relationships
+        ):
+            db.session.flush()
+        base_values = cls._get_bulk_column_values(creation_opts)
+
+        entries: t.List[t.Tuple[
+            t.Optional[int], 'psef.files.ExtractFileTreeBase'
+        ]] = [(None, tree)]
+        # Entries are added after their parent, so the parents are always
+        # inserted before their children.
+        for idx, (_, entry) in enumerate(entries):
+            if isinstance(entry, psef.files.ExtractFileTreeDirectory):
+                entries.extend((idx, child) for child in entry.values)
+
+        ids = cls._allocate_ids(len(entries))
+        mapper = sqlalchemy.inspect(cls)
+        id_key = mapper.primary_key[0].key
+        name_key, filename_key, is_dir_key, parent_key = (
+            mapper.columns[col].key
+            for col in ['name', '_filename', 'is_directory', 'parent_id']
+        )
+
+        rows = []
+        for file_id, (parent_idx, entry) in zip(ids, entries):
+            if isinstance(entry, psef.files.ExtractFileTreeFile):
+                filename: t.Optional[str] = entry.backing_file.name
+            else:
+                # The above checks are exhaustive, so this cannot fail.
+                assert isinstance(entry, psef.files.ExtractFileTreeDirectory)
+                filename = None
+            rows.append({
+                **base_values,
+                id_key: file_id,
+                name_key: entry.name,
+                filename_key: filename,
+                is_dir_key: filename is None,
+                parent_key: None if parent_idx is None else ids[parent_idx],
+            })
+
+        table = mapper.local_table
+        for chunk in helpers.chunkify(rows, cls._BULK_INSERT_CHUNK_SIZE):
+            db.session.execute(table.insert().values(chunk))
+
+        return ids[0]
+
     @classmethod
     def _make_cache(cls: t.Type['NFM_T'], query_filter: FilterColumn
                     ) -> t.Mapping[t.Optional[t.Any], t.Sequence['NFM_T']]:
-        cache = defaultdict(list)
         query: MyQuery[NFM_T] = cls.query  # type: ignore[attr-defined]
         all_files = query.filter(query_filter).order_by(cls.name).all()
+        return cls._group_by_parent(all_files)
+
+    @staticmethod
+    def _group_by_parent(
+        all_files: t.List['NFM_T']
+    ) -> t.Mapping[t.Optional[t.Any], t.Sequence['NFM_T']]:
+        cache = defaultdict(list)
         # We sort in Python as this increases consistency between different
         # server platforms, Python also has better defaults.
         # TODO: Investigate if sorting in the database first and sorting in
@@ -354,15 +465,116 @@ class NestedFileMixin(FileMixin[T]):
         cls: t.Type['NestedFileMixin[T]'],
         parent: str,
         cache: t.Mapping[t.Optional[T], t.Sequence['NestedFileMixin[T]']],
+        *,
+        allow_hardlink: bool = False,
     ) -> 'psef.files.FileTree[T]':
         """Restore the directory structure for this class.
         """
-        return cache[None][0]._restore_directory_structure(parent, cache)  # pylint: disable=protected-access
+        return cls.restore_directory_structures(
+            [(parent, cache)], allow_hardlink=allow_hardlink
+        )[0]
+
+    @classmethod
+    def restore_directory_structures(
+        cls: t.Type['NestedFileMixin[T]'],
+        to_restore: t.Sequence[t.Tuple[str, t.Mapping[
+            t.Optional[T], t.Sequence['NestedFileMixin[T]']]]],
+        *,
+        allow_hardlink: bool = False,
+    ) -> t.List['psef.files.FileTree[T]']:
+        """Restore the directory structures of multiple trees.
+
+        The directories are created directly, after which the files are
+        written by a pool of at most ``RESTORE_FILES_MAX_WORKERS`` threads.
+
+        :param to_restore: A list of tuples of the directory to restore in
+            and the cache of the tree that should be restored in it.
+        :param allow_hardlink: Allow the restored files to be hard links to
+            the files in the storage. Only use this when the restored files
+            are never modified.
+        :returns: The restored trees, in the same order as ``to_restore``.
+        """
+        to_write: t.List[t.Tuple[cg_object_storage.File, str]] = []
+        trees = [
+            cache[None][0]._restore_directory_structure(  # pylint: disable=protected-access
+                parent, cache, to_write
+            ) for parent, cache in to_restore
+        ]
+
+        def write(item: t.Tuple[cg_object_storage.File, str]) -> None:
+            backing_file, out = item
+            backing_file.save_to_disk(out, allow_hardlink=allow_hardlink)
+
+        if to_write:
+            max_workers = min(
+                len(to_write),
+                current_app.config['RESTORE_FILES_MAX_WORKERS'],
+            )
+            with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+                # Consume the results, so that exceptions are raised here.
+                for _ in pool.map(write, to_write):
+                    pass
+
+        return trees
+
+    @classmethod
+    def get_zip_members(
+        cls: t.Type['NestedFileMixin[T]'],
+        cache: t.Mapping[t.Optional[T], t.Sequence['NestedFileMixin[T]']],
+        *,
+        create_leading_directory: bool = True,
+    ) -> t.List['psef.files.ZipMember']:
+        """Get the members of a zip archive containing the tree in the given
+        cache.
+
+        :param cache: The cache containing the tree.
+        :param create_leading_directory: If ``False`` the top level directory
+            is not included, and its children are placed in the root of the
+            archive.
+        :returns: The members, in an order suitable for
+            :func:`psef.files.stream_zip`. Only the top level directory is
+            included as a separate member, other directories are implied by
+            the paths of the files.
+        """
+        ZipMember = psef.files.ZipMember
+        members: t.List['psef.files.ZipMember'] = []
+
+        def add_member(f: 'NestedFileMixin[T]', prefix: str) -> None:
+            path = f'{prefix}{f.name}'
+            backing_file = f.backing_file
+            if backing_file.is_nothing:
+                for child in cache[f.get_id()]:
+                    add_member(child, f'{path}/')
+            else:
+                members.append(
+                    ZipMember(
+                        path=path,
+                        modification_date=f.modification_date,
+                        backing_file=backing_file.value,
+                    )
+                )
+
+        top = cache[None][0]
+        if create_leading_directory:
+            members.append(
+                ZipMember(
+                    path=top.name,
+                    modification_date=top.modification_date,
+                    backing_file=None,
+                )
+            )
+            add_member(top, '')
+        else:
+            for child in cache[top.get_id()]:
+                add_member(child, '')
+
+        return members
 
     def _restore_directory_structure(
         self: 'NestedFileMixin[T]',
         parent: str,
         cache: t.Mapping[t.Optional[T], t.Sequence['NestedFileMixin[T]']],
+        to_write: t.List[t.Tuple[cg_object_storage.File, str]],
     ) -> 'psef.files.FileTree[T]':
         FileTree = psef.files.FileTree
 
@@ -373,14 +585,14 @@ class NestedFileMixin(FileMixin[T]):
             os.mkdir(out)
 
             subtree = [
-                child._restore_directory_structure(out, cache)  # pylint: disable=protected-access
+                child._restore_directory_structure(out, cache, to_write)  # pylint: disable=protected-access
                 for child in cache[self.get_id()]
             ]
             return FileTree(
                 name=self.name, file_id=self.get_id(), entries=subtree
             )
         else:  # this is a file
-            backing_file.value.save_to_disk(out)
+            to_write.append((backing_file.value, out))
             return FileTree(
                 name=self.name, file_id=self.get_id(), entries=None
             )
@@ -412,6 +624,23 @@ class File(NestedFileMixin[int], Base):
     def get_id(self) -> int:
         return self.id
 
+    @classmethod
+    def _allocate_ids(cls, amount: int) -> t.List[int]:
+        if db.engine.name != 'postgresql':
+            # Only SQLite is used otherwise, for testing. It has no sequences,
+            # but it also does not have concurrent transactions.
+            start = db.session.query(sqlalchemy.func.max(cls.id)).scalar()
+            return list(range((start or 0) + 1, (start or 0) + amount + 1))
+
+        sequence = sqlalchemy.func.pg_get_serial_sequence(
+            f'"{cls.__tablename__}"', 'id'
+        )
+        return [
+            file_id for file_id, in db.session.query(
+                sqlalchemy.func.nextval(sequence),
+            ).select_from(sqlalchemy.func.generate_series(1, amount))
+        ]
+
     work_id = db.Column(
         'Work_id',
         db.Integer,
@@ -538,6 +767,39 @@ class File(NestedFileMixin[int], Base):
             )
         )
 
+    @classmethod
+    def make_caches(
+        cls,
+        works: t.Sequence['psef.models.Work'],
+        exclude: FileOwner = FileOwner.teacher,
+    ) -> t.Mapping[int, t.Mapping[t.Optional[int], t.Sequence['File']]]:
+        """Make file cache objects for multiple works at once.
+
+        This is the same as calling :meth:`.File.make_cache` for each work,
+        but the files of all works are loaded with a single query.
+
+        :param works: The works for which you want to create a cache object.
+        :param exclude: Files with this value as owner will not be included in
+            the resulting caches.
+        :returns: A mapping from the id of each work to its cache object.
+        """
+        if not works:
+            return {}
+
+        files_per_work: t.Dict[int, t.List['File']] = defaultdict(list)
+        all_files = cls.query.filter(
+            cls.work_id.in_([work.id for work in works]),
+            cls.fileowner != exclude,
+            ~cls.self_deleted,
+        ).order_by(cls.name).all()
+        for f in all_files:
+            files_per_work[f.work_id].append(f)
+
+        return {
+            work.id: cls._group_by_parent(files_per_work[work.id])
+            for work in works
+        }
+
     def list_contents(self, exclude: FileOwner) -> 'psef.files.FileTree[int]':
         """List the basic file info and the info of its children.
 
@@ -33,11 +33,16 @@ course_permissions: RawTable = db.Table(  # pylint: disable=invalid-name
 user_course: RawTable = db.Table(  # pylint: disable=invalid-name
     'users-courses',
     db.Column(
-        'course_id', db.Integer,
-        db.ForeignKey('Course_Role.id', ondelete='CASCADE')
+        'course_id',
+        db.Integer,
+        db.ForeignKey('Course_Role.id', ondelete='CASCADE'),
+        index=True,
     ),
     db.Column(
-        'user_id', db.Integer, db.ForeignKey('User.id', ondelete='CASCADE')
+        'user_id',
+        db.Integer,
+        db.ForeignKey('User.id', ondelete='CASCADE'),
+        index=True,
     )
 )
 
@@ -134,6 +134,64 @@ class PlagiarismMatch(Base):
         }
 
 
+class PlagiarismFingerprintedFile(Base):
+    """Describes a file of which the fingerprints are stored in the index.
+
+    :ivar ~.PlagiarismFingerprintedFile.file_id: The id of the file.
+    :ivar ~.PlagiarismFingerprintedFile.filename: The name of the backing file
+        from which the fingerprints were computed. The fingerprints are
+        outdated when the file got a new backing file.
+    """
+    __tablename__ = 'plagiarism_fingerprinted_file'
+
+    file_id = db.Column(
+        'file_id',
+        db.Integer,
+        db.ForeignKey('File.id', ondelete='CASCADE'),
+        nullable=False,
+        primary_key=True,
+    )
+    filename = db.Column('filename', db.Unicode, nullable=False)
+
+
+class PlagiarismFingerprint(Base):
+    """Describes a single fingerprint of a file.
+
+    Together these fingerprints form an inverted index, so finding all files
+    that contain a given fingerprint is a single index lookup.
+
+    :ivar ~.PlagiarismFingerprint.file_id: The id of the file.
+    :ivar ~.PlagiarismFingerprint.fingerprint: The hash of the fragment of the
+        file.
+    :ivar ~.PlagiarismFingerprint.start_line: The zero based line on which the
+        fragment starts.
+    :ivar ~.PlagiarismFingerprint.end_line: The zero based line on which the
+        fragment ends.
+    """
+    __tablename__ = 'plagiarism_fingerprint'
+
+    file_id = db.Column(
+        'file_id',
+        db.Integer,
+        db.ForeignKey(
+            'plagiarism_fingerprinted_file.file_id', ondelete='CASCADE'
+        ),
+        nullable=False,
+        primary_key=True,
+    )
+    fingerprint = db.Column(
+        'fingerprint',
+        db.BigInteger,
+        nullable=False,
+        primary_key=True,
+        index=True,
+    )
+    start_line = db.Column(
+        'start_line', db.Integer, nullable=False, primary_key=True
+    )
+    end_line = db.Column('end_line', db.Integer, nullable=False)
+
+
 class PlagiarismWorks(t.NamedTuple):
     """The works connected to a plagiarism case.
     """
@@ -372,6 +430,24 @@ _PlagiarismRunOldAssignment = db.Table(
     )
 )
 
+_PlagiarismRunCheckedWork = db.Table(
+    'plagiarism_run_checked_work',
+    db.Column(
+        'work_id',
+        db.Integer,
+        db.ForeignKey('Work.id', ondelete='CASCADE'),
+        nullable=False,
+        primary_key=True,
+    ),
+    db.Column(
+        'plagiarism_run_id',
+        db.Integer,
+        db.ForeignKey('PlagiarismRun.id', ondelete='CASCADE'),
+        nullable=False,
+        primary_key=True,
+    )
+)
+
 
 class PlagiarismRun(Base):
     """Describes a run for a plagiarism provider.
@@ -437,6 +513,17 @@ class PlagiarismRun(Base):
         uselist=True,
     )
 
+    # The submissions that were compared during the last successful
+    # execution of this run. Submissions are never changed after they are
+    # created, so only submissions not in this list need to be compared when
+    # the run is refreshed.
+    checked_works = db.relationship(
+        lambda: psef.models.Work,
+        secondary=_PlagiarismRunCheckedWork,
+        lazy='select',
+        uselist=True,
+    )
+
     def __init__(
         self,
         json_config: str,
@@ -592,38 +679,117 @@ class PlagiarismRun(Base):
         self._set_and_commit_state(PlagiarismState.started)
 
         provider = self.provider
-
-        file_lookup_tree: t.Dict[int, files.FileTree[int]] = {}
-        submission_lookup: t.Dict[str, int] = {}
-        old_subs: t.Set[int] = set()
+        checked_subs = set(w.id for w in self.checked_works)
 
         direct_subs = self.assignment.get_all_latest_submissions().all()
+        all_subs = list(
+            itertools.chain(
+                direct_subs,
+                *(
+                    a.get_all_latest_submissions()
+                    for a in self.old_assignments
+                )
+            )
+        )
+        # Submissions that were already compared with each other in a previous
+        # execution of this run are placed in the archive directory, this way
+        # the provider only compares the new submissions against the corpus.
+        incremental = bool(checked_subs)
+        fresh_subs = set(
+            sub.id for sub in all_subs if sub.id not in checked_subs
+        )
+
         self.submissions_total = len(direct_subs)
+        if incremental:
+            self.submissions_total += sum(
+                1 for sub in all_subs if sub.id in fresh_subs and
+                sub.assignment_id != self.assignment_id
+            )
+        self.submissions_done = 0
         db.session.commit()
 
-        for sub in itertools.chain(
-            direct_subs,
-            *(a.get_all_latest_submissions() for a in self.old_assignments)
-        ):
+        if incremental and not fresh_subs:
+            logger.info('No new submissions for plagiarism run')
+            self.log = 'No new or changed submissions were found.'
+            self._set_and_commit_state(PlagiarismState.finalizing)
+            self._remove_outdated_cases(all_subs)
+            self._set_and_commit_state(PlagiarismState.done)
+            return
+
+        old_subs = set(
+            sub.id
+            for sub in all_subs if sub.assignment_id != self.assignment_id
+        )
+        if incremental:
+            archived_subs = set(
+                sub.id for sub in all_subs if sub.id not in fresh_subs
+            )
+        else:
+            archived_subs = old_subs
+
+        if provider.runs_in_process():
+            self._do_run_in_process(
+                provider,
+                all_subs,
+                old_subs=old_subs,
+                archived_subs=archived_subs,
+                known_subs=checked_subs,
+            )
+        else:
+            self._do_run_program(
+                provider,
+                all_subs,
+                result_dir=result_dir,
+                restored_dir=restored_dir,
+                archive_dir=archive_dir,
+                base_code_dir=base_code_dir,
+                old_subs=old_subs,
+                archived_subs=archived_subs,
+                known_subs=checked_subs,
+            )
+
+    def _do_run_program(
+        self,
+        provider: 'psef.plagiarism.PlagiarismProvider',
+        all_subs: t.Sequence['psef.models.Work'],
+        *,
+        result_dir: str,
+        restored_dir: str,
+        archive_dir: str,
+        base_code_dir: str,
+        old_subs: t.Container[int],
+        archived_subs: t.Container[int],
+        known_subs: t.Container[int],
+    ) -> None:
+        file_lookup_tree: t.Dict[int, files.FileTree[int]] = {}
+        submission_lookup: t.Dict[str, int] = {}
+
+        caches = psef.models.File.make_caches(all_subs)
+        dir_names = []
+        to_restore = []
+        for sub in all_subs:
             dir_name = self._make_dir_name(sub)
             submission_lookup[dir_name] = sub.id
 
-            if sub.assignment_id == self.assignment_id:
-                parent = files.safe_join(restored_dir, dir_name)
+            if sub.id in archived_subs:
+                parent = files.safe_join(archive_dir, dir_name)
             else:
-                parent = os.path.join(archive_dir, dir_name)
-                old_subs.add(sub.id)
+                parent = files.safe_join(restored_dir, dir_name)
 
             os.mkdir(parent)
+            dir_names.append(dir_name)
+            to_restore.append((parent, caches[sub.id]))
+
+        # The providers only read the restored files, so they can share their
+        # data with the storage.
+        restored = psef.models.File.restore_directory_structures(
+            to_restore, allow_hardlink=True
+        )
+        for sub, dir_name, tree in zip(all_subs, dir_names, restored):
             file_lookup_tree[sub.id] = files.FileTree(
                 name=dir_name,
                 file_id=-1,
-                entries=[
-                    psef.models.File.restore_directory_structure(
-                        parent,
-                        psef.models.File.make_cache(sub),
-                    )
-                ],
+                entries=[tree],
             )
 
         if provider.supports_progress():
@@ -658,19 +824,85 @@ class PlagiarismRun(Base):
         logger.info(
             'Plagiarism call finished',
             finished_successfully=ok,
-            captured_stdout=self.log
+            captured_stdout=self.log,
+            incremental=bool(known_subs),
+            amount_fresh_submissions=sum(
+                1 for sub in all_subs if sub.id not in known_subs
+            ),
         )
 
         self._set_and_commit_state(PlagiarismState.finalizing)
 
         if ok:
+            self._remove_outdated_cases(all_subs)
             self._process_matches(
-                result_dir, old_subs, file_lookup_tree, submission_lookup
+                result_dir,
+                old_subs,
+                file_lookup_tree,
+                submission_lookup,
+                known_subs=known_subs,
             )
             self._set_and_commit_state(PlagiarismState.done)
         else:
             self._set_and_commit_state(PlagiarismState.crashed)
 
+    def _do_run_in_process(
+        self,
+        provider: 'psef.plagiarism.PlagiarismProvider',
+        all_subs: t.Sequence['psef.models.Work'],
+        *,
+        old_subs: t.Container[int],
+        archived_subs: t.Container[int],
+        known_subs: t.Container[int],
+    ) -> None:
+        try:
+            found_cases = list(
+                provider.find_cases(self, all_subs, archived_subs)
+            )
+        except Exception:
+            self._set_and_commit_state(PlagiarismState.crashed)
+            raise
+
+        logger.info(
+            'Plagiarism check finished in process',
+            amount_found_cases=len(found_cases),
+        )
+        self.log = None
+        self._set_and_commit_state(PlagiarismState.finalizing)
+        self._remove_outdated_cases(all_subs)
+        psef.plagiarism.store_cases(
+            self,
+            found_cases,
+            old_subs,
+            known_submissions=known_subs,
+        )
+        self._set_and_commit_state(PlagiarismState.done)
+
+    def _remove_outdated_cases(
+        self,
+        all_subs: t.Sequence['psef.models.Work'],
+    ) -> None:
+        """Remove the cases that are outdated after this execution.
+
+        Existing cases of which one of the submissions is no longer the latest
+        submission of its author are deleted, as the new submission of this
+        author has been compared again. When this run has no record of the
+        submissions it checked before (for example because it was created
+        before this was stored) every submission has been compared again, so
+        all existing cases are deleted.
+
+        :param all_subs: All submissions that are part of this execution.
+        """
+        full_replace = not self.checked_works
+        current_ids = set(sub.id for sub in all_subs)
+        for case in self.cases:
+            if full_replace or not (
+                case.work1_id in current_ids and case.work2_id in current_ids
+            ):
+                db.session.delete(case)
+
+        self.checked_works = list(all_subs)
+
     @staticmethod
     def _make_dir_name(sub: 'psef.models.Work') -> str:
         return (
@@ -684,19 +916,35 @@ class PlagiarismRun(Base):
         old_subs: t.Container[int],
         file_lookup_tree: t.Mapping[int, 'files.FileTree[int]'],
         submission_lookup: t.Mapping[str, int],
+        known_subs: t.Container[int],
     ) -> None:
         csv_file = os.path.join(result_dir, self.provider.matches_output)
         csv_file = self.provider.transform_csv(csv_file)
-        self.cases.extend(
-            psef.plagiarism.process_output_csv(
-                submission_lookup, old_subs, file_lookup_tree, csv_file
-            )
+        psef.plagiarism.process_output_csv(
+            self,
+            submission_lookup,
+            old_subs,
+            file_lookup_tree,
+            csv_file,
+            known_submissions=known_subs,
         )
 
     def _set_and_commit_state(self, state: PlagiarismState) -> None:
         self.state = state
         db.session.commit()
 
+    def set_progress(self, state: PlagiarismState, done: int) -> None:
+        """Set and commit the progress of this run.
+
+        This is used by providers that run in process, as they cannot report
+        their progress through their output.
+
+        :param state: The new state of this run.
+        :param done: The amount of submissions done in this state.
+        """
+        self.submissions_done = done
+        self._set_and_commit_state(state)
+
     def _update_state_from_output(
         self,
         line: str,
@@ -800,10 +1048,9 @@ class PlagiarismRun(Base):
             putter=putter,
         )
         BaseCode = psef.models.PlagiarismBaseCodeFile
-        base_code_file = BaseCode.create_from_extract_directory(
-            tree, top=None, creation_opts={'plagiarism_run': self}
+        BaseCode.bulk_create_from_extract_directory(
+            tree, creation_opts={'plagiarism_run': self}
         )
-        db.session.add(base_code_file)
 
     def add_old_submissions(
         self,
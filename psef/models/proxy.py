@@ -6,35 +6,94 @@ import enum
 import typing as t
 import secrets
 import datetime
-from uuid import UUID
 from collections import defaultdict
 
 from sqlalchemy_utils import UUIDType
 
+import cg_maybe
+import cg_object_storage
 from cg_cache.intra_request import cache_within_request
 from cg_sqlalchemy_helpers.mixins import UUIDMixin, TimestampMixin
 
-from . import Base, File, FileOwner, NestedFileMixin, AutoTestOutputFile, db
+from . import Base, File, FileOwner, AutoTestOutputFile, db
 from .. import app, helpers
 from ..exceptions import APICodes, APIException
 
 T = t.TypeVar('T')
 
-
-def _search_candiate(
-    lookup: t.Mapping[t.Optional[T], t.Mapping[str, T]],
-    base_file: NestedFileMixin[T],
-    path: t.Sequence[str],
-) -> t.Optional[T]:
+#: A mapping from the path of each file in a proxy, relative to the base file
+#: of the proxy, to the ``filename`` and ``modification_date`` of a
+#: :class:`.ProxyFile`.
+PathIndex = t.Mapping[str, t.Tuple[t.Optional[str], float]]
+
+
+def _make_path_index(
+    base_id: T,
+    rows: t.Iterable[t.Tuple[T, t.Optional[T], str, t.Optional[str], float]],
+) -> t.Dict[str, t.Tuple[t.Optional[str], float]]:
+    """Make a path index from the given files.
+
+    >>> _make_path_index(1, [
+    ...  (1, None, 'top', None, 0.0),
+    ...  (2, 1, 'dir', None, 1.0),
+    ...  (3, 2, 'file', 'abc', 2.0),
+    ...  (4, None, 'other', 'def', 3.0),
+    ... ])
+    {'': (None, 0.0), 'dir': (None, 1.0), 'dir/file': ('abc', 2.0)}
+
+    :param base_id: The id of the file from which the paths start.
+    :param rows: Tuples of the id, parent id, name, backing filename and
+        modification timestamp of the files.
+    :returns: The path index of the base file.
     """
+    children: t.Dict[t.Optional[T], t.List[t.Tuple[T, str]]]
+    children = defaultdict(list)
+    entries = {}
+    for file_id, parent_id, name, filename, modified in rows:
+        children[parent_id].append((file_id, name))
+        entries[file_id] = (filename, modified)
+
+    if base_id not in entries:
+        return {}
+
+    res = {'': entries[base_id]}
+    todo = [(base_id, '')]
+    while todo:
+        file_id, path = todo.pop()
+        for child_id, name in children[file_id]:
+            child_path = f'{path}/{name}' if path else name
+            res[child_path] = entries[child_id]
+            todo.append((child_id, child_path))
+
+    return res
+
+
+class ProxyFile(t.NamedTuple):
+    """A file or directory that can be served by a proxy.
+
+    :ivar filename: The name of the backing file of this file in the storage,
+        or ``None`` if this is a directory.
+    :ivar modification_date: The POSIX timestamp on which this file was last
+        modified.
     """
-    try:
-        cur = base_file.get_id()
-        for wanted_name in path:
-            cur = lookup[cur][wanted_name]
-        return cur
-    except KeyError:
-        return None
+    filename: t.Optional[str]
+    modification_date: float
+
+    @property
+    def is_directory(self) -> bool:
+        """Is this file a directory.
+        """
+        return self.filename is None
+
+    @property
+    def backing_file(self) -> cg_maybe.Maybe[cg_object_storage.File]:
+        """Maybe get the backing file for this file.
+
+        This will return ``Nothing`` for directories.
+        """
+        if self.filename is None:
+            return cg_maybe.Nothing
+        return app.file_storage.get(self.filename)
 
 
 class ProxyState(enum.IntEnum):
@@ -241,74 +300,67 @@ class Proxy(Base, UUIDMixin, TimestampMixin):
     def __to_json__(self) -> t.Mapping[str, str]:
         return {'id': str(self.id)}
 
-    @cache_within_request
-    def _get_at_file_lookup(
-        self
-    ) -> t.Mapping[t.Optional[UUID], t.Mapping[str, UUID]]:
-        base = self.base_at_result_file
-        assert base is not None
-
-        lookup: t.MutableMapping[t.Optional[UUID], t.
-                                 Dict[str, UUID]] = defaultdict(dict)
-
-        for f_id, f_name, f_parent_id in db.session.query(
-            AutoTestOutputFile.id,
-            AutoTestOutputFile.name,
-            AutoTestOutputFile.parent_id,
-        ).filter(
-            AutoTestOutputFile.suite == base.suite,
-            AutoTestOutputFile.result == base.result,
-        ):
-            lookup[f_parent_id][f_name] = f_id
-
-        return lookup
-
-    def _get_at_file(self, path: t.Sequence[str]
-                     ) -> t.Optional[NestedFileMixin[UUID]]:
-        base = self.base_at_result_file
-        assert base is not None
-
-        lookup = self._get_at_file_lookup()
-
-        found_id = _search_candiate(lookup, base, path)
-        if found_id is None:
-            return None
-        return AutoTestOutputFile.query.get(found_id)
+    def _make_path_index(self) -> PathIndex:
+        # pylint: disable=protected-access
+        if self.base_at_result_file_id is None:
+            base_work_file = self.base_work_file
+            assert base_work_file is not None
+            assert self.excluding_fileowner is not None
+            return _make_path_index(
+                base_work_file.id,
+                (
+                    (f_id, parent_id, name, filename, modified.timestamp())
+                    for f_id, parent_id, name, filename, modified in
+                    db.session.query(
+                        File.id,
+                        File.parent_id,
+                        File.name,
+                        File._filename,
+                        File.modification_date,
+                    ).filter(
+                        File.work_id == base_work_file.work_id,
+                        File.fileowner != self.excluding_fileowner,
+                    )
+                ),
+            )
+
+        base_at_file = self.base_at_result_file
+        assert base_at_file is not None
+        return _make_path_index(
+            base_at_file.id,
+            (
+                (f_id, parent_id, name, filename, modified.timestamp())
+                for f_id, parent_id, name, filename, modified in
+                db.session.query(
+                    AutoTestOutputFile.id,
+                    AutoTestOutputFile.parent_id,
+                    AutoTestOutputFile.name,
+                    AutoTestOutputFile._filename,
+                    AutoTestOutputFile.modification_date,
+                ).filter(
+                    AutoTestOutputFile.auto_test_suite_id ==
+                    base_at_file.auto_test_suite_id,
+                    AutoTestOutputFile.auto_test_result_id ==
+                    base_at_file.auto_test_result_id,
+                )
+            ),
+        )
 
     @cache_within_request
-    def _get_work_file_lookup(
-        self
-    ) -> t.Mapping[t.Optional[int], t.Dict[str, int]]:
-        base = self.base_work_file
-        assert base is not None
-        assert self.excluding_fileowner is not None
-
-        lookup: t.Mapping[t.Optional[int], t.
-                          Dict[str, int]] = defaultdict(dict)
-        for f_id, f_name, f_parent_id in db.session.query(
-            File.id, File.name, File.parent_id
-        ).filter(
-            File.work == base.work,
-            File.fileowner != self.excluding_fileowner,
-        ):
-            lookup[f_parent_id][f_name] = f_id
-
-        return lookup
-
-    def _get_work_file(self, path: t.Sequence[str]
-                       ) -> t.Optional[NestedFileMixin[int]]:
-        base = self.base_work_file
-        assert base is not None
-        lookup = self._get_work_file_lookup()
-
-        found_id = _search_candiate(lookup, base, path)
-        if found_id is None:
-            return None
-        return File.query.get(found_id)
+    def _get_path_index(self) -> PathIndex:
+        """Get the path index of this proxy.
 
-    def get_file(
-        self, path: t.Sequence[str], *, dir_ok: bool
-    ) -> t.Union[None, NestedFileMixin[int], NestedFileMixin[UUID]]:
+        The index is cached between requests when possible. The files of a
+        proxy are not expected to change during its (short) lifetime, and a
+        proxy cannot be used anymore once it has expired.
+        """
+        cache = app.proxy_path_index_cache
+        if cache is None:
+            return self._make_path_index()
+        return cache.get_or_set(str(self.id), self._make_path_index)
+
+    def get_file(self, path: t.Sequence[str], *,
+                 dir_ok: bool) -> t.Optional[ProxyFile]:
         """Get a file from this proxy for the given path.
 
         :param path: The path to search for.
@@ -316,13 +368,12 @@ class Proxy(Base, UUIDMixin, TimestampMixin):
         """
         assert not self.expired
         assert not self.deleted
-        res: t.Union[None, NestedFileMixin[int], NestedFileMixin[UUID]]
 
-        if self.base_at_result_file_id is None:
-            res = self._get_work_file(path)
-        else:
-            res = self._get_at_file(path)
+        found = self._get_path_index().get('/'.join(path))
+        if found is None:
+            return None
 
-        if res is None or (res.is_directory and not dir_ok):
+        res = ProxyFile(*found)
+        if res.is_directory and not dir_ok:
             return None
         return res
@@ -2,7 +2,15 @@
 
 SPDX-License-Identifier: AGPL-3.0-only
 """
+import uuid
 import typing as t
+import dataclasses
+
+import flask
+import redis
+import structlog
+from sqlalchemy import event
+from flask_sqlalchemy import SignallingSession
 
 import cg_json
 import cg_maybe
@@ -18,8 +26,31 @@ if t.TYPE_CHECKING:  # pragma: no cover
     # pylint: disable=unused-import
     from ..site_settings import Option
 
+logger = structlog.get_logger()
+
 _T = t.TypeVar('_T')
 
+# The key in the ``info`` of the session that is set when site settings were
+# changed in the current transaction.
+_SETTINGS_CHANGED_KEY = '__cg_site_settings_changed'
+_VERSION_KEY = 'version'
+
+
+@dataclasses.dataclass(frozen=True)
+class _SettingsSnapshot:
+    """The values of all site settings at a certain point in time.
+    """
+    #: The version of the settings, or ``None`` if the snapshot should never
+    #: be reused in another request.
+    version: t.Optional[str]
+    #: The raw values of all settings that are set, by name.
+    values: t.Mapping[str, t.Any]
+
+
+# The snapshot of this process, which can be used as long as the version in
+# the version cache of the app doesn't change.
+_process_snapshot: t.Optional[_SettingsSnapshot] = None  # pylint: disable=invalid-name
+
 
 class SiteSetting(Base, TimestampMixin):
     """The table that stores the settings of this instance.
@@ -41,6 +72,52 @@ class SiteSetting(Base, TimestampMixin):
         """
         return cg_maybe.from_nullable(self._value)
 
+    @classmethod
+    def _load_snapshot(cls, version: t.Optional[str]) -> _SettingsSnapshot:
+        return _SettingsSnapshot(
+            version=version,
+            values={
+                name: value
+                for name, value in db.session.query(cls._name, cls._value)
+                if value is not None
+            },
+        )
+
+    @classmethod
+    @cache_within_request
+    def _get_snapshot(cls) -> _SettingsSnapshot:
+        """Get the values of all site settings.
+
+        The settings are loaded only once per process, and reloaded when the
+        version stored in the site settings version cache changes. If this
+        cache is disabled they are loaded once per request.
+        """
+        # pylint: disable=global-statement,invalid-name
+        global _process_snapshot
+
+        cache = flask.current_app.site_settings_version_cache
+        if cache is None or _SETTINGS_CHANGED_KEY in db.session.info:
+            return cls._load_snapshot(None)
+
+        try:
+            version = cache.get_or_set(_VERSION_KEY, lambda: uuid.uuid4().hex)
+        except redis.RedisError:
+            logger.warning(
+                'Could not get site settings version', exc_info=True
+            )
+            return cls._load_snapshot(None)
+
+        snapshot = _process_snapshot
+        if snapshot is None or snapshot.version != version:
+            snapshot = cls._load_snapshot(version)
+            _process_snapshot = snapshot
+        return snapshot
+
+    @classmethod
+    def _clear_cache(cls) -> None:
+        cls._get_snapshot.clear_cache()  # type: ignore[attr-defined]
+        cls.get_option.clear_cache()  # type: ignore[attr-defined]
+
     @classmethod
     def get_options(cls, opts: t.Sequence['Option[_T]']
                     ) -> t.Mapping['Option[_T]', _T]:
@@ -51,21 +128,8 @@ class SiteSetting(Base, TimestampMixin):
 
         :param opts: The options to get the values for.
         """
-        lookup = {
-            row.name: cg_maybe.Just(row)
-            for row in
-            cls.query.filter(cls._name.in_([opt.name for opt in opts]))
-        }
-
-        return {
-            opt: lookup.get(
-                opt.name,
-                cg_maybe.Nothing,
-            ).chain(cls.get_value).or_default(
-                opt.default,
-            )
-            for opt in opts
-        }
+        values = cls._get_snapshot().values
+        return {opt: values.get(opt.name, opt.default) for opt in opts}
 
     @classmethod
     @cache_within_request
@@ -78,9 +142,7 @@ class SiteSetting(Base, TimestampMixin):
                   is unset.
         """
         res = cg_maybe.from_nullable(
-            cls.query.get(opt.name),
-        ).chain(
-            cls.get_value,
+            cls._get_snapshot().values.get(opt.name),
         ).map(
             opt.parser.try_parse,
         ).or_default(
@@ -110,7 +172,8 @@ class SiteSetting(Base, TimestampMixin):
         :returns: A history object. To persist the new value you should add and
                   commit this object to the database.
         """
-        cls.get_option.clear_cache()  # type: ignore[attr-defined]
+        db.session.info[_SETTINGS_CHANGED_KEY] = True
+        cls._clear_cache()
 
         new_value = cg_helpers.on_not_none(
             value, cg_json.JSONResponse.dump_to_object
@@ -148,3 +211,36 @@ class _SiteSettingHistory(Base, TimestampMixin, IdMixin):
             _new_value=setting.get_value().or_default(None),
             _old_value=old_value,
         )
+
+
+@event.listens_for(SignallingSession, 'after_commit')
+def _bump_settings_version(session: t.Any) -> None:
+    """Make sure all processes reload the site settings after they are
+    changed.
+    """
+    if not session.info.pop(_SETTINGS_CHANGED_KEY, False):
+        return
+
+    # pylint: disable=global-statement,invalid-name,protected-access
+    global _process_snapshot
+    _process_snapshot = None
+    SiteSetting._clear_cache()
+
+    cache = flask.current_app.site_settings_version_cache
+    if cache is None:
+        return
+
+    try:
+        cache.set(_VERSION_KEY, uuid.uuid4().hex)
+    except redis.RedisError:
+        logger.error(
+            'Could not update site settings version',
+            exc_info=True,
+            report_to_sentry=True,
+        )
+
+
+@event.listens_for(SignallingSession, 'after_soft_rollback')
+def _forget_changed_settings(session: t.Any, _: object) -> None:
+    if session.info.pop(_SETTINGS_CHANGED_KEY, False):
+        SiteSetting._clear_cache()  # pylint: disable=protected-access
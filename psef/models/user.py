@@ -5,13 +5,19 @@ SPDX-License-Identifier: AGPL-3.0-only
 import uuid
 import typing as t
 import functools
+import itertools
 from datetime import timedelta
 from collections import defaultdict
 
+import flask
+import redis
 import structlog
+import sqlalchemy
 import flask_jwt_extended
+from sqlalchemy import event
 from itsdangerous import BadSignature, URLSafeTimedSerializer
 from werkzeug.local import LocalProxy
+from flask_sqlalchemy import SignallingSession
 from sqlalchemy_utils import PasswordType
 from typing_extensions import Literal, TypedDict
 from sqlalchemy.sql.expression import false
@@ -21,6 +27,7 @@ import psef
 from cg_dt_utils import DatetimeWithTimezone
 from cg_typing_extensions import make_typed_dict_extender
 from cg_sqlalchemy_helpers import CIText, hybrid_property
+from cg_cache.intra_request import cache_within_request
 
 from . import UUID_LENGTH, Base, DbColumn, db
 from . import course as course_models
@@ -37,6 +44,8 @@ from ..permissions import CoursePermission, GlobalPermission
 
 if t.TYPE_CHECKING and not getattr(t, 'SPHINX', False):  # pragma: no cover
     # pylint: disable=unused-import,invalid-name
+    import cg_cache
+
     from .assignment import AssignmentResult, AssignmentAssignedGrader
 
 logger = structlog.get_logger()
@@ -279,6 +288,24 @@ class User(NotEqualMixin, Base):
 
     username = hybrid_property(_get_username, _set_username)
 
+    # Trigram indices so searching for users by a part of their name (see
+    # :func:`.helpers.filter_users_by_name`) does not need to scan the entire
+    # table.
+    __table_args__ = (
+        db.Index(
+            'ix_User_name_trgm',
+            name,
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+        ),
+        db.Index(
+            'ix_User_username_trgm',
+            _username,
+            postgresql_using='gin',
+            postgresql_ops={'username': 'gin_trgm_ops'},
+        ),
+    )
+
     reset_token = db.Column(
         'reset_token', db.String(UUID_LENGTH), nullable=True
     )
@@ -479,9 +506,35 @@ class User(NotEqualMixin, Base):
             if isinstance(course_id, course_models.Course):
                 course_id = course_id.id
 
-            if course_id in self.courses:
-                return self.courses[course_id].has_permission(permission)
-            return False
+            perms = self._get_permissions_in_course(course_id)
+            return perms is not None and permission in perms
+
+    def _get_permissions_in_course(
+        self, course_id: int
+    ) -> t.Optional[t.FrozenSet[CoursePermission]]:
+        """Get the permissions this user has in the given course.
+
+        The permissions are cached between requests, unless the session
+        contains changes that might change them.
+
+        :param course_id: The id of the course to get the permissions for.
+        :returns: The permissions of the user, or ``None`` if the user is not
+            enrolled in the course.
+        """
+        if _has_pending_permission_changes():
+            return self._load_permissions_in_course(course_id)
+        return _get_cached_permissions_in_course(self.id, course_id)
+
+    def _load_permissions_in_course(
+        self, course_id: int
+    ) -> t.Optional[t.FrozenSet[CoursePermission]]:
+        course_role = self.courses.get(course_id)
+        if course_role is None:
+            return None
+        return frozenset(
+            perm for perm in CoursePermission
+            if course_role.has_permission(perm)
+        )
 
     def get_all_permissions_in_courses(
         self,
@@ -863,3 +916,153 @@ class User(NotEqualMixin, Base):
         db.session.flush()
 
         return self
+
+
+# The key in the ``info`` of the session where the ``(user_id, course_id)``
+# pairs are stored for which the permissions changed in the current
+# transaction.
+_PERMISSIONS_CHANGED_KEY = '__cg_course_permissions_changed'
+
+# The names of all existing course permissions, cached permissions with other
+# names were stored by a different version and are ignored.
+_COURSE_PERMISSION_NAMES = frozenset(perm.name for perm in CoursePermission)
+
+
+def _get_course_permissions_cache(
+) -> t.Optional['cg_cache.inter_request.Backend[t.Optional[t.List[str]]]']:
+    if not flask.has_app_context():
+        return None
+    return current_app.course_permissions_cache
+
+
+def _get_course_permissions_version_cache(
+) -> t.Optional['cg_cache.inter_request.Backend[str]']:
+    if not flask.has_app_context():
+        return None
+    return current_app.course_permissions_version_cache
+
+
+def _has_pending_permission_changes() -> bool:
+    session = db.session
+    return any(
+        isinstance(obj, (User, CourseRole)) for obj in
+        itertools.chain(session.new, session.dirty, session.deleted)
+    )
+
+
+@cache_within_request
+def _get_cached_permissions_in_course(
+    user_id: int, course_id: int
+) -> t.Optional[t.FrozenSet[CoursePermission]]:
+    """Get the permissions of the given user in the given course.
+
+    :param user_id: The id of the user.
+    :param course_id: The id of the course.
+    :returns: The permissions of the user, or ``None`` if the user is not
+        enrolled in the course.
+    """
+    user = User.query.get(user_id)
+    assert user is not None
+    load = user._load_permissions_in_course  # pylint: disable=protected-access
+
+    cache = _get_course_permissions_cache()
+    version_cache = _get_course_permissions_version_cache()
+    changed = db.session.info.get(_PERMISSIONS_CHANGED_KEY, ())
+    # Uncommitted permissions should never be stored in the cache.
+    if (
+        cache is None or version_cache is None or
+        (user_id, course_id) in changed
+    ):
+        return load(course_id)
+
+    def get_names() -> t.Optional[t.List[str]]:
+        perms = load(course_id)
+        return None if perms is None else [perm.name for perm in perms]
+
+    key = f'{user_id}/{course_id}'
+    try:
+        # The permissions are stored under the current version, which is
+        # retrieved before the permissions are loaded. So permissions that
+        # were loaded before a change was committed are stored under an old
+        # version, and are never used after the version is changed by
+        # :func:`_clear_cached_permissions`.
+        version = version_cache.get_or_set(key, lambda: uuid.uuid4().hex)
+        names = cache.get_or_set(f'{key}/{version}', get_names)
+    except redis.RedisError:
+        logger.warning('Could not use course permissions cache', exc_info=True)
+        return load(course_id)
+
+    if names is None:
+        return None
+    return frozenset(
+        CoursePermission[name]
+        for name in names if name in _COURSE_PERMISSION_NAMES
+    )
+
+
+def _clear_cached_permissions(keys: t.Iterable[t.Tuple[int, int]]) -> None:
+    _get_cached_permissions_in_course.clear_cache()  # type: ignore
+    version_cache = _get_course_permissions_version_cache()
+    if version_cache is None:
+        return
+    try:
+        for user_id, course_id in keys:
+            version_cache.set(f'{user_id}/{course_id}', uuid.uuid4().hex)
+    except redis.RedisError:
+        logger.error(
+            'Could not clear course permissions cache',
+            exc_info=True,
+            report_to_sentry=True,
+        )
+
+
+@event.listens_for(SignallingSession, 'before_flush')
+def _collect_changed_permissions(
+    session: t.Any, _: object, __: object
+) -> None:
+    """Collect the users and courses for which permissions change in this
+    flush, and clear their cached permissions.
+    """
+    keys: t.Set[t.Tuple[int, int]] = set()
+
+    for obj in itertools.chain(session.dirty, session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            history = sqlalchemy.inspect(obj).attrs.courses.history
+            for course_role in itertools.chain(
+                history.added or (), history.deleted or ()
+            ):
+                keys.add((obj.id, course_role.course_id))
+        elif isinstance(obj, CourseRole) and obj.id is not None:
+            state = sqlalchemy.inspect(obj)
+            # pylint: disable=protected-access
+            if (
+                obj not in session.deleted and
+                not state.attrs._permissions.history.has_changes()
+            ):
+                continue
+            keys.update(
+                (user_id, obj.course_id)
+                for user_id, in session.query(user_course.c.user_id).filter(
+                    user_course.c.course_id == obj.id
+                )
+            )
+
+    if keys:
+        session.info.setdefault(_PERMISSIONS_CHANGED_KEY, set()).update(keys)
+        _clear_cached_permissions(keys)
+
+
+@event.listens_for(SignallingSession, 'after_commit')
+def _clear_committed_permissions(session: t.Any) -> None:
+    """Clear the cached permissions again after they are committed, as other
+    requests might have cached the old permissions in the meantime.
+    """
+    keys = session.info.pop(_PERMISSIONS_CHANGED_KEY, None)
+    if keys:
+        _clear_cached_permissions(keys)
+
+
+@event.listens_for(SignallingSession, 'after_soft_rollback')
+def _forget_changed_permissions(session: t.Any, _: object) -> None:
+    if session.info.pop(_PERMISSIONS_CHANGED_KEY, None):
+        _get_cached_permissions_in_course.clear_cache()  # type: ignore
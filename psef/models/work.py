@@ -2,17 +2,17 @@
 
 SPDX-License-Identifier: AGPL-3.0-only
 """
-import io
-import os
 import enum
 import typing as t
 import zipfile
-import tempfile
+import itertools
+import collections
 
 import structlog
 import sqlalchemy
-from sqlalchemy import orm, select
+from sqlalchemy import orm, event, select
 from sqlalchemy.orm import undefer, selectinload
+from flask_sqlalchemy import SignallingSession
 from sqlalchemy.types import JSON
 from typing_extensions import Literal
 
@@ -214,6 +214,16 @@ class Work(Base):
         server_default='false',
         nullable=False
     )
+    # Is this the latest non deleted submission of the user in the
+    # assignment. This is kept up to date when the submissions of a user are
+    # flushed, see :meth:`Work.update_latest_flags`.
+    _is_latest = db.Column(
+        'is_latest',
+        db.Boolean,
+        default=False,
+        server_default='false',
+        nullable=False,
+    )
     origin = db.Column(
         'work_origin',
         db.Enum(WorkOrigin),
@@ -254,6 +264,87 @@ class Work(Base):
         _get_deleted, _set_deleted, None, _get_deleted_expr
     )
 
+    @hybrid_property
+    def is_latest(self) -> bool:
+        """Is this the latest non deleted submission of the user in the
+        assignment.
+        """
+        return self._is_latest
+
+    __table_args__ = (
+        db.Index(
+            'ix_Work_Assignment_id_latest',
+            assignment_id,
+            user_id,
+            postgresql_where=_is_latest,
+        ),
+    )
+
+    @classmethod
+    def update_latest_flags(
+        cls,
+        session: orm.Session,
+        assignment_id: int,
+        user_ids: t.Collection[int],
+    ) -> None:
+        """Update which submissions are the latest submissions of the given
+        users in the given assignment.
+
+        The latest submission of a user is the non deleted submission with the
+        highest ``created_at``, where ties are broken by the highest id.
+
+        :param session: The session in which the submissions should be
+            updated.
+        :param assignment_id: The assignment in which the submissions should
+            be updated.
+        :param user_ids: The users for which the submissions should be
+            updated.
+        :returns: Nothing.
+        """
+        # Lock the assignment and user combinations so that concurrent
+        # transactions that change the submissions of the same users cannot
+        # both mark a different submission as the latest. This is the same
+        # lock that is taken when checking the submission limits of an
+        # author. The locks are taken in a fixed order to prevent deadlocks.
+        for user_id in sorted(user_ids):
+            session.execute(
+                select([
+                    sqlalchemy.func.pg_advisory_xact_lock(
+                        assignment_id, user_id
+                    )
+                ])
+            )
+
+        latest: t.Dict[int, t.Tuple[DatetimeWithTimezone, int]] = {}
+        for work_id, user_id, created_at in session.query(
+            cls.id, cls.user_id, cls.created_at
+        ).filter(
+            cls.assignment_id == assignment_id,
+            cls.user_id.in_(list(user_ids)),
+            ~cls._deleted,
+        ):
+            latest[user_id] = max(
+                latest.get(user_id, (created_at, work_id)),
+                (created_at, work_id),
+            )
+        latest_ids = [work_id for _, work_id in latest.values()]
+        session.query(cls).filter(
+            cls.assignment_id == assignment_id,
+            cls.user_id.in_(list(user_ids)),
+        ).update(
+            {cls._is_latest: cls.id.in_(latest_ids)},
+            synchronize_session=False,
+        )
+
+        for obj in list(session.identity_map.values()):
+            if (
+                isinstance(obj, cls) and obj.assignment_id == assignment_id and
+                obj.user_id in user_ids
+            ):
+                orm.attributes.set_committed_value(
+                    obj, '_is_latest', obj.id in latest_ids
+                )
+
     def divide_new_work(self) -> None:
         """Divide a freshly created work.
 
@@ -675,14 +766,18 @@ class Work(Base):
 
         .. warning:: All previous files will be unlinked from this assignment.
 
+        .. note::
+
+            This adds the work to the session and flushes it if it does not
+            have an id yet.
+
         :param tree: The file tree as described by
             :py:func:`psef.files.rename_directory_structure`
         :returns: Nothing
         """
-        db.session.add(
-            file_models.File.create_from_extract_directory(
-                tree, None, {'work': self}
-            )
+        db.session.add(self)
+        file_models.File.bulk_create_from_extract_directory(
+            tree, {'work': self}
         )
 
     def get_user_feedback(self) -> t.Iterable[str]:
@@ -913,37 +1008,32 @@ class Work(Base):
     def create_zip(
         self,
         exclude_owner: 'file_models.FileOwner',
-        create_leading_directory: bool = True
-    ) -> io.BytesIO:
+        create_leading_directory: bool = True,
+        *,
+        compression: int = zipfile.ZIP_DEFLATED,
+        compresslevel: t.Optional[int] = None,
+    ) -> t.Iterator[bytes]:
         """Create zip from the files in this submission.
 
+        The files are read directly from the storage while the archive is
+        being produced, so nothing is written to disk and the archive is never
+        fully kept in memory.
+
         :param exclude_owner: Which files to exclude.
-        :returns: The BytesIO containing the zipfile.
+        :param create_leading_directory: Should the top level directory of the
+            submission be included in the archive.
+        :param compression: The compression method to use, use
+            :data:`zipfile.ZIP_STORED` to disable compression.
+        :param compresslevel: The compression level to use.
+        :returns: An iterator producing the zipfile in chunks.
         """
-        result = io.BytesIO()
-        with tempfile.TemporaryDirectory(
-            suffix='dir',
-        ) as tmpdir, zipfile.ZipFile(
-            result, 'w', compression=zipfile.ZIP_DEFLATED
-        ) as zipf:
-            tree_root = file_models.File.restore_directory_structure(
-                tmpdir,
-                file_models.File.make_cache(self, exclude_owner),
-            )
-
-            if create_leading_directory:
-                zipf.write(tmpdir, tree_root.name)
-                leading_len = len(tmpdir)
-            else:
-                leading_len = len(tmpdir) + len('/') + len(tree_root.name)
-
-            for root, _dirs, files in os.walk(tmpdir):
-                for file in files:
-                    path = psef.files.safe_join(root, file)
-                    zipf.write(path, path[leading_len:])
-
-        result.seek(0)
-        return result
+        members = file_models.File.get_zip_members(
+            file_models.File.make_cache(self, exclude_owner),
+            create_leading_directory=create_leading_directory,
+        )
+        return psef.files.stream_zip(
+            members, compression=compression, compresslevel=compresslevel
+        )
 
     @classmethod
     def create_from_tree(
@@ -1021,3 +1111,58 @@ class Work(Base):
             undefer(cls.comment),
             selectinload(cls.comment_author),
         )
+
+
+# The key in the ``info`` of the session where the ``(assignment_id,
+# user_id)`` pairs for which the latest submission might have changed are
+# stored during a flush.
+_LATEST_CHANGED_KEY = '__cg_work_latest_changed'
+_LATEST_COLUMNS = ('_deleted', 'created_at', 'user_id', 'assignment_id')
+
+
+# These listeners are registered on the session class, and not on
+# ``db.session``, so that they also work for sessions created by
+# ``db.create_scoped_session``.
+@event.listens_for(SignallingSession, 'after_flush')
+def _collect_changed_latest(session: t.Any, _: object) -> None:
+    """Collect the users for which the latest submission might have changed in
+    this flush.
+    """
+    changed: t.Set[t.Tuple[int, int]] = session.info.setdefault(
+        _LATEST_CHANGED_KEY, set()
+    )
+    for work in itertools.chain(session.new, session.deleted):
+        if isinstance(work, Work):
+            changed.add((work.assignment_id, work.user_id))
+
+    for work in session.dirty:
+        if not isinstance(work, Work):
+            continue
+        state = sqlalchemy.inspect(work)
+        if any(state.attrs[c].history.has_changes() for c in _LATEST_COLUMNS):
+            changed.add((work.assignment_id, work.user_id))
+            # The submission might have been moved away from an assignment or
+            # user, so update the old combination too.
+            changed.update(
+                itertools.product(
+                    state.attrs.assignment_id.history.deleted or
+                    [work.assignment_id],
+                    state.attrs.user_id.history.deleted or [work.user_id],
+                )
+            )
+
+
+@event.listens_for(SignallingSession, 'after_flush_postexec')
+def _update_changed_latest(session: t.Any, _: object) -> None:
+    """Update the latest flags of the submissions collected by
+    :func:`_collect_changed_latest`.
+    """
+    changed = session.info.pop(_LATEST_CHANGED_KEY, None)
+    if not changed:
+        return
+
+    by_assignment: t.Dict[int, t.Set[int]] = collections.defaultdict(set)
+    for assignment_id, user_id in changed:
+        by_assignment[assignment_id].add(user_id)
+    for assignment_id, user_ids in by_assignment.items():
+        Work.update_latest_flags(session, assignment_id, user_ids)
@@ -83,12 +83,135 @@ class Option:
         return res
 
 
+class FoundMatch(t.NamedTuple):
+    """A match between two files found by a plagiarism provider.
+
+    The positions are zero based lines, and both the start and end line are
+    part of the match.
+    """
+    file1_id: int
+    file1_start: int
+    file1_end: int
+    file2_id: int
+    file2_start: int
+    file2_end: int
+
+
+class FoundCase(t.NamedTuple):
+    """A possible plagiarism case found by a plagiarism provider.
+
+    :ivar work1_id: The id of the first submission of this case.
+    :ivar work2_id: The id of the second submission of this case.
+    :ivar match1: The percentage of the first submission that matched with
+        the second submission.
+    :ivar match2: The percentage of the second submission that matched with
+        the first submission.
+    :ivar matches: The matches between the files of both submissions, the
+        first file of each match should be part of the first submission.
+    """
+    work1_id: int
+    work2_id: int
+    match1: float
+    match2: float
+    matches: t.Sequence[FoundMatch]
+
+
+#: The amount of matches that are inserted into the database at once.
+_MATCH_INSERT_BATCH_SIZE = 5000
+
+
+def store_cases(
+    plagiarism_run: models.PlagiarismRun,
+    found_cases: t.Iterable[FoundCase],
+    old_submissions: t.Container[int],
+    *,
+    known_submissions: t.Container[int] = frozenset(),
+) -> t.List[models.PlagiarismCase]:
+    """Store the found cases with their matches in the database.
+
+    The matches are inserted directly into the database in batches, they are
+    not added to the ``matches`` of the returned cases.
+
+    :param plagiarism_run: The run to which the found cases should be added.
+    :param found_cases: The cases to store, these are only iterated once.
+    :param old_submissions: Some sort of set that contains the ids of all
+        submissions that are old. If a match between two of those submissions
+        is found this match in not inserted into the database.
+    :param known_submissions: The ids of the submissions that were already
+        compared with each other in a previous run. Matches between two of
+        those submissions are already present in the database, so they are
+        skipped.
+    :returns: The newly created cases.
+    """
+    res = []
+    seen: t.Dict[t.Tuple[int, int], models.PlagiarismCase] = {}
+    pending: t.List[t.Tuple[models.PlagiarismCase, FoundMatch]] = []
+
+    def insert_pending() -> None:
+        if not pending:
+            return
+        # Flushing makes sure all new cases have an id.
+        models.db.session.flush()
+        models.db.session.bulk_insert_mappings(
+            models.PlagiarismMatch,
+            [{
+                **match._asdict(),
+                'plagiarism_case_id': case.id,
+            } for case, match in pending],
+        )
+        pending.clear()
+
+    for found in found_cases:
+        sub1_id = found.work1_id
+        sub2_id = found.work2_id
+
+        if sub1_id in old_submissions and sub2_id in old_submissions:
+            continue
+        if sub1_id in known_submissions and sub2_id in known_submissions:
+            continue
+
+        if sub1_id == sub2_id:
+            logger.warning(
+                'Found plagiarism within a submission', submission_id=sub1_id
+            )
+            continue
+
+        tup = t.cast(t.Tuple[int, int], tuple(sorted((sub1_id, sub2_id))))
+        if tup in seen:
+            logger.warning(
+                'Duplicate plagiarism case found',
+                submission1_id=sub1_id,
+                submission2_id=sub2_id,
+            )
+            new_case = seen[tup]
+        else:
+            new_case = models.PlagiarismCase(
+                work1_id=sub1_id,
+                work2_id=sub2_id,
+                match_avg=(found.match1 + found.match2) / 2,
+                match_max=max(found.match1, found.match2),
+                plagiarism_run=plagiarism_run,
+            )
+            seen[tup] = new_case
+            res.append(new_case)
+
+        pending.extend((new_case, match) for match in found.matches)
+        if len(pending) >= _MATCH_INSERT_BATCH_SIZE:
+            insert_pending()
+
+    insert_pending()
+    return res
+
+
 def process_output_csv(
+    plagiarism_run: models.PlagiarismRun,
     lookup_map: t.Mapping[str, int],
     old_submissions: t.Container[int],
     file_tree_lookup: t.Mapping[int, files.FileTree[int]],
     csvfile: str,
     delimiter: str = ';',
+    *,
+    known_submissions: t.Container[int] = frozenset(),
 ) -> t.List[models.PlagiarismCase]:
     """Process the outputted csv file into plagiarism cases with matches.
 
@@ -108,79 +231,69 @@ def process_output_csv(
 
     Fields 5-10 can occur any number of times, but have to occur at least once.
 
+    The found cases are stored using :func:`store_cases`.
+
+    :param plagiarism_run: The run to which the found cases should be added.
     :param lookup_map: A dictionary that should map the name of each toplevel
         directory to a submission id.
-    :param old_submissions: Some sort of set that contains the ids of all
-        submissions that are old. If a match between two of those submissions
-        is found this match in not inserted into the database.
+    :param old_submissions: The ids of all submissions that are old, see
+        :func:`store_cases`.
     :param file_tree_lookup: A lookup that maps submission ids to their file
         trees.
     :param csvfile: The location of the csv file that follow the above format.
     :param delimiter: The delimiter used for this csv file.
+    :param known_submissions: The ids of the submissions that were already
+        compared with each other, see :func:`store_cases`.
+    :returns: The newly created cases.
     """
-    res = []
-    seen: t.Dict[t.Tuple[int, int], models.PlagiarismCase] = {}
+    indices: t.Dict[int, files.FileTreePathIndex[int]] = {}
 
-    with open(csvfile, newline='') as f:
+    def get_index(sub_id: int) -> files.FileTreePathIndex[int]:
+        if sub_id not in indices:
+            indices[sub_id] = files.FileTreePathIndex(file_tree_lookup[sub_id])
+        return indices[sub_id]
+
+    def read_cases(f: t.IO[str]) -> t.Iterator[FoundCase]:
         for dir1, dir2, match1, match2, *matches in csv.reader(
             f,
             delimiter=delimiter,
         ):
             sub1_id = lookup_map[dir1]
             sub2_id = lookup_map[dir2]
-
+            # These cases would be skipped by ``store_cases`` anyway, but
+            # searching their files is quite expensive.
             if sub1_id in old_submissions and sub2_id in old_submissions:
                 continue
-
-            if sub1_id == sub2_id:
-                logger.warning(
-                    'Found plagiarism within a submission',
-                    submission_id=sub1_id
-                )
+            if sub1_id in known_submissions and sub2_id in known_submissions:
                 continue
 
-            tup = t.cast(t.Tuple[int, int], tuple(sorted((sub1_id, sub2_id))))
-            if tup in seen:
-                logger.warning(
-                    'Duplicate plagiarism case in csv file',
-                    submission1_id=sub1_id,
-                    submission2_id=sub2_id,
-                )
-                new_case = seen[tup]
-            else:
-                match_max = max(float(match1), float(match2))
-                match_avg = (float(match1) + float(match2)) / 2
-                new_case = models.PlagiarismCase(
-                    work1_id=sub1_id,
-                    work2_id=sub2_id,
-                    match_avg=match_avg,
-                    match_max=match_max,
-                )
-                seen[tup] = new_case
-
-            for match in zip(*[iter(matches)] * 6):
-                fname1, fstart1, fend1, fname2, fstart2, fend2 = match
-                f_id1 = files.search_path_in_filetree(
-                    file_tree_lookup[sub1_id],
-                    fname1,
-                )
-                f_id2 = files.search_path_in_filetree(
-                    file_tree_lookup[sub2_id],
-                    fname2,
-                )
-                new_case.matches.append(
-                    models.PlagiarismMatch(
-                        file1_id=f_id1,
-                        file2_id=f_id2,
-                        file1_start=fstart1,
-                        file1_end=fend1,
-                        file2_start=fstart2,
-                        file2_end=fend2,
-                    )
-                )
-            res.append(new_case)
+            index1 = get_index(sub1_id)
+            index2 = get_index(sub2_id)
+            yield FoundCase(
+                work1_id=sub1_id,
+                work2_id=sub2_id,
+                match1=float(match1),
+                match2=float(match2),
+                matches=[
+                    FoundMatch(
+                        file1_id=index1.search(fname1),
+                        file1_start=int(fstart1),
+                        file1_end=int(fend1),
+                        file2_id=index2.search(fname2),
+                        file2_start=int(fstart2),
+                        file2_end=int(fend2),
+                    ) for fname1, fstart1, fend1, fname2, fstart2, fend2 in
+                    zip(*[iter(matches)] * 6)
+                ],
+            )
 
-    return res
+    with open(csvfile, newline='') as f:
+        return store_cases(
+            plagiarism_run,
+            read_cases(f),
+            old_submissions,
+            known_submissions=known_submissions,
+        )
 
 
 class PlagiarismProvider(metaclass=abc.ABCMeta):
@@ -210,6 +323,37 @@ class PlagiarismProvider(metaclass=abc.ABCMeta):
         """
         return True
 
+    @staticmethod
+    def runs_in_process() -> bool:
+        """Does this provider check for plagiarism in the worker process.
+
+        Providers that run in process do not get the submissions restored to
+        disk and are never called as an external program, instead
+        :meth:`PlagiarismProvider.find_cases` is used to get their results.
+
+        :returns: ``True`` if this provider runs in process.
+        """
+        return False
+
+    def find_cases(
+        self,
+        plagiarism_run: models.PlagiarismRun,
+        submissions: t.Sequence[models.Work],
+        archived_submissions: t.Container[int],
+    ) -> t.Iterable[FoundCase]:
+        """Find the plagiarism cases between the given submissions.
+
+        This function only needs to be implemented by providers that run in
+        process. It is responsible for updating the progress of the given run.
+
+        :param plagiarism_run: The run for which cases should be found.
+        :param submissions: All submissions that should be checked.
+        :param archived_submissions: The ids of the submissions that should
+            only be compared with the other submissions, not with each other.
+        :returns: The cases found, these are stored using :func:`store_cases`.
+        """
+        raise NotImplementedError
+
     @staticmethod
     def transform_csv(csvfile: str) -> str:
         """Transform the csv file outputed by the plagiarism checker to
@@ -9,5 +9,7 @@ SPDX-License-Identifier: AGPL-3.0-only
 
 
 def init_app(_: object) -> None:
-    from . import \
-        jplag  # pylint: disable=unused-import, import-outside-toplevel
+    """Register all plagiarism providers.
+    """
+    # pylint: disable=unused-import, import-outside-toplevel
+    from . import jplag, fingerprinting
@@ -0,0 +1,650 @@
+"""This module implements a plagiarism provider that runs in process.
+
+This provider tokenizes all files and selects fingerprints from the hashes of
+the k-grams of these tokens using winnowing, see "Winnowing: Local Algorithms
+for Document Fingerprinting" by Schleimer et al. The fingerprints are stored
+per file in an index, so the submissions that share fragments with a
+submission are found by looking up its fingerprints, instead of comparing all
+pairs of submissions.
+
+SPDX-License-Identifier: AGPL-3.0-only
+"""
+import re
+import zlib
+import typing as t
+from collections import deque, defaultdict
+
+import structlog
+import sqlalchemy
+from sqlalchemy import func, distinct
+from sqlalchemy.dialects.postgresql import insert
+
+import psef.helpers
+import cg_object_storage
+
+from .. import models
+from .. import plagiarism as plag
+from ..models import db
+
+logger = structlog.get_logger()
+
+#: The amount of tokens that are hashed together into a single k-gram.
+_KGRAM_SIZE = 12
+#: The amount of consecutive k-grams from which one fingerprint is selected.
+#: Every fragment of at least ``_KGRAM_SIZE + _WINDOW_SIZE - 1`` tokens that is
+#: shared between two files is guaranteed to be detected.
+_WINDOW_SIZE = 8
+#: The k-gram hashes are computed modulo this (Mersenne) prime, so they fit in
+#: a signed 64 bit column.
+_HASH_MODULUS = (1 << 61) - 1
+_HASH_BASE = 1_000_003
+
+#: The amount of values passed in a single ``IN`` clause.
+_QUERY_CHUNK_SIZE = 500
+#: The amount of submissions of which the fingerprints are counted at once.
+_COUNT_CHUNK_SIZE = 50
+#: The amount of fingerprints inserted into the database at once.
+_INSERT_CHUNK_SIZE = 1000
+
+_TOKEN_REGEX = re.compile(
+    r'''
+    (?P<comment>\#[^\n]*|//[^\n]*|/\*.*?(?:\*/|\Z))
+    |(?P<string>
+        """.*?(?:"""|\Z)
+        |\'\'\'.*?(?:\'\'\'|\Z)
+        |"(?:\\.|[^"\\\n])*"?
+        |'(?:\\.|[^'\\\n])*'?
+    )
+    |(?P<number>\d[\w.]*)
+    |(?P<name>[^\W\d]\w*)
+    |(?P<space>\s+)
+    |(?P<other>.)
+    ''',
+    re.VERBOSE | re.DOTALL,
+)
+
+# Names that are kept while tokenizing, all other names are replaced by the
+# same token. This way renaming variables does not change the fingerprints.
+_KEYWORDS = frozenset(
+    [
+        'and', 'as', 'bool', 'boolean', 'break', 'case', 'catch', 'char',
+        'class', 'const', 'continue', 'def', 'default', 'do', 'double', 'elif',
+        'else', 'except', 'false', 'False', 'finally', 'float', 'for', 'from',
+        'function', 'if', 'import', 'in', 'int', 'is', 'lambda', 'let', 'long',
+        'new', 'None', 'not', 'null', 'or', 'private', 'protected', 'public',
+        'raise', 'return', 'self', 'static', 'struct', 'switch', 'this',
+        'throw', 'true', 'True', 'try', 'var', 'void', 'while', 'with', 'yield'
+    ]
+)
+
+_Occurrence = t.Tuple[int, int, int]
+
+
+class Fingerprint(t.NamedTuple):
+    """A fingerprint of a fragment of a file.
+
+    :ivar hash: The hash of the tokens of the fragment.
+    :ivar start_line: The zero based line on which the fragment starts.
+    :ivar end_line: The zero based line on which the fragment ends.
+    """
+    hash: int
+    start_line: int
+    end_line: int
+
+
+def tokenize(text: str) -> t.List[t.Tuple[str, int]]:
+    """Split the given source code into normalized tokens.
+
+    Comments and whitespace are dropped, and all strings, numbers and names
+    that are not keywords are replaced by a single token per kind.
+
+    >>> tokenize('a = "b"  # c\\nif a:  return 5')
+    [('V', 0), ('=', 0), ('S', 0), ('if', 1), ('V', 1), (':', 1), \
+('return', 1), ('N', 1)]
+
+    :param text: The source code to tokenize.
+    :returns: A list of tuples of a token and the zero based line on which it
+        starts.
+    """
+    res = []
+    line = 0
+    pos = 0
+    for match in _TOKEN_REGEX.finditer(text):
+        kind = match.lastgroup
+        if kind in ('comment', 'space'):
+            continue
+
+        start = match.start()
+        line += text.count('\n', pos, start)
+        pos = start
+
+        if kind == 'string':
+            res.append(('S', line))
+        elif kind == 'number':
+            res.append(('N', line))
+        elif kind == 'name':
+            name = match.group()
+            res.append((name if name in _KEYWORDS else 'V', line))
+        else:
+            res.append((match.group(), line))
+
+    return res
+
+
+def _winnow(hashes: t.Sequence[int], window: int) -> t.List[int]:
+    """Select the positions of the fingerprints from the given hashes.
+
+    From each window of ``window`` consecutive hashes the minimal hash is
+    selected, if there are multiple the rightmost is selected. Each position
+    is only returned once.
+
+    >>> _winnow([5, 3, 4, 3, 7, 8, 1], 3)
+    [1, 3, 6]
+    >>> _winnow([4, 2], 3)
+    [1]
+
+    :param hashes: The hashes to select from.
+    :param window: The size of the window.
+    :returns: The selected positions, in increasing order.
+    """
+    if not hashes:
+        return []
+    if len(hashes) < window:
+        smallest = min(hashes)
+        return [max(i for i, h in enumerate(hashes) if h == smallest)]
+
+    res: t.List[int] = []
+    # The positions in the current window that can still become the minimum,
+    # the hashes at these positions are strictly increasing.
+    candidates: t.Deque[int] = deque()
+    for idx, cur_hash in enumerate(hashes):
+        while candidates and hashes[candidates[-1]] >= cur_hash:
+            candidates.pop()
+        candidates.append(idx)
+        if candidates[0] <= idx - window:
+            candidates.popleft()
+
+        if idx >= window - 1 and (not res or res[-1] != candidates[0]):
+            res.append(candidates[0])
+
+    return res
+
+
+def fingerprint(text: str) -> t.List[Fingerprint]:
+    """Compute the fingerprints of the given source code.
+
+    :param text: The source code to fingerprint.
+    :returns: The fingerprints of the code, a fingerprint is never returned
+        twice for the same line.
+    """
+    tokens = tokenize(text)
+    if len(tokens) < _KGRAM_SIZE:
+        return []
+
+    token_hashes: t.Dict[str, int] = {}
+    top = pow(_HASH_BASE, _KGRAM_SIZE - 1, _HASH_MODULUS)
+    kgram_hashes = []
+    cur = 0
+    for idx, (token, _) in enumerate(tokens):
+        if token not in token_hashes:
+            token_hashes[token] = zlib.crc32(token.encode('utf8'))
+        if idx >= _KGRAM_SIZE:
+            old = token_hashes[tokens[idx - _KGRAM_SIZE][0]]
+            cur = (cur - old * top) % _HASH_MODULUS
+        cur = (cur * _HASH_BASE + token_hashes[token]) % _HASH_MODULUS
+        if idx >= _KGRAM_SIZE - 1:
+            kgram_hashes.append(cur)
+
+    res: t.Dict[t.Tuple[int, int], int] = {}
+    for pos in _winnow(kgram_hashes, _WINDOW_SIZE):
+        start_line = tokens[pos][1]
+        end_line = tokens[pos + _KGRAM_SIZE - 1][1]
+        key = (kgram_hashes[pos], start_line)
+        res[key] = max(res.get(key, end_line), end_line)
+
+    return [
+        Fingerprint(hash=hash_, start_line=start, end_line=end)
+        for (hash_, start), end in res.items()
+    ]
+
+
+def _fingerprint_file(backing_file: cg_object_storage.File
+                      ) -> t.List[Fingerprint]:
+    with backing_file.open() as f:
+        data = f.read()
+    # Binary files are not checked.
+    if b'\0' in data:
+        return []
+    return fingerprint(data.decode('utf8', 'replace'))
+
+
+def _first_per_file(occurrences: t.Iterable[_Occurrence]
+                    ) -> t.Dict[int, t.Tuple[int, int]]:
+    res: t.Dict[int, t.Tuple[int, int]] = {}
+    for file_id, start, end in occurrences:
+        if file_id not in res or start < res[file_id][0]:
+            res[file_id] = (start, end)
+    return res
+
+
+def _merge_matches(
+    shared: t.Iterable[int],
+    occurrences1: t.Mapping[int, t.Sequence[_Occurrence]],
+    occurrences2: t.Mapping[int, t.Sequence[_Occurrence]],
+) -> t.List[plag.FoundMatch]:
+    """Merge the shared fingerprints of two submissions into matches.
+
+    Fingerprints of the same pair of files that overlap or are adjacent in
+    both files are merged into a single match.
+
+    :param shared: The fingerprints that both submissions have.
+    :param occurrences1: The locations of the fingerprints in the first
+        submission.
+    :param occurrences2: The locations of the fingerprints in the second
+        submission.
+    :returns: The matches between the submissions.
+    """
+    fragments: t.Dict[t.Tuple[int, int], t.List[t.Tuple[int, int, int, int]]]
+    fragments = defaultdict(list)
+    for hash_ in shared:
+        firsts2 = _first_per_file(occurrences2[hash_])
+        for file1, (start1, end1) in _first_per_file(occurrences1[hash_]
+                                                     ).items():
+            for file2, (start2, end2) in firsts2.items():
+                fragments[file1, file2].append((start1, end1, start2, end2))
+
+    res: t.List[plag.FoundMatch] = []
+    for (file1, file2), frags in fragments.items():
+        frags.sort()
+        merged = [list(frags[0])]
+        for start1, end1, start2, end2 in frags[1:]:
+            cur = merged[-1]
+            if start1 <= cur[1] + 1 and cur[2] <= start2 <= cur[3] + 1:
+                cur[1] = max(cur[1], end1)
+                cur[3] = max(cur[3], end2)
+            else:
+                merged.append([start1, end1, start2, end2])
+
+        res.extend(
+            plag.FoundMatch(
+                file1_id=file1,
+                file1_start=start1,
+                file1_end=end1,
+                file2_id=file2,
+                file2_start=start2,
+                file2_end=end2,
+            ) for start1, end1, start2, end2 in merged
+        )
+
+    return res
+
+
+class Fingerprinting(plag.PlagiarismProvider):
+    """This class implements the fingerprinting plagiarism provider.
+    """
+
+    def __init__(self) -> None:
+        self.suffixes: t.Optional[t.Sequence[str]] = None
+        self.simil: int = 50
+        self.has_base_code: bool = False
+
+    @staticmethod
+    def runs_in_process() -> bool:
+        return True
+
+    @property
+    def matches_output(self) -> str:  # pragma: no cover
+        raise AssertionError('This provider does not output a csv file')
+
+    @staticmethod
+    def supports_progress() -> bool:
+        return True
+
+    @staticmethod
+    def get_progress_from_line(prefix: str,
+                               line: str) -> t.Optional[t.Tuple[int, int]]:
+        # This provider has no output, so this is never called.
+        return None  # pragma: no cover
+
+    @staticmethod
+    def get_options() -> t.Sequence[plag.Option]:
+        """Get all possible options for this provider.
+
+        :returns: The possible options.
+        """
+        return [
+            plag.Option(
+                "suffixes",
+                "Suffixes to include",
+                (
+                    "A comma separated list of suffixes. A file is only"
+                    " checked if it ends with one of the given suffixes"
+                    " exactly, no regex is supported. If this value is left"
+                    " empty all files are checked."
+                ),
+                plag.OptionTypes.strvalue,
+                False,
+                None,
+                placeholder='.xxx, .yyy',
+            ),
+            plag.Option(
+                "simil",
+                "Minimal similarity",
+                (
+                    "The minimal average similarity needed before a pair is "
+                    "considered plagiarism. If this is set to 100 both "
+                    "assignments need to be completely the same, when set to"
+                    " 50 both submissions need to be 50% the same, or one 25%"
+                    " and the other 75%. The default is 50."
+                ),
+                plag.OptionTypes.numbervalue,
+                False,
+                None,
+                placeholder='default: 50',
+            ),
+        ]
+
+    def _set_provider_values(
+        self, values: t.Dict[str, psef.helpers.JSONType]
+    ) -> None:
+        """Set the options for this provider.
+
+        :param values: The values to be set.
+        :returns: Nothing.
+        """
+        self.has_base_code = bool(values['has_base_code'])
+
+        if 'suffixes' in values:
+            suffixes = [s.strip() for s in str(values['suffixes']).split(',')]
+            self.suffixes = [s for s in suffixes if s] or None
+        if 'simil' in values:
+            assert isinstance(values['simil'], (int, float))
+            self.simil = int(values['simil'])
+
+    def get_program_call(self) -> t.List[str]:  # pragma: no cover
+        raise AssertionError('This provider runs in process')
+
+    def _should_check(self, filename: str) -> bool:
+        if self.suffixes is None:
+            return True
+        return any(filename.endswith(suffix) for suffix in self.suffixes)
+
+    def _get_files(self, submissions: t.Sequence[models.Work]
+                   ) -> t.Dict[int, t.List[models.File]]:
+        """Get the files that should be checked of the given submissions.
+
+        :param submissions: The submissions to get the files for.
+        :returns: A mapping from submission id to the files to check.
+        """
+        File = models.File
+        res: t.Dict[int, t.List[models.File]] = {
+            sub.id: []
+            for sub in submissions
+        }
+        for chunk in psef.helpers.chunkify(res, _QUERY_CHUNK_SIZE):
+            for f in File.query.filter(
+                File.work_id.in_(chunk),
+                ~File.is_directory,
+                File.fileowner != models.FileOwner.teacher,
+                ~File.self_deleted,
+            ):
+                if f.backing_file.is_just and self._should_check(f.name):
+                    res[f.work_id].append(f)
+        return res
+
+    @staticmethod
+    def _update_index(
+        plagiarism_run: models.PlagiarismRun,
+        submissions: t.Sequence[models.Work],
+        files_per_sub: t.Mapping[int, t.Sequence[models.File]],
+        archived_submissions: t.Container[int],
+    ) -> None:
+        """Make sure the fingerprints of all given files are in the index.
+
+        Files that were fingerprinted before, and didn't change since, are not
+        read again. The progress of the run is updated while the not archived
+        submissions are processed.
+
+        :param plagiarism_run: The run for which the index is updated.
+        :param submissions: All submissions of the run.
+        :param files_per_sub: The files to index for each submission.
+        :param archived_submissions: The ids of the archived submissions.
+        """
+        Fingerprinted = models.PlagiarismFingerprintedFile
+        FP = models.PlagiarismFingerprint
+        fingerprinted_table = sqlalchemy.inspect(Fingerprinted).local_table
+
+        indexed: t.Dict[int, str] = {}
+        file_ids = [f.id for fs in files_per_sub.values() for f in fs]
+        for chunk in psef.helpers.chunkify(file_ids, _QUERY_CHUNK_SIZE):
+            indexed.update(
+                db.session.query(
+                    Fingerprinted.file_id, Fingerprinted.filename
+                ).filter(Fingerprinted.file_id.in_(chunk))
+            )
+
+        # The archived submissions are indexed first, so the progress of the
+        # run is only updated at the end.
+        to_check = sorted(
+            submissions,
+            key=lambda sub: sub.id not in archived_submissions,
+        )
+        done = (plagiarism_run.submissions_total or 0) - sum(
+            1 for sub in submissions if sub.id not in archived_submissions
+        )
+        plagiarism_run.set_progress(models.PlagiarismState.parsing, done)
+
+        for sub in to_check:
+            outdated = []
+            new_files = []
+            fingerprints: t.List[t.Dict[str, int]] = []
+            for f in files_per_sub[sub.id]:
+                backing_file = f.backing_file.unsafe_extract()
+                if indexed.get(f.id) == backing_file.name:
+                    continue
+                if f.id in indexed:
+                    outdated.append(f.id)
+
+                new_files.append({
+                    'file_id': f.id,
+                    'filename': backing_file.name,
+                })
+                fingerprints.extend({
+                    'file_id': f.id,
+                    'fingerprint': fp.hash,
+                    'start_line': fp.start_line,
+                    'end_line': fp.end_line,
+                } for fp in _fingerprint_file(backing_file))
+
+            if outdated:
+                logger.info('Refreshing fingerprints', file_ids=outdated)
+                db.session.query(FP).filter(
+                    FP.file_id.in_(outdated)
+                ).delete(synchronize_session=False)
+                db.session.query(Fingerprinted).filter(
+                    Fingerprinted.file_id.in_(outdated)
+                ).delete(synchronize_session=False)
+            # Another run might be indexing the same files at this moment, in
+            # which case only the first one should store the fingerprints.
+            inserted: t.Set[int] = set()
+            for rows in psef.helpers.chunkify(new_files, _INSERT_CHUNK_SIZE):
+                stmt = insert(fingerprinted_table).values(rows)
+                result = db.session.execute(
+                    stmt.on_conflict_do_nothing(
+                        index_elements=[fingerprinted_table.c.file_id]
+                    ).returning(fingerprinted_table.c.file_id)
+                )
+                inserted.update(
+                    file_id for file_id, in
+                    t.cast(t.Iterable[t.Tuple[int]], result)
+                )
+            for fp_rows in psef.helpers.chunkify(
+                (fp for fp in fingerprints if fp['file_id'] in inserted),
+                _INSERT_CHUNK_SIZE,
+            ):
+                db.session.bulk_insert_mappings(FP, fp_rows)
+
+            if sub.id in archived_submissions:
+                db.session.commit()
+            else:
+                done += 1
+                plagiarism_run.set_progress(
+                    models.PlagiarismState.parsing, done
+                )
+
+    def _get_base_code_hashes(
+        self, plagiarism_run: models.PlagiarismRun
+    ) -> t.Set[int]:
+        BaseCode = models.PlagiarismBaseCodeFile
+        res: t.Set[int] = set()
+        for base_code_files in BaseCode.make_cache(plagiarism_run).values():
+            for base_code_file in base_code_files:
+                backing_file = base_code_file.backing_file
+                if backing_file.is_just and self._should_check(
+                    base_code_file.name
+                ):
+                    res.update(
+                        fp.hash
+                        for fp in _fingerprint_file(backing_file.value)
+                    )
+        return res
+
+    def find_cases(
+        self,
+        plagiarism_run: models.PlagiarismRun,
+        submissions: t.Sequence[models.Work],
+        archived_submissions: t.Container[int],
+    ) -> t.Iterable[plag.FoundCase]:
+        File = models.File
+        FP = models.PlagiarismFingerprint
+
+        files_per_sub = self._get_files(submissions)
+        self._update_index(
+            plagiarism_run, submissions, files_per_sub, archived_submissions
+        )
+        base_hashes: t.Set[int] = set()
+        if self.has_base_code:
+            base_hashes = self._get_base_code_hashes(plagiarism_run)
+
+        sub_of_file = {
+            f.id: sub_id
+            for sub_id, fs in files_per_sub.items() for f in fs
+        }
+        checked_subs = [
+            sub.id for sub in submissions
+            if sub.id not in archived_submissions
+        ]
+        checked_set = set(checked_subs)
+        checked_files = [
+            f.id for sub_id in checked_subs for f in files_per_sub[sub_id]
+        ]
+
+        lookup = set(base_hashes)
+        for chunk in psef.helpers.chunkify(checked_files, _QUERY_CHUNK_SIZE):
+            lookup.update(
+                hash_ for hash_, in db.session.query(FP.fingerprint)
+                .filter(FP.file_id.in_(chunk)).distinct()
+            )
+
+        # Find the locations of the fingerprints in all submissions using the
+        # index, mapping submission id to fingerprint to the occurrences.
+        occurrences: t.Dict[int, t.Dict[int, t.List[_Occurrence]]]
+        occurrences = defaultdict(lambda: defaultdict(list))
+        subs_per_hash: t.Dict[int, t.Set[int]] = defaultdict(set)
+        for chunk in psef.helpers.chunkify(lookup, _QUERY_CHUNK_SIZE):
+            for file_id, hash_, start, end in db.session.query(
+                FP.file_id, FP.fingerprint, FP.start_line, FP.end_line
+            ).join(File, File.id == FP.file_id).filter(
+                FP.fingerprint.in_(chunk),
+                File.work_id.in_(list(files_per_sub)),
+            ):
+                sub_id = sub_of_file.get(file_id)
+                if sub_id is not None:
+                    occurrences[sub_id][hash_].append((file_id, start, end))
+                    subs_per_hash[hash_].add(sub_id)
+
+        plagiarism_run.set_progress(models.PlagiarismState.comparing, 0)
+        shared: t.Dict[t.Tuple[int, int], int] = defaultdict(int)
+        for done, sub_id in enumerate(checked_subs, 1):
+            for hash_ in occurrences[sub_id]:
+                if hash_ in base_hashes:
+                    continue
+                for other_id in subs_per_hash[hash_]:
+                    # Pairs of checked submissions are found twice.
+                    if other_id == sub_id or (
+                        other_id in checked_set and other_id < sub_id
+                    ):
+                        continue
+                    shared[sub_id, other_id] += 1
+            plagiarism_run.set_progress(
+                models.PlagiarismState.comparing, done
+            )
+
+        amounts = self._get_amount_of_hashes(
+            set(sub_id for pair in shared for sub_id in pair),
+            files_per_sub,
+        )
+        for sub_id, sub_occurrences in occurrences.items():
+            amounts[sub_id] -= sum(
+                1 for hash_ in sub_occurrences if hash_ in base_hashes
+            )
+
+        res = []
+        for (sub1_id, sub2_id), amount in shared.items():
+            match1 = 100 * amount / amounts[sub1_id]
+            match2 = 100 * amount / amounts[sub2_id]
+            if (match1 + match2) / 2 < self.simil:
+                continue
+
+            occurrences1 = occurrences[sub1_id]
+            occurrences2 = occurrences[sub2_id]
+            res.append(
+                plag.FoundCase(
+                    work1_id=sub1_id,
+                    work2_id=sub2_id,
+                    match1=match1,
+                    match2=match2,
+                    matches=_merge_matches(
+                        (
+                            hash_ for hash_ in occurrences1
+                            if hash_ in occurrences2 and
+                            hash_ not in base_hashes
+                        ),
+                        occurrences1,
+                        occurrences2,
+                    ),
+                )
+            )
+
+        return res
+
+    @staticmethod
+    def _get_amount_of_hashes(
+        sub_ids: t.Collection[int],
+        files_per_sub: t.Mapping[int, t.Sequence[models.File]],
+    ) -> t.Dict[int, int]:
+        """Get the amount of distinct fingerprints of the given submissions.
+
+        :param sub_ids: The submissions to get the amounts for.
+        :param files_per_sub: The files that are checked of each submission.
+        :returns: A mapping from submission id to the amount of fingerprints.
+        """
+        File = models.File
+        FP = models.PlagiarismFingerprint
+
+        res: t.Dict[int, int] = defaultdict(int)
+        # The submissions are chunked, instead of their files, as a single
+        # fingerprint can occur in multiple files of a submission.
+        for chunk in psef.helpers.chunkify(sub_ids, _COUNT_CHUNK_SIZE):
+            file_ids = [
+                f.id for sub_id in chunk for f in files_per_sub[sub_id]
+            ]
+            res.update(
+                db.session.query(
+                    File.work_id,
+                    func.count(distinct(FP.fingerprint)),
+                ).join(File, File.id == FP.file_id).filter(
+                    FP.file_id.in_(file_ids)
+                ).group_by(File.work_id)
+            )
+        return res
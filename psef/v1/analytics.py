@@ -8,14 +8,35 @@ This module defines all API routes for the analytics workspaces.
 
 SPDX-License-Identifier: AGPL-3.0-only
 """
+import typing as t
+
+import flask
+
 from cg_json import JSONResponse
+from cg_flask_helpers import NotModifiedResponse, etag_matches
 
 from . import api
 from .. import auth, models, helpers, registry, exceptions
+from ..models import db
+
+T_RESPONSE = t.TypeVar('T_RESPONSE', bound=flask.Response)  # pylint: disable=invalid-name
+
+
+def _get_etag(workspace: models.AnalyticsWorkspace) -> str:
+    return f'{workspace.id}-{workspace.data_version}'
+
+
+def _with_etag(res: T_RESPONSE, etag: str) -> T_RESPONSE:
+    res.set_etag(etag, weak=True)
+    # Make sure clients always check if their cached version is still valid.
+    res.headers['Cache-Control'] = 'private, no-cache'
+    return res
 
 
 @api.route("/analytics/<int:ana_id>", methods=['GET'])
-def get_analytics(ana_id: int) -> JSONResponse[models.AnalyticsWorkspace]:
+def get_analytics(
+    ana_id: int
+) -> t.Union[JSONResponse[models.AnalyticsWorkspace], NotModifiedResponse]:
     """Get a :class:`.models.AnalyticsWorkspace`.
 
     .. :quickref: Analytics; Get a analytics workspace.
@@ -25,6 +46,10 @@ def get_analytics(ana_id: int) -> JSONResponse[models.AnalyticsWorkspace]:
         This route should be considered beta, its behavior and/or existence
         will change.
 
+    The response has an ``ETag``, if it is passed in the ``If-None-Match``
+    header and the data did not change an empty response with status code 304
+    is returned.
+
     :param int ana_id: The id of the workspace to get.
     """
     workspace = helpers.get_or_404(
@@ -33,7 +58,15 @@ def get_analytics(ana_id: int) -> JSONResponse[models.AnalyticsWorkspace]:
         also_error=lambda a: not a.assignment.is_visible
     )
     auth.AnalyticsWorkspacePermissions(workspace).ensure_may_see()
-    return JSONResponse.make(workspace)
+
+    etag = _get_etag(workspace)
+    if etag_matches(etag):
+        return NotModifiedResponse.make(etag)
+    res = JSONResponse.make(workspace)
+    # Creating the response might have refreshed the snapshots of the
+    # workspace.
+    db.session.commit()
+    return _with_etag(res, etag)
 
 
 @api.route(
@@ -42,7 +75,7 @@ def get_analytics(ana_id: int) -> JSONResponse[models.AnalyticsWorkspace]:
 def get_data_source(
     ana_id: int,
     data_source_name: str,
-) -> JSONResponse[models.BaseDataSource]:
+) -> t.Union[JSONResponse[models.BaseDataSource], NotModifiedResponse]:
     """Get a data source within a :class:`.models.AnalyticsWorkspace`.
 
     .. :quickref: Analytics; Get a data source of a workspace.
@@ -52,6 +85,10 @@ def get_data_source(
         This route should be considered beta, its behavior and/or existence
         will change.
 
+    The response has an ``ETag``, if it is passed in the ``If-None-Match``
+    header and the data did not change an empty response with status code 304
+    is returned.
+
     :param int ana_id: The id of the workspace in which the datasource should
         be retrieved.
     :param string data_source_name: The name of the data source to retrieve.
@@ -72,4 +109,11 @@ def get_data_source(
             ), exceptions.APICodes.OBJECT_NOT_FOUND, 404
         )
 
-    return JSONResponse.make(data_source)
+    etag = _get_etag(workspace)
+    if etag_matches(etag):
+        return NotModifiedResponse.make(etag)
+    res = JSONResponse.make(data_source)
+    # Creating the response might have refreshed the snapshots of the
+    # workspace.
+    db.session.commit()
+    return _with_etag(res, etag)
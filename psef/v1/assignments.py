@@ -1096,6 +1096,7 @@ def divide_assignments(assignment_id: int) -> EmptyResponse:
         models.Work.query.filter_by(assignment_id=assignment.id).update(
             {'assigned_to': None}
         )
+        models.AnalyticsWorkspace.mark_assignment_changed(assignment.id)
         assignment.assigned_graders = {}
         db.session.commit()
         return make_empty_response()
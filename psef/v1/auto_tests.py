@@ -18,6 +18,8 @@ from cg_json import (
     extended_jsonify
 )
 from cg_maybe import Maybe
+from cg_dt_utils import DatetimeWithTimezone
+from cg_flask_helpers import NotModifiedResponse, etag_matches
 
 from . import api
 from .. import (
@@ -35,6 +37,8 @@ from ..permissions import CoursePermission as CPerm
 
 logger = structlog.get_logger()
 
+T_RESPONSE = t.TypeVar('T_RESPONSE', bound=Response)  # pylint: disable=invalid-name
+
 
 def _get_at_set_by_ids(
     auto_test_id: int, auto_test_set_id: int
@@ -739,30 +743,114 @@ def get_auto_test(
     )
 
 
+def _get_run_by_ids(auto_test_id: int, run_id: int) -> models.AutoTestRun:
+    run = filter_single_or_404(
+        models.AutoTestRun,
+        models.AutoTestRun.id == run_id,
+        also_error=lambda run: run.auto_test_id != auto_test_id
+    )
+    auth.AutoTestRunPermissions(run).ensure_may_see()
+    return run
+
+
+def _with_results_etag(res: T_RESPONSE, etag: str) -> T_RESPONSE:
+    res.set_etag(etag, weak=True)
+    # Make sure clients always check if their cached version is still valid.
+    res.headers['Cache-Control'] = 'private, no-cache'
+    return res
+
+
 @api.route('/auto_tests/<int:auto_test_id>/runs/<int:run_id>', methods=['GET'])
 @site_settings.Opt.AUTO_TEST_ENABLED.required
-def get_auto_test_run(auto_test_id: int,
-                      run_id: int) -> ExtendedJSONResponse[models.AutoTestRun]:
+def get_auto_test_run(
+    auto_test_id: int, run_id: int
+) -> t.Union[ExtendedJSONResponse[models.AutoTestRun], NotModifiedResponse]:
     """Get the extended version of an :class:`.models.AutoTestRun`.
 
     .. :quickref: AutoTest; Get the extended details of an AutoTest run.
 
+    The response has an ``ETag``, if it is passed in the ``If-None-Match``
+    header and the results did not change an empty response with status code
+    304 is returned.
+
     :param auto_test_id: The id of the AutoTest which is connected to the
         requested run.
     :param run_id: The id of the run to get.
     :returns: The extended version of an :class:`.models.AutoTestRun`, note
         that results will not be serialized as an extended version.
     """
-    run = filter_single_or_404(
-        models.AutoTestRun,
-        models.AutoTestRun.id == run_id,
-        also_error=lambda run: run.auto_test_id != auto_test_id
+    run = _get_run_by_ids(auto_test_id, run_id)
+
+    latest_only = helpers.request_arg_true('latest_only')
+    etag = run.get_results_version(latest_only)
+    if etag_matches(etag):
+        return NotModifiedResponse.make(etag)
+
+    jsonify_options.get_options().latest_only = latest_only
+    return _with_results_etag(
+        extended_jsonify(run, use_extended=models.AutoTestRun), etag
     )
-    auth.AutoTestRunPermissions(run).ensure_may_see()
 
-    jsonify_options.get_options(
-    ).latest_only = helpers.request_arg_true('latest_only')
-    return extended_jsonify(run, use_extended=models.AutoTestRun)
+
+@api.route(
+    '/auto_tests/<int:auto_test_id>/runs/<int:run_id>/changes',
+    methods=['GET']
+)
+@site_settings.Opt.AUTO_TEST_ENABLED.required
+def get_auto_test_run_changes(
+    auto_test_id: int, run_id: int
+) -> t.Union[JSONResponse[models.AutoTestRun.ResultChangesAsJSON],
+             NotModifiedResponse]:
+    """Get the results of an :class:`.models.AutoTestRun` that changed since a
+    given moment.
+
+    .. :quickref: AutoTest; Get the changed results of an AutoTest run.
+
+    This route makes it possible to keep the results of a run up to date
+    without retrieving all of them every time. The ``since`` query parameter
+    should be the ``cursor`` of the previous response, or the moment the run
+    was retrieved. Results that became visible to the user without changing,
+    for example because the assignment was set to done, are not reported, so
+    the entire run should be retrieved again when that might have happened.
+
+    Like :func:`get_auto_test_run` this route supports the ``If-None-Match``
+    header.
+
+    :param auto_test_id: The id of the AutoTest which is connected to the
+        requested run.
+    :param run_id: The id of the run to get the changes of.
+    :returns: The changes of the results in the run.
+    """
+    run = _get_run_by_ids(auto_test_id, run_id)
+
+    since_str = request.args.get('since')
+    if since_str is None:
+        raise APIException(
+            'The "since" parameter is required',
+            'The "since" query parameter was not given',
+            APICodes.MISSING_REQUIRED_PARAM, 400
+        )
+    try:
+        since = DatetimeWithTimezone.parse_isoformat(since_str)
+    except ValueError as exc:
+        raise APIException(
+            'The "since" parameter should be a date', (
+                f'The given parameter "{since_str}" could not be parsed as'
+                ' an ISO 8601 date'
+            ), APICodes.INVALID_PARAM, 400
+        ) from exc
+
+    latest_only = helpers.request_arg_true('latest_only')
+    etag = '{}-{}'.format(
+        run.get_results_version(latest_only),
+        since.timestamp(),
+    )
+    if etag_matches(etag):
+        return NotModifiedResponse.make(etag)
+
+    return _with_results_etag(
+        jsonify(run.get_result_changes(since, latest_only)), etag
+    )
 
 
 @api.route('/auto_tests/<int:auto_test_id>/runs/', methods=['POST'])
@@ -890,14 +978,11 @@ def get_auto_test_results_for_user(
     user = get_or_404(models.User, user_id)
     auth.AutoTestRunPermissions(run).ensure_may_see()
 
-    results = []
-    for result in models.AutoTestResult.get_results_by_user(
-        user.id
-    ).filter(models.AutoTestResult.run == run).order_by(
-        models.AutoTestResult.created_at
-    ):
-        if auth.AutoTestResultPermissions(result).ensure_may_see.as_bool():
-            results.append(result)
+    results = auth.AutoTestResultPermissions.filter_may_see(
+        models.AutoTestResult.get_results_by_user(user.id).filter(
+            models.AutoTestResult.run == run
+        ).order_by(models.AutoTestResult.created_at)
+    )
 
     return jsonify(results)
 
@@ -379,8 +379,10 @@ def get_all_course_users(
         @limiter.limit('1 per second', key_func=lambda: str(current_user.id))
         def get_users_in_course() -> t.List[models.User]:
             query: str = request.args.get('q', '')
-            base = course.get_all_users_in_course(include_test_students=False
-                                                  ).from_self(models.User)
+            in_course = course.get_all_users_in_course(
+                include_test_students=False
+            ).with_entities(models.User.id)
+            base = models.User.query.filter(models.User.id.in_(in_course))
             return helpers.filter_users_by_name(query, base).all()
 
         return jsonify(get_users_in_course())
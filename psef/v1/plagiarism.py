@@ -10,11 +10,12 @@ import typing as t
 from sqlalchemy.orm import defaultload
 
 from . import api
-from .. import auth, models, helpers, plagiarism
+from .. import auth, tasks, models, helpers, plagiarism
 from ..helpers import (
     JSONResponse, EmptyResponse, ExtendedJSONResponse, jsonify,
     extended_jsonify, make_empty_response
 )
+from ..exceptions import APICodes, APIException
 from ..permissions import CoursePermission as CPerm
 
 
@@ -48,6 +49,52 @@ def delete_plagiarism_run(plagiarism_id: int, ) -> EmptyResponse:
     return make_empty_response()
 
 
+@api.route('/plagiarism/<int:plagiarism_id>/refresh', methods=['POST'])
+def refresh_plagiarism_run(
+    plagiarism_id: int,
+) -> JSONResponse[models.PlagiarismRun]:
+    """Refresh a plagiarism run with the latest submissions.
+
+    .. :quickref: Plagiarism; Refresh a plagiarism run.
+
+    Only the submissions that were not part of the previous execution of this
+    run are compared against all other submissions, the existing cases between
+    unchanged submissions are kept.
+
+    :param int plagiarism_id: The id of the run to refresh.
+    :returns: The refreshed plagiarism run.
+
+    :raises APIException: If the run is still in progress. (INVALID_STATE)
+    :raises PermissionException: If the user can not manage plagiarism runs or
+        cases for the course associated with the run. (INCORRECT_PERMISSION)
+    """
+    run = helpers.get_or_404(
+        models.PlagiarismRun,
+        plagiarism_id,
+        also_error=lambda p: not p.assignment.is_visible,
+        with_for_update=True,
+    )
+    auth.AssignmentPermissions(run.assignment).ensure_may_edit_plagiarism()
+
+    if run.state not in {
+        models.PlagiarismState.done,
+        models.PlagiarismState.crashed,
+    }:
+        raise APIException(
+            'This plagiarism run is still in progress',
+            f'The run {run.id} is in the state {run.state.name}',
+            APICodes.INVALID_STATE, 400
+        )
+
+    run.state = models.PlagiarismState.starting
+    models.db.session.commit()
+    helpers.callback_after_this_request(
+        lambda: tasks.run_plagiarism_control(plagiarism_run_id=run.id)
+    )
+
+    return jsonify(run)
+
+
 @api.route('/plagiarism/<int:plagiarism_id>', methods=['GET'])
 def get_plagiarism_run(
     plagiarism_id: int,
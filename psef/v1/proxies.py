@@ -5,11 +5,17 @@ SPDX-License-Identifier: AGPL-3.0-only
 import hmac
 import uuid
 import typing as t
+import hashlib
+import datetime
 import mimetypes
 
 import flask
 import werkzeug
 import structlog
+import werkzeug.wsgi
+import werkzeug.exceptions
+
+import cg_maybe
 
 from . import api
 from .. import app, files, models, helpers, site_settings
@@ -154,14 +160,38 @@ def get_proxy_file(
             if found_file:
                 break
 
-    if found_file is None:
-        raise APIException(
+    backing_file = cg_maybe.from_nullable(found_file).chain(
+        lambda f: f.backing_file
+    ).try_extract(
+        lambda: APIException(
             'The given file could not be found.',
             f'The path "{path_str}" was not found in this proxy.',
             APICodes.OBJECT_NOT_FOUND, 404
         )
+    )
+    assert found_file is not None
     ctype, _ = mimetypes.guess_type(path_str)
-    res = flask.Response(found_file.open(), mimetype=ctype)
+    size = backing_file.size
+    res = flask.Response(
+        werkzeug.wsgi.wrap_file(flask.request.environ, backing_file.open()),
+        mimetype=ctype,
+        direct_passthrough=True,
+    )
+    res.headers['Content-Length'] = size
     res.headers['Content-Security-Policy'] = proxy.csp_header
     res.headers['Referrer-Policy'] = 'no-referrer'
-    return res
+    # Make sure clients always check if their cached version is still valid.
+    res.headers['Cache-Control'] = 'private, no-cache'
+    res.set_etag(
+        hashlib.sha256(backing_file.name.encode('utf8')).hexdigest()
+    )
+    res.last_modified = datetime.datetime.fromtimestamp(
+        found_file.modification_date, datetime.timezone.utc
+    )
+    try:
+        return res.make_conditional(
+            flask.request, accept_ranges=True, complete_length=size
+        )
+    except werkzeug.exceptions.RequestedRangeNotSatisfiable:
+        res.close()
+        raise
@@ -17,6 +17,7 @@ from sqlalchemy.orm import selectinload, contains_eager
 from typing_extensions import Protocol, TypedDict
 
 import psef.files
+import cg_object_storage
 from psef import app, current_user
 from cg_sqlalchemy_helpers.types import ColumnProxy
 
@@ -204,10 +205,15 @@ def get_zip(work: models.Work,
                                  attached course. (INCORRECT_PERMISSION)
     """
     auth.ensure_can_view_files(work, exclude_owner == FileOwner.student)
-    with work.create_zip(exclude_owner) as zip_file:
-        max_size = app.max_large_file_size
-        with app.mirror_file_storage.putter() as putter:
-            result = putter.from_stream(stream=zip_file, max_size=max_size)
+    zip_stream = cg_object_storage.utils.IteratorStream(
+        work.create_zip(
+            exclude_owner,
+            compresslevel=app.config['ZIP_COMPRESSION_LEVEL'],
+        )
+    )
+    max_size = app.max_large_file_size
+    with app.mirror_file_storage.putter() as putter:
+        result = putter.from_stream(stream=zip_stream, max_size=max_size)
 
     name = result.try_extract(
         lambda: helpers.make_file_too_big_exception(max_size, True)
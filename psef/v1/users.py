@@ -9,7 +9,6 @@ SPDX-License-Identifier: AGPL-3.0-only
 import typing as t
 
 from flask import request
-from sqlalchemy import case, func
 from flask_limiter.util import get_remote_address
 
 from . import api
@@ -63,22 +62,14 @@ def search_users() -> JSONResponse[t.Sequence[models.User]]:
             ) from exc
         auth.ensure_permission(CPerm.can_list_course_users, exclude_course)
 
-        base = db.session.query(models.User).join(
-            models.user_course,
-            models.user_course.c.user_id == models.User.id,
-            isouter=True,
-        ).join(
+        in_course = db.session.query(models.user_course).join(
             models.CourseRole,
             models.CourseRole.id == models.user_course.c.course_id,
-            isouter=True,
-        ).group_by(models.User).having(
-            func.sum(
-                case(
-                    [(models.CourseRole.course_id == exclude_course, 1)],
-                    else_=0
-                )
-            ) == 0
+        ).filter(
+            models.user_course.c.user_id == models.User.id,
+            models.CourseRole.course_id == exclude_course,
         )
+        base = models.User.query.filter(~in_course.exists())
     else:
         base = models.User.query
 
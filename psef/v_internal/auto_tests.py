@@ -7,11 +7,12 @@ SPDX-License-Identifier: AGPL-3.0-only
 """
 import json
 import typing as t
+import zipfile
 
 import requests
 import werkzeug
 import structlog
-from flask import request, send_file, make_response
+from flask import request, make_response
 from werkzeug.wrappers import Response
 
 from . import api
@@ -215,10 +216,20 @@ def get_result_data(auto_test_id: int,
         else:
             excluded_user = models.FileOwner.teacher
 
-        zip_file = result.work.create_zip(
-            excluded_user, create_leading_directory=False
+        # Compressing is not worth the cpu time here, as the runners are
+        # generally close to the server.
+        zip_stream = result.work.create_zip(
+            excluded_user,
+            create_leading_directory=False,
+            compression=zipfile.ZIP_STORED,
+        )
+        res = Response(
+            zip_stream,
+            mimetype='application/zip',
+            headers={
+                'Content-Disposition': 'attachment; filename=student.zip',
+            },
         )
-        res = send_file(zip_file, attachment_filename='student.zip')
 
     return res
 
@@ -297,10 +308,12 @@ def get_fixture(
 )
 @site_settings.Opt.AUTO_TEST_ENABLED.required
 def update_result(auto_test_id: int,
-                  result_id: int) -> JSONResponse[t.Dict[str, bool]]:
+                  result_id: int) -> JSONResponse[t.Mapping[str, object]]:
     """Update the the state of a result.
 
-    This route does not update the results of steps!
+    This route does not update the results of steps! When the result is
+    started the response contains the suites that are reused from a previous
+    run, these should not be run again.
 
     :param auto_test_id: The AutoTest configuration in which to update the
         result.
@@ -360,8 +373,19 @@ def update_result(auto_test_id: int,
         else:
             result.state = state
 
+    reused_suites = []
+    if state == models.AutoTestStepResultState.running:
+        reused_suites = [
+            {
+                'id': suite_id,
+                'achieved_points': achieved,
+                'possible_points': possible,
+            } for suite_id, (achieved, possible) in
+            result.get_reused_suite_points().items()
+        ]
+
     db.session.commit()
-    return jsonify({'taken': False})
+    return jsonify({'taken': False, 'reused_suites': reused_suites})
 
 
 @api.route(
@@ -427,11 +451,129 @@ def update_step_result(auto_test_id: int, result_id: int
     if has_attachment:
         step_result.update_attachment(request.files['attachment'])
 
+    result.update_points_achieved()
     db.session.commit()
 
     return jsonify(step_result)
 
 
+@api.route(
+    (
+        '/auto_tests/<int:auto_test_id>/results/<int:result_id>'
+        '/step_results/bulk/'
+    ),
+    methods=['PUT']
+)
+@site_settings.Opt.AUTO_TEST_ENABLED.required
+def update_step_results(auto_test_id: int, result_id: int
+                        ) -> JSONResponse[t.List[models.AutoTestStepResult]]:
+    """Update the results of multiple steps in a single transaction.
+
+    This route does the same as :func:`update_step_result` for every item in
+    the given list, but only locks the result once and commits all changes at
+    once. Attachments cannot be uploaded using this route.
+
+    :param auto_test_id: The AutoTest configuration in which to update the
+        results.
+    :param result_id: The id of the result in which to update the steps.
+    :>jsonarr state: The state in which the step is in right now.
+    :>jsonarr log: The current log of the step.
+    :>jsonarr auto_test_step_id: The step of which this is a result.
+    :>jsonarr id: The step result you want to update (OPTIONAL). If you do not
+        pass this option a step result is created.
+    :returns: The updated step results, in the same order as given.
+    """
+    password = _verify_global_header_password()
+
+    content = request.get_json()
+    if not isinstance(content, list):
+        raise APIException(
+            'The given data should be a list of step results',
+            f'The given data {content} is not a list',
+            APICodes.INVALID_PARAM, 400
+        )
+
+    updates = []
+    for item in content:
+        with get_from_map_transaction(ensure_json_dict(item)) as [
+            get, opt_get
+        ]:
+            updates.append(
+                (
+                    get('state', models.AutoTestStepResultState),
+                    get('log', dict),
+                    get('auto_test_step_id', int),
+                    opt_get('id', int, None),
+                )
+            )
+
+    result = filter_single_or_404(
+        models.AutoTestResult,
+        models.AutoTestResult.id == result_id,
+        also_error=lambda res: res.run.auto_test_id != auto_test_id,
+        with_for_update=True,
+        with_for_update_of=models.AutoTestResult,
+    )
+    _ensure_from_latest_work(result)
+    _verify_and_get_runner(result.run, password)
+
+    res_ids = set(res_id for *_, res_id in updates if res_id is not None)
+    existing = {
+        step_result.id: step_result
+        for step_result in models.AutoTestStepResult.query.filter(
+            models.AutoTestStepResult.id.in_(list(res_ids))
+        )
+    } if res_ids else {}
+    step_ids = set(
+        step_id for _, _, step_id, res_id in updates if res_id is None
+    )
+    steps = {
+        step.id: step
+        for step in models.AutoTestStepBase.query.filter(
+            models.AutoTestStepBase.id.in_(list(step_ids))
+        )
+    } if step_ids else {}
+
+    # First check that all step (results) exist, so we do not change anything
+    # when one of them does not.
+    for _, _, auto_test_step_id, res_id in updates:
+        if res_id is None and auto_test_step_id not in steps:
+            raise APIException(
+                'The requested "AutoTestStepBase" was not found', (
+                    'There is no "AutoTestStepBase" with primary key'
+                    f' {auto_test_step_id}'
+                ), APICodes.OBJECT_ID_NOT_FOUND, 404
+            )
+        elif res_id is not None and res_id not in existing:
+            raise APIException(
+                'The requested "AutoTestStepResult" was not found', (
+                    'There is no "AutoTestStepResult" with primary key'
+                    f' {res_id}'
+                ), APICodes.OBJECT_ID_NOT_FOUND, 404
+            )
+
+    step_results = []
+    for state, log, auto_test_step_id, res_id in updates:
+        if res_id is None:
+            step_result = models.AutoTestStepResult(
+                step=steps[auto_test_step_id], result=result
+            )
+        else:
+            step_result = existing[res_id]
+            assert step_result.auto_test_result_id == result.id
+            assert step_result.auto_test_step_id == auto_test_step_id
+
+        step_result.state = state
+        step_result.log = log
+        step_results.append(step_result)
+
+    result.update_points_achieved()
+    db.session.add(result)
+    db.session.commit()
+
+    return jsonify(step_results)
+
+
 @api.route(
     '/auto_tests/<int:auto_test_id>/runs/<int:run_id>/results/',
     methods=['GET'],
@@ -513,9 +655,8 @@ def upload_output_files(
     )
     extracted = files.process_files(file_objects, app.max_file_size)
 
-    models.AutoTestOutputFile.create_from_extract_directory(
+    models.AutoTestOutputFile.bulk_create_from_extract_directory(
         extracted,
-        None,
         {
             'result': result,
             'suite': suite,
@@ -499,6 +499,7 @@ def get_fresh_database(keep=False):
     try:
         run_psql(db_name, '-c', 'create extension "uuid-ossp"')
         run_psql(db_name, '-c', 'create extension "citext"')
+        run_psql(db_name, '-c', 'create extension "pg_trgm"')
         if psql_host_info:
             db_string = f'postgresql://{username}:{password}@{host}:{port}/{db_name}'
         else:
@@ -378,3 +378,235 @@ def test_getting_analytics_workspace(
 
     with describe('students cannot access it'), logged_in(student):
         test_client.req('get', url, 403)
+
+
+def test_analytics_snapshots(
+    logged_in, test_client, session, admin_user, describe, tomorrow
+):
+    with describe('setup'), logged_in(admin_user):
+        assignment = helpers.create_assignment(
+            test_client, state='open', deadline=tomorrow
+        )
+        course = assignment['course']
+        teacher = admin_user
+        student = helpers.create_user_with_role(session, 'Student', course)
+        work_id = helpers.get_id(
+            helpers.create_submission(
+                test_client, assignment, for_user=student
+            )
+        )
+        w_id, = assignment['analytics_workspace_ids']
+        url = f'/api/v1/analytics/{w_id}'
+
+        def get_grade(etag=None):
+            res, rv = test_client.req(
+                'get',
+                url,
+                200,
+                headers={} if etag is None else {'If-None-Match': etag},
+                include_response=True,
+            )
+            sub, = res['student_submissions'][str(get_id(student))]
+            return sub['grade'], rv.headers['ETag']
+
+    with describe('changes are not recorded without snapshots'):
+        assert m.AnalyticsWorkspace.query.get(w_id).data_version > 0
+        assert not m.AnalyticsWorkspaceChange.query.filter_by(
+            workspace_id=w_id
+        ).all()
+
+    with describe('unchanged workspaces should not be sent again'
+                  ), logged_in(teacher):
+        grade, etag = get_grade()
+        assert grade is None
+        assert m.AnalyticsSnapshot.query.filter_by(
+            workspace_id=w_id
+        ).count() == 1
+
+        rv = test_client.get(url, headers={'If-None-Match': etag})
+        assert rv.status_code == 304
+        assert rv.get_data(as_text=True) == ''
+
+    with describe('changes should be included in the snapshot'
+                  ), logged_in(teacher):
+        test_client.req(
+            'patch',
+            f'/api/v1/submissions/{work_id}',
+            200,
+            data={'grade': 5},
+        )
+        grade, new_etag = get_grade(etag)
+        assert grade == 5
+        assert new_etag != etag
+        assert m.AnalyticsSnapshot.query.filter_by(
+            workspace_id=w_id
+        ).one().version == m.AnalyticsWorkspace.query.get(w_id).data_version
+
+    with describe('included changes should be removed'):
+        assert not m.AnalyticsWorkspaceChange.query.filter_by(
+            workspace_id=w_id
+        ).all()
+
+    with describe('bulk updates of submissions should be recorded'
+                  ), logged_in(teacher):
+        version = m.AnalyticsWorkspace.query.get(w_id).data_version
+        test_client.req(
+            'patch',
+            f'/api/v1/assignments/{get_id(assignment)}/divide',
+            204,
+            data={'graders': {}},
+        )
+        assert m.AnalyticsWorkspace.query.get(w_id).data_version > version
+        assert m.AnalyticsWorkspaceChange.query.filter_by(
+            workspace_id=w_id, work_id=None
+        ).all()
+
+
+def test_analytics_snapshots_incremental_refresh(
+    logged_in, test_client, session, admin_user, describe, tomorrow,
+    make_add_reply, monkeypatch
+):
+    with describe('setup'), logged_in(admin_user):
+        assignment = helpers.create_assignment(
+            test_client, state='open', deadline=tomorrow
+        )
+        course = assignment['course']
+        teacher = admin_user
+        work_ids = [
+            helpers.get_id(
+                helpers.create_submission(
+                    test_client,
+                    assignment,
+                    for_user=helpers.create_user_with_role(
+                        session, 'Student', course
+                    ),
+                )
+            ) for _ in range(2)
+        ]
+        rubric = test_client.req(
+            'put',
+            f'/api/v1/assignments/{get_id(assignment)}/rubrics/',
+            200,
+            data=RUBRIC
+        )
+        w_id, = assignment['analytics_workspace_ids']
+        url = f'/api/v1/analytics/{w_id}/data_sources'
+
+        computed = []
+
+        def record_computed(compute_data):
+            def inner(self, work_ids):
+                computed.append(None if work_ids is None else set(work_ids))
+                return compute_data(self, work_ids)
+
+            return inner
+
+        for data_source in [
+            psef.models.analytics._RubricDataSource,
+            psef.models.analytics._InlineFeedbackDataSource,
+        ]:
+            monkeypatch.setattr(
+                data_source, 'compute_data',
+                record_computed(data_source.compute_data)
+            )
+
+        def get_data(name):
+            computed.clear()
+            data = test_client.req('get', f'{url}/{name}', 200)['data']
+            return data, list(computed)
+
+    with describe('the first request should compute all data'
+                  ), logged_in(teacher):
+        data, computed_works = get_data('rubric_data')
+        assert computed_works == [None]
+        assert data == {str(work_id): [] for work_id in work_ids}
+
+        data, computed_works = get_data('inline_feedback')
+        assert computed_works == [None]
+        assert data == {
+            str(work_id): {'total_amount': 0}
+            for work_id in work_ids
+        }
+
+    with describe('unchanged data should not be computed again'
+                  ), logged_in(teacher):
+        _, computed_works = get_data('rubric_data')
+        assert computed_works == []
+
+    with describe('selecting a rubric item should only refresh its submission'
+                  ), logged_in(teacher):
+        item = get_rubric_item(rubric, 'My header', '10points')
+        test_client.req(
+            'patch',
+            f'/api/v1/submissions/{work_ids[0]}/rubricitems/{item["id"]}',
+            204,
+        )
+
+        data, computed_works = get_data('rubric_data')
+        assert computed_works == [{work_ids[0]}]
+        assert data == {
+            str(work_ids[0]): [{'item_id': item['id'], 'multiplier': 1.0}],
+            str(work_ids[1]): [],
+        }
+
+    with describe('adding a comment should only refresh its submission'
+                  ), logged_in(teacher):
+        reply = make_add_reply(work_ids[1])('A reply', line=1)
+
+        data, computed_works = get_data('inline_feedback')
+        assert computed_works == [{work_ids[1]}]
+        assert data == {
+            str(work_ids[0]): {'total_amount': 0},
+            str(work_ids[1]): {'total_amount': 1},
+        }
+
+        # The rubric data is refreshed for the same submission, as changes
+        # are recorded per workspace.
+        data, computed_works = get_data('rubric_data')
+        assert computed_works == [{work_ids[1]}]
+        assert data[str(work_ids[0])] == [{
+            'item_id': item['id'],
+            'multiplier': 1.0,
+        }]
+
+    with describe('deleting a comment should only refresh its submission'
+                  ), logged_in(teacher):
+        reply.delete()
+
+        data, computed_works = get_data('inline_feedback')
+        assert computed_works == [{work_ids[1]}]
+        assert data == {
+            str(work_id): {'total_amount': 0}
+            for work_id in work_ids
+        }
+
+        _, computed_works = get_data('rubric_data')
+        assert computed_works == [{work_ids[1]}]
+
+    with describe('changes should only be recorded when committing'
+                  ), logged_in(teacher):
+
+        def get_version():
+            return session.query(m.AnalyticsWorkspace.data_version).filter(
+                m.AnalyticsWorkspace.id == w_id
+            ).scalar()
+
+        version = get_version()
+        m.Work.query.get(work_ids[1]).assigned_to = get_id(teacher)
+        session.flush()
+        assert get_version() == version
+        assert not m.AnalyticsWorkspaceChange.query.filter_by(
+            workspace_id=w_id
+        ).all()
+
+        session.commit()
+        assert get_version() == version + 1
+        assert {
+            c.work_id
+            for c in m.AnalyticsWorkspaceChange.query.filter_by(
+                workspace_id=w_id
+            )
+        } == {work_ids[1]}
+
+        _, computed_works = get_data('rubric_data')
+        assert computed_works == [{work_ids[1]}]
@@ -1,3 +1,6 @@
+import io
+import tarfile
+
 import pytest
 
 import psef
@@ -171,3 +174,51 @@ def test_create_from_wrong_filename(describe):
                 __file__, fp
             ) as arch:
                 assert False
+
+
+def test_extract_tar_without_seeking(app, describe):
+    with describe('setup'):
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode='w:gz') as tar:
+            for name, data in [
+                ('a', b'1'),
+                ('d/x', b'2'),
+                ('a', b'3'),
+                ('./a', b'4'),
+                ('d', None),
+            ]:
+                info = tarfile.TarInfo(name)
+                if data is None:
+                    info.type = tarfile.DIRTYPE
+                    tar.addfile(info)
+                else:
+                    info.size = len(data)
+                    tar.addfile(info, io.BytesIO(data))
+        buf.seek(0)
+
+        class Unseekable:
+            def read(self, amount=-1):
+                return buf.read(amount)
+
+            def seek(self, *_):
+                assert False, 'Stream should not be seeked'
+
+    with describe('can extract from an unseekable stream'
+                  ), app.file_storage.putter() as putter:
+        with Archive.create_from_fileobj(
+            'arch.tar.gz', Unseekable()
+        ) as arch:
+            tree = arch.extract(putter, max_size=2 ** 20)
+
+        found = {}
+        for child in tree.get_all_children():
+            if not child.is_dir:
+                with child.backing_file.open() as f:
+                    found[child.get_full_name()] = f.read()
+
+        assert found == {
+            'a': b'1',
+            'd/x': b'2',
+            'a (1)': b'3',
+            'a (2)': b'4',
+        }
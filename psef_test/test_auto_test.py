@@ -1911,6 +1911,561 @@ def test_update_result_dates_in_broker(
         assert not backend_broker_ses.calls
 
 
+def test_update_step_results_in_bulk(
+    describe, basic, logged_in, test_client, session, app, monkeypatch,
+    stub_function_class, monkeypatch_celery
+):
+    with describe('setup'):
+        course, assig_id, teacher, student = basic
+        with logged_in(teacher):
+            test = m.AutoTest.query.get(
+                helpers.create_auto_test(
+                    test_client,
+                    assig_id,
+                    amount_sets=1,
+                    amount_suites=1,
+                    amount_fixtures=1,
+                    stop_points=[None],
+                )['id']
+            )
+
+            run = m.AutoTestRun(auto_test=test, batch_run_done=True)
+            run.runners_requested = 1
+            session.add(run)
+            session.commit()
+
+            monkeypatch.setattr(
+                psef.tasks, 'adjust_amount_runners', stub_function_class()
+            )
+            sub_id = helpers.create_submission(test_client, assig_id)['id']
+
+        result = LocalProxy(
+            lambda: m.AutoTestResult.query.filter_by(work_id=sub_id).one()
+        )
+        runner = m.AutoTestRunner(_ipaddr='localhost', run=run)
+        session.commit()
+
+        step1, step2 = test.sets[0].suites[0].steps[:2]
+        url = (
+            f'/api/v-internal/auto_tests/{test.id}/results/{result.id}'
+            '/step_results/bulk/'
+        )
+        headers = {
+            'CG-Internal-Api-Password': app.config['AUTO_TEST_PASSWORD'],
+            'CG-Internal-Api-Runner-Password': str(runner.id)
+        }
+
+    with describe('creating multiple step results at once'):
+        res1, res2 = test_client.req(
+            'put',
+            url,
+            200,
+            data=[
+                {
+                    'state': 'running',
+                    'log': {},
+                    'auto_test_step_id': step1.id,
+                },
+                {
+                    'state': 'passed',
+                    'log': {'steps': []},
+                    'auto_test_step_id': step2.id,
+                },
+            ],
+            headers=headers,
+            environ_base={'REMOTE_ADDR': 'localhost'},
+            result=[
+                {
+                    'id': int,
+                    'state': 'running',
+                    '__allow_extra__': True,
+                },
+                {
+                    'id': int,
+                    'state': 'passed',
+                    '__allow_extra__': True,
+                },
+            ],
+        )
+        assert len(result.step_results) == 2
+        # The stored points should be updated with the step results.
+        assert result._points_achieved is not None
+        assert result.points_achieved == result.get_amount_points_in_suites(
+            *test.all_suites
+        )[0]
+
+    with describe('updating existing step results'):
+        test_client.req(
+            'put',
+            url,
+            200,
+            data=[
+                {
+                    'id': res1['id'],
+                    'state': 'failed',
+                    'log': {},
+                    'auto_test_step_id': step1.id,
+                },
+            ],
+            headers=headers,
+            environ_base={'REMOTE_ADDR': 'localhost'},
+            result=[
+                {
+                    'id': res1['id'],
+                    'state': 'failed',
+                    '__allow_extra__': True,
+                },
+            ],
+        )
+        assert len(result.step_results) == 2
+
+    with describe('non existing steps should not change anything'):
+        test_client.req(
+            'put',
+            url,
+            404,
+            data=[
+                {
+                    'id': res2['id'],
+                    'state': 'failed',
+                    'log': {},
+                    'auto_test_step_id': step2.id,
+                },
+                {
+                    'state': 'passed',
+                    'log': {},
+                    'auto_test_step_id': 1000000,
+                },
+            ],
+            headers=headers,
+            environ_base={'REMOTE_ADDR': 'localhost'},
+        )
+        assert len(result.step_results) == 2
+        step_result = m.AutoTestStepResult.query.get(res2['id'])
+        assert step_result.state.name == 'passed'
+
+    with describe('data should be a list'):
+        test_client.req(
+            'put',
+            url,
+            400,
+            data={'state': 'passed'},
+            headers=headers,
+            environ_base={'REMOTE_ADDR': 'localhost'},
+        )
+
+
+def test_get_auto_test_run_changes(
+    describe, basic, logged_in, test_client, session, monkeypatch,
+    stub_function_class, monkeypatch_celery
+):
+    with describe('setup'):
+        course, assig_id, teacher, student = basic
+        with logged_in(teacher):
+            test = m.AutoTest.query.get(
+                helpers.create_auto_test(
+                    test_client, assig_id, amount_sets=1, amount_suites=1
+                )['id']
+            )
+            run = m.AutoTestRun(auto_test=test, batch_run_done=True)
+            session.add(run)
+            session.commit()
+
+            monkeypatch.setattr(
+                psef.tasks, 'adjust_amount_runners', stub_function_class()
+            )
+            sub_id = helpers.create_submission(
+                test_client, assig_id, for_user=student
+            )['id']
+
+        res1 = m.AutoTestResult.query.filter_by(work_id=sub_id).one().id
+        long_ago = DatetimeWithTimezone.utcnow() - timedelta(hours=1)
+        m.AutoTestResult.query.update({'updated_at': long_ago})
+        session.commit()
+
+        url = f'/api/v1/auto_tests/{test.id}/runs/{run.id}'
+        since = (long_ago + timedelta(minutes=10)).isoformat()
+
+    with describe('unchanged runs should not be sent again'), logged_in(
+        teacher
+    ):
+        _, rv = test_client.req(
+            'get',
+            f'{url}?latest_only',
+            200,
+            result={
+                'results': [{'id': res1, '__allow_extra__': True}],
+                '__allow_extra__': True,
+            },
+            include_response=True,
+        )
+        etag = rv.headers['ETag']
+        rv = test_client.get(
+            f'{url}?latest_only', headers={'If-None-Match': etag}
+        )
+        assert rv.status_code == 304
+        assert rv.get_data(as_text=True) == ''
+
+        rv = test_client.get(url, headers={'If-None-Match': etag})
+        assert rv.status_code == 200
+
+    with describe('changes to the run itself should be sent'), logged_in(
+        teacher
+    ):
+        m.AutoTestRun.query.get(run.id).setup_stdout = 'New output'
+        session.commit()
+
+        rv = test_client.get(
+            f'{url}?latest_only', headers={'If-None-Match': etag}
+        )
+        assert rv.status_code == 200
+        assert rv.get_json()['setup_stdout'] == 'New output'
+        etag = rv.headers['ETag']
+
+    with describe('only changed results should be returned'), logged_in(
+        teacher
+    ):
+        test_client.req(
+            'get',
+            f'{url}/changes?latest_only',
+            200,
+            query={'since': since},
+            result={'cursor': str, 'results': [], 'removed_ids': []},
+        )
+
+        m.AutoTestResult.query.get(res1).started_at = (
+            DatetimeWithTimezone.utcnow()
+        )
+        session.commit()
+
+        test_client.req(
+            'get',
+            f'{url}/changes?latest_only',
+            200,
+            query={'since': since},
+            result={
+                'cursor': str,
+                'results': [{'id': res1, '__allow_extra__': True}],
+                'removed_ids': [],
+            },
+        )
+        rv = test_client.get(
+            f'{url}?latest_only', headers={'If-None-Match': etag}
+        )
+        assert rv.status_code == 200
+
+    with describe('results of old submissions should be removed'), logged_in(
+        teacher
+    ):
+        sub2_id = helpers.create_submission(
+            test_client, assig_id, for_user=student
+        )['id']
+        res2 = m.AutoTestResult.query.filter_by(work_id=sub2_id).one().id
+
+        test_client.req(
+            'get',
+            f'{url}/changes?latest_only',
+            200,
+            query={'since': since},
+            result={
+                'cursor': str,
+                'results': [{'id': res2, '__allow_extra__': True}],
+                'removed_ids': [res1],
+            },
+        )
+
+    with describe('deleting the latest submission should be a change'
+                  ), logged_in(teacher):
+        m.AutoTestResult.query.update({'updated_at': long_ago})
+        session.commit()
+        _, rv = test_client.req(
+            'get',
+            f'{url}?latest_only',
+            200,
+            result={
+                'results': [{'id': res2, '__allow_extra__': True}],
+                '__allow_extra__': True,
+            },
+            include_response=True,
+        )
+        etag = rv.headers['ETag']
+
+        test_client.req('delete', f'/api/v1/submissions/{sub2_id}', 204)
+
+        test_client.req(
+            'get',
+            f'{url}?latest_only',
+            200,
+            headers={'If-None-Match': etag},
+            result={
+                'results': [{'id': res1, '__allow_extra__': True}],
+                '__allow_extra__': True,
+            },
+        )
+        test_client.req(
+            'get',
+            f'{url}/changes?latest_only',
+            200,
+            query={'since': since},
+            result={
+                'cursor': str,
+                'results': [{'id': res1, '__allow_extra__': True}],
+                'removed_ids': [res2],
+            },
+        )
+
+    with describe('since should be a valid date'), logged_in(teacher):
+        test_client.req('get', f'{url}/changes', 400)
+        test_client.req(
+            'get', f'{url}/changes', 400, query={'since': 'not a date'}
+        )
+
+
+def test_reuse_results_of_unchanged_suites(
+    describe, basic, logged_in, test_client, session, app, monkeypatch,
+    stub_function_class, monkeypatch_celery
+):
+    with describe('setup'):
+        course, assig_id, teacher, student = basic
+        for task in [
+            'adjust_amount_runners', 'notify_broker_of_new_job',
+            'notify_broker_end_of_job'
+        ]:
+            monkeypatch.setattr(psef.tasks, task, stub_function_class())
+
+        with logged_in(teacher):
+            test = m.AutoTest.query.get(
+                helpers.create_auto_test(
+                    test_client,
+                    assig_id,
+                    amount_sets=1,
+                    amount_suites=2,
+                    grade_calculation='full',
+                )['id']
+            )
+            helpers.create_submission(
+                test_client, assig_id, for_user=student.username
+            )
+        url = f'/api/v1/auto_tests/{test.id}'
+        suite1, suite2 = test.sets[0].suites
+        # Suites with submission info are never reused.
+        assert not suite1.submission_info
+        assert suite2.submission_info
+
+        def start_run():
+            with logged_in(teacher):
+                run_id = test_client.req('post', f'{url}/runs/', 200)['id']
+            return m.AutoTestRun.query.get(run_id)
+
+        def finish_result(run):
+            result, = run.results
+            done = set(sr.auto_test_step_id for sr in result.step_results)
+            for suite in [suite1, suite2]:
+                for step in suite.steps:
+                    if step.id in done:
+                        continue
+                    session.add(
+                        m.AutoTestStepResult(
+                            step=step,
+                            result=result,
+                            _state=m.AutoTestStepResultState.passed,
+                            log={},
+                        )
+                    )
+            result.state = m.AutoTestStepResultState.passed
+            session.commit()
+
+        def delete_run(run):
+            with logged_in(teacher):
+                test_client.req('delete', f'{url}/runs/{run.id}', 204)
+
+    with describe('first run has nothing to reuse'):
+        run = start_run()
+        result, = run.results
+        assert result.step_results == []
+        assert result.state == m.AutoTestStepResultState.not_started
+        finish_result(run)
+        delete_run(run)
+
+    with describe('unchanged suites are copied to the new run'):
+        run = start_run()
+        result, = run.results
+        assert result.state == m.AutoTestStepResultState.not_started
+        assert set(sr.step for sr in result.step_results) == set(suite1.steps)
+
+    with describe('runners get the reused suites when starting'):
+        runner = m.AutoTestRunner(_ipaddr='localhost', run=run)
+        session.commit()
+        res = test_client.req(
+            'patch',
+            f'/api/v-internal/auto_tests/{test.id}/results/{result.id}',
+            200,
+            data={'state': 'running'},
+            headers={
+                'CG-Internal-Api-Password': app.config['AUTO_TEST_PASSWORD'],
+                'CG-Internal-Api-Runner-Password': str(runner.id)
+            },
+            environ_base={'REMOTE_ADDR': 'localhost'},
+            result={'taken': False, 'reused_suites': list},
+        )
+        assert [s['id'] for s in res['reused_suites']] == [suite1.id]
+        session.expire_all()
+        run = m.AutoTestRun.query.get(run.id)
+        finish_result(run)
+        delete_run(run)
+
+    with describe('changed suites are not reused'):
+        suite1.steps[0].weight = suite1.steps[0].weight + 1
+        session.commit()
+        run = start_run()
+        result, = run.results
+        assert result.step_results == []
+
+    with describe('nothing is reused when disabled'):
+        finish_result(run)
+        delete_run(run)
+        monkeypatch.setitem(app.config, 'AUTO_TEST_REUSE_RESULTS', False)
+        run = start_run()
+        result, = run.results
+        assert result.step_results == []
+
+
+def test_stored_points_achieved(
+    describe, basic, logged_in, test_client, session, app, monkeypatch,
+    stub_function_class, monkeypatch_celery
+):
+    with describe('setup'):
+        course, assig_id, teacher, student = basic
+        for task in [
+            'adjust_amount_runners', 'notify_broker_of_new_job',
+            'notify_broker_end_of_job'
+        ]:
+            monkeypatch.setattr(psef.tasks, task, stub_function_class())
+
+        with logged_in(teacher):
+            test = m.AutoTest.query.get(
+                helpers.create_auto_test(
+                    test_client,
+                    assig_id,
+                    amount_sets=1,
+                    amount_suites=2,
+                    grade_calculation='full',
+                )['id']
+            )
+            helpers.create_submission(
+                test_client, assig_id, for_user=student.username
+            )
+        url = f'/api/v1/auto_tests/{test.id}'
+        suite1, suite2 = test.sets[0].suites
+        io_step, _, custom_step, run_step = suite2.steps
+        assert run_step.weight == 1
+        assert custom_step.weight == 1
+        assert [i['weight'] for i in io_step.data['inputs']] == [0.5, 0.5]
+
+        def start_run():
+            with logged_in(teacher):
+                run_id = test_client.req('post', f'{url}/runs/', 200)['id']
+            return m.AutoTestRun.query.get(run_id)
+
+        def get_stored_points(result_id):
+            session.expire_all()
+            return m.AutoTestResult.query.get(result_id)._points_achieved
+
+    with describe('reused suites should be counted directly'):
+        run = start_run()
+        result, = run.results
+        assert get_stored_points(result.id) == 0
+        for step in suite1.steps + suite2.steps:
+            session.add(
+                m.AutoTestStepResult(
+                    step=step,
+                    result=result,
+                    _state=m.AutoTestStepResultState.passed,
+                    log={},
+                )
+            )
+        result.state = m.AutoTestStepResultState.passed
+        session.commit()
+        with logged_in(teacher):
+            test_client.req('delete', f'{url}/runs/{run.id}', 204)
+
+        run = start_run()
+        result, = run.results
+        assert set(sr.step for sr in result.step_results) == set(suite1.steps)
+        # Only the run program step of the reused suite passed with points.
+        assert get_stored_points(result.id) == 1
+
+        runner = m.AutoTestRunner(_ipaddr='localhost', run=run)
+        session.commit()
+        result_url = (
+            f'/api/v-internal/auto_tests/{test.id}/results/{result.id}'
+            '/step_results/'
+        )
+        kwargs = {
+            'headers': {
+                'CG-Internal-Api-Password': app.config['AUTO_TEST_PASSWORD'],
+                'CG-Internal-Api-Runner-Password': str(runner.id)
+            },
+            'environ_base': {'REMOTE_ADDR': 'localhost'},
+        }
+
+    with describe('single updates should update the points'):
+        run_step_result = test_client.req(
+            'put',
+            result_url,
+            200,
+            data={
+                'state': 'passed',
+                'log': {},
+                'auto_test_step_id': run_step.id,
+            },
+            **kwargs,
+        )
+        assert get_stored_points(result.id) == 2
+
+    with describe('bulk updates should update the points'):
+        test_client.req(
+            'put',
+            f'{result_url}bulk/',
+            200,
+            data=[
+                {
+                    'state': 'passed',
+                    'log': {
+                        'steps': [{'state': 'passed'}, {'state': 'failed'}]
+                    },
+                    'auto_test_step_id': io_step.id,
+                },
+                {
+                    'state': 'passed',
+                    'log': {'points': 0.25},
+                    'auto_test_step_id': custom_step.id,
+                },
+            ],
+            **kwargs,
+        )
+        assert get_stored_points(result.id) == 2.75
+
+    with describe('updating an existing step result should update points'):
+        test_client.req(
+            'put',
+            result_url,
+            200,
+            data={
+                'id': run_step_result['id'],
+                'state': 'failed',
+                'log': {},
+                'auto_test_step_id': run_step.id,
+            },
+            **kwargs,
+        )
+        assert get_stored_points(result.id) == 1.75
+        result = m.AutoTestResult.query.get(result.id)
+        assert result.points_achieved == result.get_amount_points_in_suites(
+            *test.all_suites
+        )[0]
+
+
 @pytest.mark.parametrize('fresh_db', [True], indirect=True)
 def test_output_dir(
     monkeypatch_celery, monkeypatch_broker, basic, test_client, logged_in,
@@ -3278,3 +3833,216 @@ def test_run_auto_test_startup_command(
             psef.auto_test.LXCProcessError if should_fail else CalledBroker
         ):
             psef.auto_test.start_polling(app.config)
+
+
+def test_prefetcher_late_download_after_fallback(describe):
+    with describe('setup'):
+        release = threading.Event()
+        started = threading.Event()
+
+        def download(result_id, dst):
+            if result_id == 1:
+                started.set()
+                assert release.wait(10)
+            dst.write(f'code of {result_id}'.encode())
+
+        prefetcher = psef.auto_test._StudentCodePrefetcher(
+            download, max_amount=1, amount_threads=1
+        )
+        prefetcher.prefetch([1, 2])
+        prefetcher.start()
+
+    try:
+        with describe('taking before the download is done should fallback'):
+            assert started.wait(10)
+            assert prefetcher.take(1) is None
+
+        with describe('late archives should be removed directly'):
+            release.set()
+            # There is only one thread and room for one archive, so the second
+            # result can only be downloaded when the late archive is gone.
+            for _ in range(100):
+                if os.path.exists(prefetcher._get_path(2)):
+                    break
+                time.sleep(0.1)
+            assert prefetcher.take(2) == b'code of 2'
+            assert not any(
+                name.startswith('1.zip')
+                for name in os.listdir(prefetcher._tmpdir)
+            )
+            assert prefetcher.take(1) is None
+    finally:
+        prefetcher.stop()
+
+
+def test_read_fifo_interleaved_output(describe, tmpdir):
+    with describe('setup'):
+        limit = 32768
+        size_left = psef.auto_test.LockableValue(limit)
+        stdout = []
+        stderr = []
+        SC = psef.auto_test.StartedContainer
+        stdout_fifo = os.path.join(tmpdir, 'stdout')
+        stderr_fifo = os.path.join(tmpdir, 'stderr')
+        os.mkfifo(stdout_fifo)
+        os.mkfifo(stderr_fifo)
+
+        # Keep the fifos open for reading, so the output can be written
+        # before the reader starts, and both streams are ready at once.
+        keep_open = [
+            os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+            for fifo in [stdout_fifo, stderr_fifo]
+        ]
+        with open(stdout_fifo, 'wb') as out, open(stderr_fifo, 'wb') as err:
+            for _ in range(3):
+                out.write(b'o' * 20000)
+                out.flush()
+                err.write(b'e' * 50)
+                err.flush()
+
+    with describe('stderr should be read before stdout uses the limit'):
+        # The writers are already closed, but the reader will not see the end
+        # of the fifos as it opened them afterwards, so we stop it ourselves.
+        stop = psef.auto_test.LockableValue(False)
+        reader = threading.Thread(
+            target=SC._read_fifo,
+            args=(
+                {
+                    stdout_fifo: SC._make_restricted_append(stdout, size_left),
+                    stderr_fifo: SC._make_restricted_append(stderr, size_left),
+                },
+                stop,
+                limit,
+            ),
+        )
+        reader.start()
+        try:
+            for _ in range(100):
+                if sum(map(len, stdout + stderr)) > limit:
+                    break
+                time.sleep(0.05)
+        finally:
+            stop.set(True)
+            reader.join()
+            for fd in keep_open:
+                os.close(fd)
+
+        assert b''.join(stderr) == b'e' * 150
+        assert b''.join(stdout) == (
+            b'o' * (limit - 150) + b' <OUTPUT TRUNCATED>\n'
+        )
+
+
+def test_warm_container_pool(describe, monkeypatch):
+    with describe('setup'):
+        destroyed = []
+
+        class Container:
+            def __init__(self, name):
+                self.name = name
+
+            def clone(self):
+                return Container(str(uuid.uuid4()))
+
+            def start_container(self):
+                pass
+
+        class LxcContainer:
+            running = False
+
+            def __init__(self, name):
+                self.name = name
+
+            def destroy(self):
+                destroyed.append(self.name)
+
+        monkeypatch.setattr(lxc, 'Container', LxcContainer)
+        monkeypatch.setattr(
+            psef.auto_test._WarmContainerPool, '_POLL_INTERVAL', 0.01
+        )
+
+        def get_size_after_filling(wanted):
+            for _ in range(200):
+                if pool._queue.qsize() >= wanted:
+                    break
+                time.sleep(0.05)
+            # Give the pool the chance to start too many containers.
+            time.sleep(0.2)
+            return pool._queue.qsize()
+
+        def take():
+            cont = pool.take({}, lambda: None)
+            assert cont is not None
+            return cont.name
+
+    with psef.auto_test._Manager() as manager:
+        pool = psef.auto_test._WarmContainerPool(
+            Container('base'), manager, max_size=3, backlog=[1, 2]
+        )
+        pool.start()
+        try:
+            with describe('should not start more containers than queued'):
+                assert get_size_after_filling(2) == 2
+
+            with describe('queued results should only be counted once'):
+                pool.add_backlog([2, 3, 4])
+                assert get_size_after_filling(3) == 3
+
+            with describe('started results should not be refilled'):
+                for result_id in [1, 2, 3]:
+                    pool.remove_from_backlog(result_id)
+                taken = [take(), take()]
+                assert get_size_after_filling(1) == 1
+                pool.remove_from_backlog(4)
+                taken.append(take())
+                assert len(set(taken)) == 3
+                assert get_size_after_filling(0) == 0
+                assert pool.take({}, lambda: None) is None
+
+            with describe('new work should fill the pool again'):
+                pool.add_backlog([5])
+                assert get_size_after_filling(1) == 1
+        finally:
+            pool.stop()
+
+        with describe('stopping should destroy the remaining containers'):
+            assert pool._queue.qsize() == 0
+            assert len(destroyed) == 1
+            assert destroyed[0] not in taken
+
+
+def test_step_result_batcher_keeps_flushing_after_error(describe):
+    with describe('setup'):
+        calls = []
+        flushed = threading.Event()
+
+        class Response:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return [{'id': 100}]
+
+        class Session:
+            def put(self, url, json, timeout):
+                calls.append(json)
+                if len(calls) == 1:
+                    raise ValueError('Unexpected error')
+                flushed.set()
+                return Response()
+
+        batcher = psef.auto_test._StepResultBatcher(
+            Session, 'http://localhost/', max_size=10, flush_interval=0.05
+        )
+        state = m.AutoTestStepResultState.passed
+
+    with describe('errors should not stop the flushing'), batcher:
+        batcher.update(state, {}, {'id': 5})
+        assert flushed.wait(10)
+        assert len(calls) == 2
+        assert calls[1] == [{
+            'log': {},
+            'state': 'passed',
+            'auto_test_step_id': 5,
+            'has_attachment': False,
+        }]
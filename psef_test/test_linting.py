@@ -405,6 +405,105 @@ def test_linters(
             )
 
 
+@pytest.mark.parametrize('filename', ['test_flake8.tar.gz'], indirect=True)
+@pytest.mark.parametrize('batch_size', [1, 2, 32])
+def test_batch_linting_crash(
+    teacher_user, test_client, logged_in, assignment_real_works, session,
+    monkeypatch_celery, monkeypatch, app, batch_size
+):
+    assignment, single_work = assignment_real_works
+    monkeypatch.setitem(app.config, 'LINTER_BATCH_SIZE', batch_size)
+    batch_sizes = []
+
+    def crashing_run_batch(self, basedir, emit, process_completed):
+        batch_sizes.append(len(os.listdir(basedir)))
+        raise psef.linters.LinterCrash
+
+    monkeypatch.setattr(
+        psef.linters.Flake8, 'run_batch', crashing_run_batch
+    )
+
+    with logged_in(teacher_user):
+        res = test_client.req(
+            'post',
+            f'/api/v1/assignments/{assignment.id}/linter',
+            200,
+            data={'name': 'Flake8', 'cfg': ''},
+        )
+        test_client.req(
+            'get',
+            f'/api/v1/linters/{res["id"]}',
+            200,
+            result={
+                'name': 'Flake8',
+                'done': 3,
+                'working': 0,
+                'id': str,
+                'crashed': 0,
+            }
+        )
+
+        # Only real batches are run using ``run_batch``, and when that fails
+        # all submissions should be linted separately.
+        assert batch_sizes == {1: [], 2: [2], 32: [3]}[batch_size]
+
+        code_id = session.query(m.File.id).filter(
+            m.File.work_id == single_work['id'],
+            m.File.parent != None,  # NOQA
+            m.File.name != '__init__.py',
+        ).first()[0]
+        assert test_client.req(
+            'get',
+            f'/api/v1/code/{code_id}',
+            200,
+            query={'type': 'linter-feedback'},
+        )
+
+
+@pytest.mark.parametrize('filename', ['test_flake8.tar.gz'], indirect=True)
+def test_linting_restore_failure(
+    teacher_user, test_client, logged_in, assignment_real_works,
+    monkeypatch_celery, monkeypatch, app
+):
+    assignment, _ = assignment_real_works
+    monkeypatch.setitem(app.config, 'LINTER_BATCH_SIZE', 1)
+    monkeypatch.setitem(app.config, 'LINTER_MAX_WORKERS', 1)
+    orig_restore = m.File.restore_directory_structures
+    calls = []
+
+    def failing_restore(*args, **kwargs):
+        calls.append(None)
+        if len(calls) == 1:
+            raise OSError('Could not restore')
+        return orig_restore(*args, **kwargs)
+
+    monkeypatch.setattr(
+        m.File, 'restore_directory_structures', failing_restore
+    )
+
+    with logged_in(teacher_user):
+        res = test_client.req(
+            'post',
+            f'/api/v1/assignments/{assignment.id}/linter',
+            200,
+            data={'name': 'Flake8', 'cfg': ''},
+        )
+        # Only the batch that could not be restored should crash, the other
+        # submissions should still be linted.
+        test_client.req(
+            'get',
+            f'/api/v1/linters/{res["id"]}',
+            200,
+            result={
+                'name': 'Flake8',
+                'done': 2,
+                'working': 0,
+                'id': str,
+                'crashed': 1,
+            }
+        )
+
+
 @pytest.mark.parametrize('filename', ['test_flake8.tar.gz'], indirect=True)
 def test_linters_permissions(
     teacher_user, student_user, test_client, logged_in, assignment_real_works,
@@ -725,6 +824,7 @@ def test_detail_of_linter(
         raise ValueError
 
     monkeypatch.setattr(psef.linters.PMD, 'run', error_run)
+    monkeypatch.setattr(psef.linters.PMD, 'run_batch', error_run)
     monkeypatch.setattr(
         psef.linters.PMD, 'validate_config', lambda *_, **__: None
     )
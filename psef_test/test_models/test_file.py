@@ -0,0 +1,72 @@
+from psef import models as m
+from psef.extract_tree import ExtractFileTree
+
+
+def test_bulk_create_from_extract_directory(
+    describe, session, app, assignment, student_user
+):
+    with describe('setup'):
+        tree = ExtractFileTree(name='top')
+        with app.file_storage.putter() as putter:
+            for name in [['a.py'], ['dir', 'b.py'], ['dir', 'sub', 'c.py']]:
+                tree.insert_file(name, putter.from_string(name[-1]))
+        tree.insert_dir(['empty'])
+        work = m.Work(assignment=assignment, user=student_user)
+
+    with describe('the complete tree should be inserted'):
+        work.add_file_tree(tree)
+        session.commit()
+        assert work.id is not None
+
+        top = m.File.query.filter_by(work=work, parent=None).one()
+        assert top.name == 'top'
+        assert top.is_directory
+        contents = top.list_contents(m.FileOwner.teacher)
+        assert [e.name for e in contents.entries] == ['a.py', 'dir', 'empty']
+        assert sorted(
+            f.get_path() for f in m.File.query.filter_by(work=work)
+            if not f.is_directory
+        ) == ['a.py', 'dir/b.py', 'dir/sub/c.py']
+
+    with describe('the files should have their backing files'):
+        c_file = m.File.query.filter_by(work=work, name='c.py').one()
+        with c_file.open() as f:
+            assert f.read() == b'c.py'
+        assert c_file.fileowner == m.FileOwner.both
+        assert not c_file.deleted
+
+
+def test_restore_directory_structures(
+    describe, session, app, assignment, student_user, tmpdir
+):
+    with describe('setup'):
+        works = []
+        for idx in range(3):
+            tree = ExtractFileTree(name=f'top{idx}')
+            with app.file_storage.putter() as putter:
+                tree.insert_file(['dir', 'a.py'], putter.from_string(str(idx)))
+            work = m.Work(assignment=assignment, user=student_user)
+            work.add_file_tree(tree)
+            works.append(work)
+        session.commit()
+
+    with describe('caches should be the same as separately made caches'):
+        caches = m.File.make_caches(works)
+        assert list(caches) == [work.id for work in works]
+        for work in works:
+            expected = m.File.make_cache(work)
+            assert dict(caches[work.id]) == dict(expected)
+
+    with describe('all trees should be restored'):
+        to_restore = []
+        for work in works:
+            parent = tmpdir.mkdir(str(work.id))
+            to_restore.append((str(parent), caches[work.id]))
+
+        restored = m.File.restore_directory_structures(
+            to_restore, allow_hardlink=True
+        )
+        assert [tree.name for tree in restored] == ['top0', 'top1', 'top2']
+        for idx, work in enumerate(works):
+            path = tmpdir.join(str(work.id), f'top{idx}', 'dir', 'a.py')
+            assert path.read() == str(idx)
@@ -2,6 +2,7 @@
 import os
 import sys
 import json
+from datetime import timedelta
 
 import pytest
 
@@ -11,6 +12,7 @@ import psef.models as m
 from helpers import create_marker
 from psef.errors import APICodes, APIException
 from psef.permissions import CoursePermission, GlobalPermission
+from cg_cache.inter_request import MemoryBackend
 
 should_raise = create_marker(pytest.mark.should_raise)
 
@@ -110,6 +112,175 @@ def test_non_existing_course(ta_user, bs_course, perm):
     assert not ta_user.has_permission(perm, course_id=bs_course.id * 10)
 
 
+def test_course_permissions_cache(
+    ta_user, bs_course, session, app, monkeypatch
+):
+    cache = MemoryBackend('course_permissions', timedelta(minutes=5))
+    version_cache = MemoryBackend(
+        'course_permissions_version', timedelta(days=1)
+    )
+    monkeypatch.setattr(app, 'course_permissions_cache', cache)
+    monkeypatch.setattr(app, 'course_permissions_version_cache', version_cache)
+    key = f'{ta_user.id}/{bs_course.id}'
+    perm = CoursePermission.can_see_others_work
+
+    def get_cached():
+        return cache.get(f'{key}/{version_cache.get(key)}')
+
+    assert ta_user.has_permission(perm, course_id=bs_course.id)
+    assert perm.name in get_cached()
+    old_version = version_cache.get(key)
+
+    # Changing the role should clear the cache for all users with the role.
+    ta_user.courses[bs_course.id].set_permission(perm, False)
+    session.commit()
+    with pytest.raises(KeyError):
+        get_cached()
+    assert not ta_user.has_permission(perm, course_id=bs_course.id)
+    assert perm.name not in get_cached()
+
+    # Permissions that were loaded before the change was committed are stored
+    # under the old version, and should never be used.
+    cache.set(f'{key}/{old_version}', [perm.name])
+    m.user._get_cached_permissions_in_course.clear_cache()
+    assert not ta_user.has_permission(perm, course_id=bs_course.id)
+
+    # And so should removing the user from the course.
+    del ta_user.courses[bs_course.id]
+    session.commit()
+    with pytest.raises(KeyError):
+        get_cached()
+    assert not ta_user.has_permission(
+        CoursePermission.can_see_assignments, course_id=bs_course.id
+    )
+    assert get_cached() is None
+
+
+@pytest.mark.parametrize(
+    'perm,vals',
+    [
+        # name, (bs_course (is ta), pse_course (is student), prolog (nothing))
+        (CoursePermission.can_submit_own_work, (False, True, False)),
+        (CoursePermission.can_see_others_work, (True, False, False)),
+        (CoursePermission.can_see_assignments, (True, True, False)),
+        should_raise((GlobalPermission.can_add_users, (False, False, False)),
+                     )  # This is not a real permission
+    ]
+)
+def test_course_permissions(
+    ta_user, bs_course, pse_course, prolog_course, perm, vals, logged_in,
+    test_client, request, error_template
+):
+    should_r = request.node.get_closest_marker('should_raise')
+    error = bool(should_r)
+
+    with logged_in(ta_user):
+        for course, val in zip([bs_course, pse_course, prolog_course], vals):
+            if should_r:
+                with pytest.raises(AssertionError):
+                    res = ta_user.has_permission(perm, course_id=course.id)
+            else:
+                assert ta_user.has_permission(perm, course_id=course.id) == val
+            res = test_client.req(
+                'get',
+                f'/api/v1/courses/{course.id}/permissions/',
+                200,
+                result=dict
+            )
+            if error:
+                assert (
+                    perm.name not in res
+                ), 'Make sure the object keys are valid'
+            else:
+                assert res[perm.name
+                           ] == val, 'The permission should be correct'
+
+            if not error:
+                if val:
+                    a.ensure_permission(perm, course_id=course.id)
+                else:
+                    with pytest.raises(APIException) as err:
+                        a.ensure_permission(perm, course_id=course.id)
+                    assert err.value.api_code == APICodes.INCORRECT_PERMISSION
+
+    if not error:
+        for course, val in zip([bs_course, pse_course, prolog_course], vals):
+            with logged_in('NOT_LOGGED_IN'):
+                res = test_client.req(
+                    'get', f'/api/v1/courses/{course.id}/permissions/', 401
+                )
+                with pytest.raises(APIException) as err:
+                    a.ensure_permission(perm, course_id=course.id)
+                assert err.value.api_code == APICodes.NOT_LOGGED_IN
+
+
+@pytest.mark.parametrize('perm', ['wow_nope'])
+def test_non_existing_permission(
+    ta_user, bs_course, perm, logged_in, test_client, error_template
+):
+    with logged_in(ta_user):
+        assert perm not in test_client.req(
+            'get',
+            f'/api/v1/courses/{bs_course.id}/permissions/',
+            200,
+        ), 'The requested object should not have this value'
+
+        assert perm not in test_client.req(
+            'get',
+            f'/api/v1/permissions/',
+            200,
+            query={'type': 'global'},
+        ), 'The requested object should not have this value'
+
+        # This api point should raise an error as you actually query
+        # permissions and not just all permissions.
+        test_client.req(
+            'get',
+            f'/api/v1/permissions/',
+            404,
+            query={'permission': perm, 'type': 'course'},
+            result=error_template
+        )
+
+
+@pytest.mark.parametrize(
+    'perm',
+    [CoursePermission.can_grade_work, CoursePermission.can_submit_own_work]
+)
+def test_non_existing_course(ta_user, bs_course, perm):
+    assert not ta_user.has_permission(perm, course_id=bs_course.id * 10)
+
+
+def test_course_permissions_cache(
+    ta_user, bs_course, session, app, monkeypatch
+):
+    cache = MemoryBackend('course_permissions', timedelta(minutes=5))
+    monkeypatch.setattr(app, 'course_permissions_cache', cache)
+    key = f'{ta_user.id}/{bs_course.id}'
+    perm = CoursePermission.can_see_others_work
+
+    assert ta_user.has_permission(perm, course_id=bs_course.id)
+    assert perm.name in cache.get(key)
+
+    # Changing the role should clear the cache for all users with the role.
+    ta_user.courses[bs_course.id].set_permission(perm, False)
+    session.commit()
+    with pytest.raises(KeyError):
+        cache.get(key)
+    assert not ta_user.has_permission(perm, course_id=bs_course.id)
+    assert perm.name not in cache.get(key)
+
+    # And so should removing the user from the course.
+    del ta_user.courses[bs_course.id]
+    session.commit()
+    with pytest.raises(KeyError):
+        cache.get(key)
+    assert not ta_user.has_permission(
+        CoursePermission.can_see_assignments, course_id=bs_course.id
+    )
+    assert cache.get(key) is None
+
+
 @pytest.mark.parametrize(
     'perm,vals',
     [(GlobalPermission.can_edit_own_info, (True, True)),
@@ -6,6 +6,7 @@ import json
 import math
 import random
 import tempfile
+import textwrap
 import itertools
 import contextlib
 import subprocess
@@ -14,8 +15,9 @@ import pytest
 from sqlalchemy import func
 
 import psef
+import helpers
 import psef.models as models
-from helpers import create_marker
+from helpers import create_marker, create_submission
 
 http_err = create_marker(pytest.mark.http_err)
 
@@ -1050,6 +1052,234 @@ def test_chrased_jplag(
             assert plag['log'].startswith('My log!')
 
 
+@pytest.mark.parametrize('bb_tar_gz', ['correct.tar.gz'])
+def test_refresh_jplag_run(
+    bb_tar_gz, logged_in, assignment, test_client, teacher_user,
+    error_template, monkeypatch, monkeypatch_celery, session
+):
+    bb_tar_gz = (
+        f'{os.path.dirname(__file__)}/'
+        f'../test_data/test_blackboard/{bb_tar_gz}'
+    )
+    calls = []
+
+    def callback(call, **kwargs):
+        f_p = os.path.join(call[call.index('-r') + 1], 'computer_matches.csv')
+        archive_dir = call[call.index('-a') + 1]
+        data_dir = call[3]
+        data_dirs = os.listdir(data_dir)
+        archive_dirs = os.listdir(archive_dir)
+        calls.append((data_dirs, archive_dirs))
+        dirs = data_dirs + archive_dirs
+        with open(f_p, 'w') as f:
+            writer = csv.writer(f, delimiter=';')
+            for dir1, dir2 in itertools.product(dirs, dirs):
+                writer.writerow([
+                    dir1,
+                    dir2,
+                    75,
+                    20,
+                    get_random_path(
+                        dir1, data_dir if dir1 in data_dirs else archive_dir
+                    ),
+                    5,
+                    10,
+                    get_random_path(
+                        dir2, data_dir if dir2 in data_dirs else archive_dir
+                    ),
+                    0,
+                    4,
+                ])
+
+    monkeypatch.setattr(subprocess, 'Popen', make_popen_stub(callback))
+
+    def get_case_works():
+        cases = test_client.req(
+            'get', f'/api/v1/plagiarism/{plag["id"]}/cases/', 200
+        )
+        return {
+            frozenset(sub['id'] for sub in case['submissions']): case['id']
+            for case in cases
+        }
+
+    with logged_in(teacher_user):
+        test_client.req(
+            'post',
+            f'/api/v1/assignments/{assignment.id}/submissions/',
+            204,
+            real_data={'file': (bb_tar_gz, 'bb.tar.gz')},
+        )
+        plag = test_client.req(
+            'post',
+            f'/api/v1/assignments/{assignment.id}/plagiarism',
+            200,
+            data={
+                'provider': 'JPlag',
+                'old_assignments': [],
+                'lang': 'Python 3',
+                'has_old_submissions': False,
+                'has_base_code': False,
+            },
+        )
+        assert len(calls) == 1
+        assert len(calls[0][0]) == 3
+        assert not calls[0][1]
+        old_cases = get_case_works()
+        assert len(old_cases) == 3
+
+        # Nothing changed, so the provider should not be called again.
+        test_client.req(
+            'post',
+            f'/api/v1/plagiarism/{plag["id"]}/refresh',
+            200,
+            result={'state': 'starting', '__allow_extra__': True},
+        )
+        assert len(calls) == 1
+        assert get_case_works() == old_cases
+
+        changed, *unchanged = assignment.get_all_latest_submissions().all()
+        new_sub = create_submission(
+            test_client, assignment.id, for_user=changed.user.username
+        )
+
+        test_client.req(
+            'post',
+            f'/api/v1/plagiarism/{plag["id"]}/refresh',
+            200,
+        )
+        test_client.req(
+            'get',
+            f'/api/v1/plagiarism/{plag["id"]}',
+            200,
+            result={
+                'state': 'done',
+                'submissions_total': 3,
+                '__allow_extra__': True,
+            },
+        )
+        assert len(calls) == 2
+        assert len(calls[1][0]) == 1
+        assert len(calls[1][1]) == 2
+
+        new_cases = get_case_works()
+        unchanged_pair = frozenset(w.id for w in unchanged)
+        # The case between the unchanged submissions should be kept, the
+        # cases of the old submission should be replaced.
+        assert new_cases[unchanged_pair] == old_cases[unchanged_pair]
+        assert set(new_cases) == {
+            unchanged_pair,
+            *(frozenset([new_sub['id'], w.id]) for w in unchanged),
+        }
+
+        # A run that has no record of the submissions it checked (as created
+        # before this was stored) should replace all its cases on a refresh.
+        run = models.PlagiarismRun.query.get(plag['id'])
+        run.checked_works = []
+        session.commit()
+        test_client.req(
+            'post',
+            f'/api/v1/plagiarism/{plag["id"]}/refresh',
+            200,
+        )
+        assert len(calls) == 3
+        assert len(calls[2][0]) == 3
+        cases = test_client.req(
+            'get', f'/api/v1/plagiarism/{plag["id"]}/cases/', 200
+        )
+        assert len(cases) == 3
+        assert set(get_case_works()) == set(new_cases)
+
+
+@pytest.mark.parametrize('bb_tar_gz', ['correct.tar.gz'])
+def test_jplag_more_matches_than_a_batch(
+    bb_tar_gz, logged_in, assignment, test_client, teacher_user, monkeypatch,
+    monkeypatch_celery, session
+):
+    bb_tar_gz = (
+        f'{os.path.dirname(__file__)}/'
+        f'../test_data/test_blackboard/{bb_tar_gz}'
+    )
+    # Spread the matches over the cases so a batch ends halfway a case.
+    matches_per_case = psef.plagiarism._MATCH_INSERT_BATCH_SIZE // 2 + 7
+    written = {}
+
+    def callback(call, **kwargs):
+        f_p = os.path.join(call[call.index('-r') + 1], 'computer_matches.csv')
+        data_dir = call[3]
+        dirs = sorted(os.listdir(data_dir))
+
+        with open(f_p, 'w') as f:
+            writer = csv.writer(f, delimiter=';')
+            for dir1, dir2 in itertools.combinations(dirs, 2):
+                files1 = get_all_files_of_dir(dir1, data_dir)
+                files2 = get_all_files_of_dir(dir2, data_dir)
+                row = [dir1, dir2, 50, 60]
+                written[(dir1, dir2)] = []
+                for i in range(matches_per_case):
+                    file1 = files1[i % len(files1)]
+                    file2 = files2[i % len(files2)]
+                    row.extend([
+                        file1[len(dir1):], i, i + 1, file2[len(dir2):], 2 * i,
+                        2 * i + 3
+                    ])
+                    written[(dir1, dir2)].append((
+                        os.path.basename(file1), i, i + 1,
+                        os.path.basename(file2), 2 * i, 2 * i + 3
+                    ))
+                writer.writerow(row)
+
+    monkeypatch.setattr(subprocess, 'Popen', make_popen_stub(callback))
+
+    with logged_in(teacher_user):
+        test_client.req(
+            'post',
+            f'/api/v1/assignments/{assignment.id}/submissions/',
+            204,
+            real_data={'file': (bb_tar_gz, 'bb.tar.gz')},
+        )
+        plag = test_client.req(
+            'post',
+            f'/api/v1/assignments/{assignment.id}/plagiarism',
+            200,
+            data={
+                'provider': 'JPlag',
+                'old_assignments': [],
+                'lang': 'Python 3',
+                'has_old_submissions': False,
+                'has_base_code': False,
+            },
+        )
+
+    assert len(written) == 3
+    cases = models.PlagiarismCase.query.filter_by(
+        plagiarism_run_id=plag['id']
+    ).all()
+    assert len(cases) == 3
+    total = 0
+    for case in cases:
+        dir1, dir2 = (
+            models.PlagiarismRun._make_dir_name(work)
+            for work in [case.work1, case.work2]
+        )
+        matches = models.PlagiarismMatch.query.filter_by(
+            plagiarism_case_id=case.id
+        ).order_by(models.PlagiarismMatch.id).all()
+        assert [(
+            match.file1.name,
+            match.file1_start,
+            match.file1_end,
+            match.file2.name,
+            match.file2_start,
+            match.file2_end,
+        ) for match in matches] == written[(dir1, dir2)]
+        assert all(match.file1.work_id == case.work1_id for match in matches)
+        assert all(match.file2.work_id == case.work2_id for match in matches)
+        total += len(matches)
+
+    assert total == 3 * matches_per_case
+    assert total > psef.plagiarism._MATCH_INSERT_BATCH_SIZE
+
+
 def test_get_plagiarism_providers(test_client):
     test_client.req(
         'get',
@@ -1086,5 +1316,146 @@ def test_get_plagiarism_providers(test_client):
                                 'placeholder': 'default: 50',
                             }],
             },
+            {
+                'name': 'Fingerprinting',
+                'base_code': True,
+                'progress': True,
+                'options': [
+                    {
+                        'name': 'suffixes',
+                        'title': 'Suffixes to include',
+                        'description': str,
+                        'type': 'strvalue',
+                        'mandatory': False,
+                        'placeholder': '.xxx, .yyy',
+                    },
+                    {
+                        'name': 'simil',
+                        'title': 'Minimal similarity',
+                        'description': str,
+                        'type': 'numbervalue',
+                        'mandatory': False,
+                        'placeholder': 'default: 50',
+                    },
+                ],
+            },
         ],
     )
+
+
+def test_fingerprinting(
+    logged_in, describe, test_client, admin_user, session, monkeypatch_celery
+):
+    program = textwrap.dedent(
+        '''
+        def find_largest(numbers):
+            """Find the largest number."""
+            largest = None
+            for number in numbers:
+                if largest is None or number > largest:
+                    largest = number
+            return largest
+
+
+        def count_words(text):
+            counts = {}
+            for word in text.split():
+                counts[word] = counts.get(word, 0) + 1
+            return counts
+
+
+        if __name__ == '__main__':
+            print(find_largest([5, 3, 8]), count_words('a b a'))
+        '''
+    )
+    renamed = program.replace('numbers', 'values').replace('word', 'token')
+    other = textwrap.dedent(
+        '''
+        import sys
+
+        class Stack:
+            def __init__(self):
+                self.items = []
+
+            def push(self, item):
+                self.items.append(item)
+
+            def pop(self):
+                return self.items.pop()
+
+        while True:
+            line = sys.stdin.readline()
+            if not line:
+                break
+        '''
+    )
+
+    with describe('setup'), logged_in(admin_user):
+        course = helpers.create_course(test_client)
+        assig = helpers.create_assignment(
+            test_client, course, state='open', deadline='tomorrow'
+        )
+        subs = [
+            helpers.create_submission(
+                test_client,
+                assig,
+                submission_data=(io.BytesIO(code.encode()), 'code.py'),
+                for_user=helpers.create_user_with_role(
+                    session, 'Student', [course]
+                ),
+            )['id'] for code in [program, renamed, other]
+        ]
+
+    with describe('renamed copies should be found'), logged_in(admin_user):
+        plag = test_client.req(
+            'post',
+            f'/api/v1/assignments/{assig["id"]}/plagiarism',
+            200,
+            data={
+                'provider': 'Fingerprinting',
+                'old_assignments': [],
+                'has_old_submissions': False,
+                'has_base_code': False,
+            },
+        )
+        plag = test_client.req(
+            'get',
+            f'/api/v1/plagiarism/{plag["id"]}',
+            200,
+            result={
+                '__allow_extra__': True,
+                'state': 'done',
+                'submissions_total': 3,
+                'submissions_done': 3,
+            },
+        )
+        case, = test_client.req(
+            'get',
+            f'/api/v1/plagiarism/{plag["id"]}/cases/',
+            200,
+            result=[{
+                '__allow_extra__': True,
+                'match_avg': 100,
+                'match_max': 100,
+            }],
+        )
+        assert set(sub['id'] for sub in case['submissions']
+                   ) == set(subs[:2])
+
+        matches = test_client.req(
+            'get',
+            f'/api/v1/plagiarism/{plag["id"]}/cases/{case["id"]}',
+            200,
+        )['matches']
+        assert matches
+        for match in matches:
+            assert match['lines'][0] == match['lines'][1]
+
+    with describe('fingerprints should be stored per file'):
+        fingerprinted = models.PlagiarismFingerprintedFile.query.all()
+        assert len(fingerprinted) == 3
+        assert models.PlagiarismFingerprint.query.filter(
+            models.PlagiarismFingerprint.file_id.in_([
+                f.file_id for f in fingerprinted
+            ])
+        ).count() > 0
@@ -5,6 +5,7 @@ from freezegun import freeze_time
 
 import psef
 import helpers
+from cg_cache.inter_request import MemoryBackend
 
 
 def test_proxy_with_submission(
@@ -114,6 +115,32 @@ def test_getting_files_from_proxy(
         assert res.status_code == 200
         assert res.headers['Content-Type'] == 'image/jpeg'
 
+    with describe('Files should support conditional and range requests'):
+        res = test_client.get(f'/api/v1/proxies/fiets.jpg')
+        assert res.status_code == 200
+        data = res.get_data()
+        etag = res.headers['ETag']
+        assert res.headers['Last-Modified']
+
+        res = test_client.get(
+            f'/api/v1/proxies/fiets.jpg', headers={'If-None-Match': etag}
+        )
+        assert res.status_code == 304
+        assert res.get_data() == b''
+
+        res = test_client.get(
+            f'/api/v1/proxies/fiets.jpg', headers={'Range': 'bytes=10-19'}
+        )
+        assert res.status_code == 206
+        assert res.get_data() == data[10:20]
+        assert res.headers['Content-Range'] == f'bytes 10-19/{len(data)}'
+
+        res = test_client.get(
+            f'/api/v1/proxies/fiets.jpg',
+            headers={'Range': f'bytes={len(data)}-'},
+        )
+        assert res.status_code == 416
+
     with describe('Not found files should return a 404'):
         for f in ['nope', 'non_existing_dir/file', 'nested/nope']:
             res = test_client.get(f'/api/v1/proxies/{f}')
@@ -187,6 +214,59 @@ def test_getting_files_from_proxy(
         assert test_client.get('/api/v1/proxies/fiets.jpg').status_code == 400
 
 
+def test_proxy_path_index_cache(
+    test_client, logged_in, describe, session, admin_user, app, monkeypatch
+):
+    cache = MemoryBackend('proxy_path_indices', timedelta(minutes=30))
+    monkeypatch.setattr(app, 'proxy_path_index_cache', cache)
+
+    with describe('setup'), logged_in(admin_user):
+        course = helpers.create_course(test_client)
+        assig = helpers.create_assignment(
+            test_client, course, state='open', deadline='tomorrow'
+        )
+        stud = helpers.create_user_with_role(session, 'Student', [course])
+        sub = helpers.create_submission(
+            test_client,
+            assig,
+            submission_data=(
+                (
+                    f'{os.path.dirname(__file__)}/../test_data/'
+                    'test_submissions/html.tar.gz'
+                ),
+                'f.tar.gz',
+            ),
+            for_user=stud,
+        )
+        proxy = test_client.req(
+            'post',
+            f'/api/v1/submissions/{sub["id"]}/proxy',
+            200,
+            data={
+                'allow_remote_resources': True,
+                'allow_remote_scripts': True,
+                'teacher_revision': False,
+            }
+        )['id']
+        res = test_client.post(
+            f'/api/v1/proxies/{proxy}/nested/index.html',
+            follow_redirects=True,
+        )
+        assert res.status_code == 200
+
+    with describe('The path index should be cached between requests'):
+        assert 'nested/index.html' in cache.get(proxy)
+
+        def make_index(_):
+            assert False, 'The index should not be created again'
+
+        monkeypatch.setattr(
+            psef.models.Proxy, '_make_path_index', make_index
+        )
+        assert test_client.get('/api/v1/proxies/fiets.jpg').status_code == 200
+        assert test_client.get('/api/v1/proxies/nope').status_code == 404
+
+
 def test_teacher_revision_in_proxy(
     test_client, logged_in, describe, session, admin_user, app
 ):
@@ -1,5 +1,10 @@
+from datetime import timedelta
+
 import helpers
+import psef.models as m
+import psef.models.site_settings
 from psef import site_settings
+from cg_cache.inter_request import MemoryBackend
 
 
 def test_get_all_settings(
@@ -74,3 +79,33 @@ def test_set_setting(test_client, describe, logged_in, admin_user, session):
             result={'__allow_extra__': True, 'MIN_PASSWORD_SCORE': orig},
         )
         assert site_settings.Opt.MIN_PASSWORD_SCORE.value == orig
+
+
+def test_site_settings_process_snapshot(
+    describe, app, monkeypatch, session
+):
+    with describe('setup'):
+        cache = MemoryBackend('site_settings', timedelta(days=1))
+        monkeypatch.setattr(app, 'site_settings_version_cache', cache)
+        monkeypatch.setattr(
+            psef.models.site_settings, '_process_snapshot', None
+        )
+        opt = site_settings.Opt.MIN_PASSWORD_SCORE
+        assert opt.value not in (1, 2)
+        version = cache.get('version')
+
+    with describe('setting a value should change the version'):
+        opt.set_and_commit_value(2)
+        assert cache.get('version') != version
+        assert opt.value == 2
+
+    with describe('changes of other processes are seen after a new version'):
+        session.query(m.SiteSetting).get(opt.name)._value = 1
+        session.commit()
+        m.SiteSetting._clear_cache()
+        # The version did not change so the snapshot is still used.
+        assert opt.value == 2
+
+        cache.set('version', 'changed by another process')
+        m.SiteSetting._clear_cache()
+        assert opt.value == 1
@@ -12,6 +12,7 @@ import psef
 import helpers
 import psef.tasks as tasks
 import psef.models as m
+import cg_object_storage
 from helpers import (
     get_id, create_course, create_marker, create_assignment, create_submission,
     create_user_with_role
@@ -1044,6 +1045,101 @@ def test_get_teacher_zip_file(
     }
 
 
+@pytest.mark.parametrize(
+    'compression,compresslevel', [
+        (zipfile.ZIP_STORED, None),
+        (zipfile.ZIP_DEFLATED, None),
+        (zipfile.ZIP_DEFLATED, 0),
+        (zipfile.ZIP_DEFLATED, 9),
+    ]
+)
+def test_stream_zip_round_trip(tmpdir, compression, compresslevel):
+    storage = cg_object_storage.LocalStorage(str(tmpdir))
+    # Zip files only store the modification time with a two second precision.
+    now = DatetimeWithTimezone.utcnow().replace(second=10, microsecond=0)
+    contents = {
+        'top/': None,
+        'top/empty': b'',
+        'top/small': b'hello',
+        'top/sub/': None,
+        # Larger than the chunk size, so it is read in multiple parts.
+        'top/sub/large': bytes(range(256)) * 64,
+    }
+
+    with storage.putter() as putter:
+        members = [
+            psef.files.ZipMember(
+                path=path,
+                modification_date=now,
+                backing_file=None if content is None else putter.from_stream(
+                    io.BytesIO(content),
+                    max_size=cg_object_storage.FileSize(len(content) + 1),
+                ).try_extract(AssertionError),
+            ) for path, content in contents.items()
+        ]
+
+    chunks = list(
+        psef.files.stream_zip(
+            members,
+            compression=compression,
+            compresslevel=compresslevel,
+            chunk_size=1024,
+        )
+    )
+    if compression == zipfile.ZIP_STORED:
+        # The large file should be streamed instead of written at once.
+        assert len(chunks) > len(contents['top/sub/large']) // 1024
+    zip_data = b''.join(chunks)
+
+    with zipfile.ZipFile(io.BytesIO(zip_data)) as zfile:
+        assert zfile.testzip() is None
+        assert zfile.namelist() == list(contents)
+        for info in zfile.infolist():
+            assert info.date_time == now.timetuple()[:6]
+            if info.is_dir():
+                assert contents[info.filename] is None
+            else:
+                assert info.compress_type == compression
+                assert zfile.read(info) == contents[info.filename]
+
+        large = zfile.getinfo('top/sub/large')
+        if compression == zipfile.ZIP_STORED or compresslevel == 0:
+            assert large.compress_size >= large.file_size
+        else:
+            assert large.compress_size < large.file_size
+
+
+@pytest.mark.parametrize(
+    'filename', ['../test_submissions/multiple_dir_archive.zip'],
+    indirect=True
+)
+@pytest.mark.parametrize(
+    'compression', [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED]
+)
+def test_create_zip_round_trip(assignment_real_works, compression):
+    _, work = assignment_real_works
+    work = m.Work.query.get(work['id'])
+    original_path = os.path.join(
+        os.path.dirname(__file__), '..', 'test_data', 'test_submissions',
+        'multiple_dir_archive.zip'
+    )
+
+    zip_data = b''.join(
+        work.create_zip(m.FileOwner.teacher, compression=compression)
+    )
+
+    with zipfile.ZipFile(original_path) as original, zipfile.ZipFile(
+        io.BytesIO(zip_data)
+    ) as created:
+        assert created.testzip() is None
+        prefix = 'multiple_dir_archive.zip/'
+        assert {
+            name[len(prefix):]: created.read(name)
+            for name in created.namelist() if not name.endswith('/')
+        } == {name: original.read(name)
+              for name in original.namelist()}
+
+
 @pytest.mark.parametrize(
     'named_user', [
         'Thomas Schaper',
@@ -1574,6 +1670,72 @@ def test_delete_submission(
             test_client.req('get', f'/api/v1/submissions/{work_id}', 404)
 
 
+def test_latest_submission_flag(
+    test_client, logged_in, admin_user, session, describe
+):
+    with describe('setup'), logged_in(admin_user):
+        course = create_course(test_client)
+        assignment = m.Assignment.query.get(
+            create_assignment(
+                test_client, course, 'open', deadline='tomorrow'
+            )['id']
+        )
+        student = create_user_with_role(session, 'Student', course)
+        other_student = create_user_with_role(session, 'Student', course)
+
+        def get_latest():
+            return set(
+                work_id for work_id, in
+                assignment.get_from_latest_submissions(m.Work.id)
+            )
+
+        with logged_in(student):
+            oldest = create_submission(test_client, assignment)['id']
+            middle = create_submission(test_client, assignment)['id']
+            newest = create_submission(test_client, assignment)['id']
+        with logged_in(other_student):
+            other = create_submission(test_client, assignment)['id']
+
+    with describe('only the newest submission should be the latest'):
+        assert get_latest() == {newest, other}
+
+    with describe('deleting an older submission changes nothing'
+                  ), logged_in(admin_user):
+        test_client.req('delete', f'/api/v1/submissions/{middle}', 204)
+        assert get_latest() == {newest, other}
+
+    with describe('deleting the latest submission marks the previous one'
+                  ), logged_in(admin_user):
+        test_client.req('delete', f'/api/v1/submissions/{newest}', 204)
+        assert get_latest() == {oldest, other}
+        assert m.Work.query.get(oldest).is_latest
+        assert not m.Work.query.get(newest).is_latest
+
+    with describe('submissions created directly should be marked too'):
+        work = m.Work(
+            assignment=assignment,
+            user=student,
+            created_at=(
+                m.Work.query.get(oldest).created_at -
+                datetime.timedelta(days=1)
+            ),
+        )
+        session.add(work)
+        session.flush()
+        assert get_latest() == {oldest, other}
+
+        work.created_at = DatetimeWithTimezone.utcnow()
+        session.flush()
+        assert get_latest() == {work.id, other}
+
+    with describe('it should match the latest including deleted ones'):
+        assert set(
+            work_id for work_id, in assignment.get_from_latest_submissions(
+                m.Work.id, include_deleted=True
+            )
+        ) == {work.id, other}
+
+
 def test_delete_submission_with_other_work(
     test_client, logged_in, admin_user, session, describe, monkeypatch,
     stub_function_class, app, make_function_spy, canvas_lti1p1_provider,
@@ -55,6 +55,25 @@ def test_searching_users(
             assert [i['username'] for i in res] == sorted(users)
 
 
+def test_searching_users_ranking(logged_in, test_client, session, admin_user):
+    long_match = helpers.create_user_with_role(
+        session, 'Student', [], name='Alpha Trigramtest With A Long Name'
+    )
+    close_match = helpers.create_user_with_role(
+        session, 'Student', [], name='Beta Trigramtest'
+    )
+
+    with logged_in(admin_user):
+        res = test_client.req('get', '/api/v1/users/?q=trigramtest', 200)
+
+    if session.bind.dialect.name == 'postgresql':
+        # The most similar user should be found first.
+        expected = [close_match.id, long_match.id]
+    else:
+        expected = [long_match.id, close_match.id]
+    assert [user['id'] for user in res] == expected
+
+
 @pytest.mark.parametrize(
     'named_user', [
         'Robin',
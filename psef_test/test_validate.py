@@ -1,6 +1,11 @@
 import pytest
 
-from psef.ignore import Options, FileRule, ParseError, SubmissionValidator
+import cg_object_storage
+from psef.ignore import (
+    Options, FileRule, ParseError, IgnoreHandling, IgnoreFilterManager,
+    SubmissionValidator
+)
+from psef.extract_tree import ExtractFileTree
 
 
 def test_parse_option():
@@ -87,3 +92,95 @@ def test_policy_deny_no_rules():
             'rules': [],
         })
     assert e.value.msg.startswith('When the policy is set to "deny_all_files"')
+
+
+@pytest.mark.parametrize(
+    'path',
+    [
+        'a.py',
+        'dir/a.py',
+        'dir/important.py',
+        'node_modules/pkg/index.js',
+        'src/node_modules/',
+        'src/node_modules/pkg/index.js',
+        'build',
+        'build/out.o',
+        'docs/build/index.html',
+        'README.md',
+    ],
+)
+def test_ignore_filter_last_match_wins(path):
+    ignore = IgnoreFilterManager(
+        [
+            '# A comment',
+            '*.py',
+            '!important.py',
+            'node_modules/',
+            '!src/node_modules/',
+            '/build',
+            '**/docs/',
+        ]
+    )
+    matches = ignore.find_matching(path)
+
+    found = ignore.find_last_matching(path)
+    if matches:
+        assert found is matches[-1]
+        assert ignore.is_ignored(path) == (
+            found.is_exclude, found.original_line
+        )
+    else:
+        assert found is None
+        assert ignore.is_ignored(path) == (None, None)
+
+    # The second lookup uses the cached results for the directories.
+    assert ignore.find_last_matching(path) is found
+
+
+def test_revert_processed_submission(tmpdir):
+    storage = cg_object_storage.LocalStorage(str(tmpdir))
+    validator = SubmissionValidator.parse({
+        'policy': 'allow_all_files',
+        'options': [
+            {'key': 'delete_empty_directories', 'value': True},
+            {'key': 'remove_leading_directories', 'value': True},
+        ],
+        'rules': [{
+            'rule_type': 'deny', 'file_type': 'file', 'name': '*.o'
+        }],
+    })
+
+    def dump(f):
+        res = dict(f.__to_json__())
+        if 'entries' in res:
+            res['entries'] = [dump(entry) for entry in res['entries']]
+        return res
+
+    with storage.putter() as putter:
+        tree = ExtractFileTree(name='top')
+        for name in [
+            ['outer', 'main.c'],
+            ['outer', 'main.o'],
+            ['outer', 'build', 'lib.o'],
+        ]:
+            tree.insert_file(name, putter.from_string('content'))
+        tree.insert_dir(['outer', 'empty'])
+    original = dump(tree)
+    removed_file = tree.lookup_direct_child('outer').lookup_direct_child(
+        'main.o'
+    )
+
+    processed = validator.process_submission(tree, IgnoreHandling.delete)
+    assert processed.tree is tree
+    assert [c.fullname for c in processed.changes] == [
+        '/', 'main.o', 'build/lib.o', 'build/', 'empty/'
+    ]
+    assert dump(tree) == {'name': 'top', 'entries': [{'name': 'main.c'}]}
+
+    processed.revert()
+    assert dump(tree) == original
+    assert removed_file.backing_file.exists
+
+    processed = validator.process_submission(tree, IgnoreHandling.delete)
+    processed.delete_removed_files()
+    assert not removed_file.backing_file.exists